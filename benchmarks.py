@@ -0,0 +1,675 @@
+"""
+Benchmarks for the MSUS data structures.
+
+Usage:
+    python benchmarks.py store-memory [--sizes 100000 1000000]
+    python benchmarks.py snapshot-load [--sizes 100000 1000000]
+    python benchmarks.py shards [--sizes 100000 1000000] [--shards 8]
+    python benchmarks.py backends [--sizes 10000 1000000 10000000] [--lookups 1000]
+    python benchmarks.py math-aggregates [--sizes 100000 1000000]
+    python benchmarks.py math-parallel [--sizes 1000000 10000000] [--workers 2 4]
+    python benchmarks.py digit-sums [--digits 1000 10000 100000] [--batch 1000000]
+    python benchmarks.py concurrency [--readers 8] [--writers 2] [--seconds 5] [--size 20000] [--backend sqlite]
+    python benchmarks.py server-load [--port 8765 | --socket PATH] [--connections 4] [--requests 20000] [--write-ratio 0.1]
+"""
+import argparse
+import array
+import asyncio
+import csv
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import math_accumulators
+import math_parallel
+import math_utils
+from student_journal import StudentJournal
+from student_shards import ShardedJournal
+from student_snapshot import MappedStudentStore, write_snapshot
+from student_sqlite import SQLiteJournal
+from student_store import CompactStudentStore, StudentStore
+
+
+def _make_roster(count: int) -> dict:
+    return {f"Student {i:07d}": i % 151 for i in range(count)}
+
+
+def _measure_allocations(build) -> tuple:
+    """Return (result, bytes still allocated, peak bytes) for build()."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak
+
+
+def bench_store_memory(sizes) -> None:
+    """
+    Compare the memory held by a plain dict, StudentStore and CompactStudentStore.
+
+    Each store is built from a freshly generated roster, as it would be when
+    loading students.json, so the figures include the name strings the store
+    keeps alive. Peak includes the temporary dict the stores are built from.
+    """
+    print(f"{'records':>10} {'layout':<22} {'held MB':>9} {'peak MB':>9} {'bytes/record':>13}")
+    builders = [
+        ("dict", lambda count: _make_roster(count)),
+        ("StudentStore", lambda count: StudentStore.adopt(_make_roster(count))),
+        ("CompactStudentStore", lambda count: CompactStudentStore.adopt(_make_roster(count))),
+    ]
+    for count in sizes:
+        for label, build in builders:
+            store, held, peak = _measure_allocations(lambda: build(count))
+            print(f"{count:>10} {label:<22} {held / 2**20:>9.1f} {peak / 2**20:>9.1f} {held / count:>13.1f}")
+            del store
+
+
+def bench_snapshot_load(sizes) -> None:
+    """
+    Compare opening students.json with opening the binary snapshot.
+
+    Each run loads the file, looks up one student and computes the statistics,
+    which is what the menu needs before it can show anything.
+    """
+    print(f"{'records':>10} {'format':<8} {'file MB':>9} {'open+lookup+stats ms':>22}")
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "students.json")
+        binary_path = os.path.join(directory, "students.msus")
+        for count in sizes:
+            roster = _make_roster(count)
+            with open(json_path, 'w') as file:
+                json.dump(roster, file, indent=2)
+            write_snapshot(binary_path, roster, fsync=False)
+            probe = f"Student {count // 2:07d}"
+            del roster
+
+            def load_json():
+                with open(json_path, 'r') as file:
+                    store = StudentStore.adopt(json.load(file))
+                return store[probe], store.stats()
+
+            def load_binary():
+                store = MappedStudentStore.open(binary_path)
+                return store[probe], store.stats()
+
+            for label, path, load in (("json", json_path, load_json), ("binary", binary_path, load_binary)):
+                gc.collect()
+                started = time.perf_counter()
+                load()
+                elapsed = time.perf_counter() - started
+                print(f"{count:>10} {label:<8} {os.path.getsize(path) / 2**20:>9.1f} {elapsed * 1000:>22.2f}")
+
+
+def bench_shards(sizes, shards: int) -> None:
+    """
+    Compare a single students.json with a sharded layout.
+
+    For each layout it times a full load, and a save after changing one
+    student, which rewrites the whole file but only one shard.
+    """
+    print(f"{'records':>10} {'layout':<10} {'load ms':>10} {'save one change ms':>20}")
+    for count in sizes:
+        roster = _make_roster(count)
+        with tempfile.TemporaryDirectory() as directory:
+            layouts = [
+                ("single", StudentJournal(os.path.join(directory, "students.json"),
+                                          os.path.join(directory, "students.journal"))),
+                (f"{shards} shards", ShardedJournal(os.path.join(directory, "students.json.shards"), shards)),
+            ]
+            for label, journal in layouts:
+                journal.mark_dirty()
+                journal.write_snapshot(roster)
+
+                gc.collect()
+                started = time.perf_counter()
+                students = StudentStore.adopt(journal.load())
+                load_time = time.perf_counter() - started
+
+                students["Student 0000000"] = 42
+                journal.append("set", "Student 0000000", 42)
+                started = time.perf_counter()
+                journal.write_snapshot(students)
+                save_time = time.perf_counter() - started
+                journal.close()
+                print(f"{count:>10} {label:<10} {load_time * 1000:>10.1f} {save_time * 1000:>20.1f}")
+                del students
+
+
+def _time_ms(action) -> tuple:
+    gc.collect()
+    started = time.perf_counter()
+    result = action()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def bench_backends(sizes, lookups: int) -> None:
+    """
+    Compare the JSON journal backend with the SQLite backend.
+
+    For each it times a bulk import of the whole roster into an empty
+    database, opening the database, a batch of random lookups, computing the
+    statistics, and one change followed by a save. The JSON backend reads
+    every record on open and holds them in memory; SQLite reads nothing up
+    front and answers each query from its indexes.
+    """
+    print(f"{'records':>10} {'backend':<8} {'import ms':>10} {'open ms':>10} "
+          f"{f'{lookups} lookups ms':>18} {'stats ms':>10} {'change+save ms':>15}")
+    for count in sizes:
+        roster = _make_roster(count)
+        names = random.Random(count).choices(list(roster), k=lookups)
+        with tempfile.TemporaryDirectory() as directory:
+            backends = [
+                ("json", lambda: StudentJournal(os.path.join(directory, "students.json"),
+                                                os.path.join(directory, "students.journal"))),
+                ("sqlite", lambda: SQLiteJournal(os.path.join(directory, "students.db"))),
+            ]
+            for label, make_journal in backends:
+                journal = make_journal()
+                journal.load()
+                journal.mark_dirty()
+                _, import_time = _time_ms(lambda: journal.write_snapshot(roster))
+                journal.close()
+
+                journal = make_journal()
+
+                def open_database():
+                    loaded = journal.load()
+                    return loaded if isinstance(loaded, StudentStore) else StudentStore.adopt(loaded)
+
+                students, open_time = _time_ms(open_database)
+                _, lookup_time = _time_ms(lambda: [students.get(name) for name in names])
+                _, stats_time = _time_ms(students.stats)
+
+                def change_and_save():
+                    students["Student 0000000"] = 42
+                    journal.append("set", "Student 0000000", 42)
+                    journal.write_snapshot(students)
+
+                _, save_time = _time_ms(change_and_save)
+                journal.close()
+                print(f"{count:>10} {label:<8} {import_time:>10.1f} {open_time:>10.1f} "
+                      f"{lookup_time:>18.1f} {stats_time:>10.1f} {save_time:>15.1f}")
+                del students
+        del roster, names
+
+
+def bench_math_aggregates(sizes) -> None:
+    """
+    Time count_even_odd, calculate_average and find_min_max on each input type.
+
+    A list is validated and reduced by built-in functions; an array.array is
+    validated by its type code and, like a NumPy array, handed to the
+    vectorised kernels when NumPy is installed. A generator is read in
+    chunks of math_accumulators.CHUNK_SIZE values.
+    """
+    numpy = math_accumulators.load_numpy()
+    functions = [math_utils.count_even_odd, math_utils.calculate_average, math_utils.find_min_max]
+    print(f"{'elements':>10} {'input':<12} " + " ".join(f"{function.__name__ + ' ms':>22}" for function in functions))
+    for count in sizes:
+        numbers = [random.Random(count).randint(0, 100) for _ in range(count)]
+        inputs = [("list", lambda: numbers), ("generator", lambda: (number for number in numbers))]
+        packed = array.array("q", numbers)
+        inputs.append(("array.array", lambda: packed))
+        if numpy is not None:
+            vector = numpy.array(numbers, dtype=numpy.int64)
+            inputs.append(("numpy", lambda: vector))
+        expected = [function(numbers) for function in functions]
+        for label, make_input in inputs:
+            timings = []
+            for function, result in zip(functions, expected):
+                data = make_input()
+                value, elapsed = _time_ms(lambda: function(data))
+                if value != result:
+                    raise AssertionError(f"{function.__name__} on {label} gave {value}, expected {result}")
+                timings.append(elapsed)
+            print(f"{count:>10} {label:<12} " + " ".join(f"{elapsed:>22.2f}" for elapsed in timings))
+    if numpy is None:
+        print("NumPy is not installed: array.array used the pure-Python fallback.")
+
+
+def bench_math_parallel(sizes, worker_counts) -> None:
+    """
+    Time math_utils.describe() serially and across worker processes.
+
+    The cutoffs are lifted so every worker count is really run in parallel,
+    showing the fixed cost of the shared-memory copy and the worker pool
+    that math_parallel's cutoffs guard against.
+    """
+    numpy = math_accumulators.load_numpy()
+    cutoffs = math_parallel.PARALLEL_MIN_ELEMENTS, math_parallel.PARALLEL_MIN_ARRAY_ELEMENTS
+    math_parallel.PARALLEL_MIN_ELEMENTS = math_parallel.PARALLEL_MIN_ARRAY_ELEMENTS = 0
+    print(f"CPUs: {os.cpu_count()}, default cutoffs: {cutoffs[0]} list / {cutoffs[1]} array elements")
+    print(f"{'elements':>10} {'input':<8} {'serial ms':>12} " + " ".join(f"{f'{workers} workers ms':>16}" for workers in worker_counts))
+    try:
+        for count in sizes:
+            numbers = [random.Random(count).randint(-10 ** 6, 10 ** 6) for _ in range(count)]
+            inputs = [("list", numbers)]
+            if numpy is not None:
+                inputs.append(("numpy", numpy.array(numbers, dtype=numpy.int64)))
+            for label, data in inputs:
+                expected, serial = _time_ms(lambda: math_utils.describe(data))
+                timings = []
+                for workers in worker_counts:
+                    value, elapsed = _time_ms(lambda: math_utils.describe(data, workers=workers))
+                    if value != expected:
+                        raise AssertionError(f"describe on {label} with {workers} workers gave {value}, expected {expected}")
+                    timings.append(elapsed)
+                print(f"{count:>10} {label:<8} {serial:>12.1f} " + " ".join(f"{elapsed:>16.1f}" for elapsed in timings))
+            del numbers, inputs
+    finally:
+        math_parallel.PARALLEL_MIN_ELEMENTS, math_parallel.PARALLEL_MIN_ARRAY_ELEMENTS = cutoffs
+
+
+def _sum_of_digits_loop(n: int) -> int:
+    # The original math_utils.sum_of_digits, kept as the baseline
+    n = abs(n)
+    digit_sum = 0
+    while n > 0:
+        digit_sum += n % 10
+        n //= 10
+    return digit_sum
+
+
+def bench_digit_sums(digit_counts, batch: int, loop_max_digits: int) -> None:
+    """
+    Compare math_utils.sum_of_digits and sum_of_digits_batch with the % 10 loop.
+
+    Each % 10 step divides the whole remaining number, so the loop is
+    quadratic in the digit count; it is skipped above loop_max_digits.
+    """
+    print(f"{'digits':>10} {'loop ms':>12} {'sum_of_digits ms':>18}")
+    for digits in digit_counts:
+        number = random.Random(digits).randrange(10 ** (digits - 1), 10 ** digits)
+        expected, elapsed = _time_ms(lambda: math_utils.sum_of_digits(number))
+        loop = "skipped"
+        if digits <= loop_max_digits:
+            value, loop_elapsed = _time_ms(lambda: _sum_of_digits_loop(number))
+            if value != expected:
+                raise AssertionError(f"sum_of_digits gave {expected}, loop gave {value}")
+            loop = f"{loop_elapsed:.2f}"
+        print(f"{digits:>10} {loop:>12} {elapsed:>18.2f}")
+
+    numbers = [random.Random(batch).randint(-10 ** 18, 10 ** 18) for _ in range(batch)]
+    expected, loop_elapsed = _time_ms(lambda: [_sum_of_digits_loop(number) for number in numbers])
+    print(f"\nbatch of {batch} 64-bit ints:")
+    print(f"  loop per value:           {loop_elapsed:>10.1f} ms")
+    inputs = [("list", numbers)]
+    numpy = math_accumulators.load_numpy()
+    if numpy is not None:
+        inputs.append(("numpy", numpy.array(numbers, dtype=numpy.int64)))
+    for label, data in inputs:
+        value, elapsed = _time_ms(lambda: math_utils.sum_of_digits_batch(data))
+        if value != expected:
+            raise AssertionError(f"sum_of_digits_batch on {label} disagrees with the loop")
+        print(f"  sum_of_digits_batch {label + ':':<6}{elapsed:>10.1f} ms")
+    if numpy is None:
+        print("NumPy is not installed: sum_of_digits_batch used sum_of_digits per value.")
+
+
+def _write_roster_csv(path: str, roster: dict) -> None:
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Name', 'Age'])
+        writer.writerows(roster.items())
+
+
+class _ExclusiveLock:
+    """The ReadWriteLock interface over a single RLock, so readers exclude each other too."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+
+    def acquire_read(self, blocking: bool = True) -> bool:
+        return self._lock.acquire(blocking)
+
+    def release_read(self) -> None:
+        self._lock.release()
+
+    def acquire_write(self) -> None:
+        self._lock.acquire()
+
+    def release_write(self) -> None:
+        self._lock.release()
+
+    def read(self):
+        return self._lock
+
+    def write(self):
+        return self._lock
+
+
+# bench_concurrency fails if the readers-writer lock lets through fewer writes
+# than this fraction of those a plain lock lets through under the same load
+MIN_WRITE_RATE_VS_PLAIN_LOCK = 0.5
+
+
+def bench_concurrency(readers: int, writers: int, seconds: float, size: int, backend: str = "journal") -> bool:
+    """
+    Stress student_utils from many threads and check consistency and write throughput.
+
+    Reader threads look students up and, under the read lock, check that the
+    running aggregates agree with the records and that no partially imported
+    roster is ever visible. Writer threads add and remove their own students.
+    One importer thread keeps replacing the whole roster from two alternating
+    CSV files, and one exporter thread walks snapshots without the lock,
+    checking that each stays unchanged, and exports them to CSV. At the end
+    the roster is reloaded from disk and compared with the one in memory.
+
+    The same load is run first with a plain lock in place of the roster's
+    readers-writer lock. Readers then never overlap, but writers cannot be
+    starved by them, so its write rate is the baseline the readers-writer
+    lock must keep up with.
+
+    Args:
+        backend: student_utils.STORAGE_BACKEND to run against
+
+    Returns:
+        True if no inconsistency was found and writes kept pace with the baseline
+    """
+    print("Plain lock:")
+    baseline, _ = _stress_roster(readers, writers, seconds, size, backend, _ExclusiveLock())
+    print("Readers-writer lock:")
+    counts, errors = _stress_roster(readers, writers, seconds, size, backend)
+
+    if writers and counts["writes"] < MIN_WRITE_RATE_VS_PLAIN_LOCK * baseline["writes"]:
+        errors.append(f"Writers were starved: {counts['writes']:.0f} writes/s against "
+                      f"{baseline['writes']:.0f}/s with a plain lock")
+    for error in errors[:10]:
+        print(f"FAILED: {error}")
+    print("OK" if not errors else f"{len(errors)} problems found")
+    return not errors
+
+
+def _stress_roster(readers: int, writers: int, seconds: float, size: int, backend: str,
+                   lock=None) -> tuple:
+    """
+    Run the bench_concurrency load once on a fresh database in a scratch directory.
+
+    Args:
+        lock: Used in place of the roster's ReadWriteLock when given
+
+    Returns:
+        ({kind: operations per second}, [inconsistencies found])
+    """
+    import student_utils
+
+    errors = []
+    counts = {"lookups": 0, "consistency checks": 0, "writes": 0, "imports": 0, "snapshot walks": 0}
+    counts_lock = threading.Lock()
+    stop = threading.Event()
+
+    def count(kind: str, amount: int) -> None:
+        with counts_lock:
+            counts[kind] += amount
+
+    with tempfile.TemporaryDirectory() as directory:
+        student_utils.JSON_FILE = os.path.join(directory, "students.json")
+        student_utils.JOURNAL_FILE = os.path.join(directory, "students.journal")
+        student_utils.CSV_FILE = os.path.join(directory, "students.csv")
+        student_utils.SQLITE_FILE = os.path.join(directory, "students.db")
+        student_utils.STORAGE_SETTINGS_FILE = os.path.join(directory, "students.storage.json")
+        student_utils.STORAGE_BACKEND = backend
+        student_utils.database = student_utils.StudentDatabase()
+        if lock is not None:
+            student_utils.database.lock = lock
+
+        # Both rosters hold the same names with different ages, so a reader can
+        # tell which one it is looking at and spot a mix of the two
+        names = [f"Student {i:06d}" for i in range(size)]
+        rosters = []
+        for step in (1, 7):
+            roster = {name: i * step % 151 for i, name in enumerate(names)}
+            path = os.path.join(directory, f"roster_{step}.csv")
+            _write_roster_csv(path, roster)
+            rosters.append((path, roster))
+        print(student_utils.import_from_csv(rosters[0][0]))
+
+        def reader() -> None:
+            done = 0
+            while not stop.is_set():
+                for _ in range(100):
+                    student_utils.lookup_student(random.choice(names))
+                done += 100
+                with student_utils.database.reading() as store:
+                    total = len(store)
+                    stats = store.stats()
+                    if total < size:
+                        errors.append(f"Saw a partial roster of {total} students")
+                    if stats["count"] != total or sum(store.age_counts().values()) != total:
+                        errors.append(f"Aggregates disagree with {total} records: {stats}")
+                    sample = random.sample(names, 20)
+                    if not any(all(store.get(name) == roster[name] for name in sample)
+                               for _, roster in rosters):
+                        errors.append("Saw a mix of two imported rosters")
+                count("consistency checks", 1)
+            count("lookups", done)
+
+        def writer(number: int) -> None:
+            done = 0
+            while not stop.is_set():
+                name = f"Writer {number} {done}"
+                student_utils.add_student(name, done % 151)
+                if done % 2:
+                    student_utils.remove_student(name)
+                done += 1
+            count("writes", done)
+
+        def importer() -> None:
+            done = 0
+            while not stop.is_set():
+                path, _ = rosters[(done + 1) % 2]
+                result = student_utils.import_from_csv(path)
+                if not result.startswith("Successfully"):
+                    errors.append(result)
+                done += 1
+            count("imports", done)
+
+        def exporter() -> None:
+            done = 0
+            while not stop.is_set():
+                snapshot = student_utils.database.snapshot()
+                total = len(snapshot)
+                stats = snapshot.stats()
+                walked = list(snapshot.iter_sorted())
+                if len(walked) != total or snapshot.stats() != stats or len(snapshot) != total:
+                    errors.append(f"Snapshot of {total} students changed while it was walked")
+                if sum(age for _, age in walked) != stats["sum"]:
+                    errors.append("Snapshot records disagree with its aggregates")
+                if done % 10 == 0 and not student_utils.save_students_to_csv(snapshot):
+                    errors.append("Export from a snapshot failed")
+                done += 1
+            count("snapshot walks", done)
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)]
+        threads += [threading.Thread(target=writer, args=(number,)) for number in range(writers)]
+        threads.append(threading.Thread(target=importer))
+        threads.append(threading.Thread(target=exporter))
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        for kind, done in counts.items():
+            print(f"{kind:<20} {done:>10} {done / elapsed:>12.0f}/s")
+            counts[kind] = done / elapsed
+
+        student_utils.flush()
+        in_memory = dict(student_utils.database.store.items())
+        expected_stats = StudentStore(in_memory).stats()
+        if student_utils.database.store.stats() != expected_stats:
+            errors.append("Running statistics drifted from the records")
+        student_utils.database.unload()
+        student_utils.load_students_from_json()
+        if dict(student_utils.database.store.items()) != in_memory:
+            errors.append("Roster on disk differs from the roster in memory")
+    return counts, errors
+
+
+def _percentile(ordered: list, fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def bench_server_load(host: str, port: int, socket_path: str, connections: int, requests: int,
+                      pipeline: int, write_ratio: float = None) -> None:
+    """
+    Drive a student server with concurrent, pipelined requests.
+
+    Each connection runs ``pipeline`` requests at a time, mostly lookups of
+    existing students plus ``write_ratio`` adds. With port 0 a server is
+    started in this process on a scratch database first, and write_ratio
+    defaults to 0.1. Against a running server it defaults to 0, so its
+    roster is left alone. Any students the run does add are removed again
+    at the end.
+
+    Prints requests per second and the p50 and p99 latency.
+    """
+    import student_server
+    import student_utils
+
+    async def run() -> None:
+        server = None
+        directory = None
+        address = {"host": host, "port": port, "socket_path": socket_path}
+        scratch = not socket_path and port == 0
+        ratio = write_ratio if write_ratio is not None else (0.1 if scratch else 0.0)
+        if scratch:
+            directory = tempfile.TemporaryDirectory()
+            student_utils.JSON_FILE = os.path.join(directory.name, "students.json")
+            student_utils.JOURNAL_FILE = os.path.join(directory.name, "students.journal")
+            student_utils.STORAGE_SETTINGS_FILE = os.path.join(directory.name, "students.storage.json")
+            server = await student_server.start_server(host, 0)
+            address["port"] = server.sockets[0].getsockname()[1]
+            client = await student_server.StudentClient.connect(**address)
+            await client.call("add_many", records=[[f"Student {i:06d}", i % 151] for i in range(10000)])
+            await client.close()
+
+        clients = [await student_server.StudentClient.connect(**address) for _ in range(connections)]
+        names = [name for name, _ in await clients[0].call("page", limit=10000)] or ["Alice"]
+        latencies = []
+        added = []
+        # Unique to this run, so no existing student is updated and then removed
+        prefix = f"Load {os.getpid()}-{random.randrange(1 << 32):08x}"
+        per_worker = max(1, requests // (connections * pipeline))
+
+        async def worker(client, number: int) -> None:
+            rng = random.Random(number)
+            for i in range(per_worker):
+                started = time.perf_counter()
+                if rng.random() < ratio:
+                    name = f"{prefix} {number} {i}"
+                    if (await client.call("add", name=name, age=i % 151)).startswith("Student "):
+                        added.append(name)
+                else:
+                    await client.call("lookup", name=rng.choice(names))
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(worker(client, index * pipeline + slot)
+                                   for index, client in enumerate(clients) for slot in range(pipeline)))
+        finally:
+            elapsed = time.perf_counter() - started
+            if added:
+                removed = await clients[0].call("remove_many", names=added)
+                print(f"Removed the {removed['removed']} students added by the run")
+
+        for client in clients:
+            await client.close()
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+            await asyncio.get_running_loop().run_in_executor(None, student_utils.flush)
+            directory.cleanup()
+
+        latencies.sort()
+        print(f"{len(latencies)} requests over {connections} connections, {pipeline} in flight each")
+        print(f"  {len(latencies) / elapsed:,.0f} requests/s")
+        print(f"  p50 {_percentile(latencies, 0.50) * 1000:.2f} ms, p99 {_percentile(latencies, 0.99) * 1000:.2f} ms")
+
+    asyncio.run(run())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    store_memory = commands.add_parser("store-memory", help="memory per record of each student store")
+    store_memory.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+
+    snapshot_load = commands.add_parser("snapshot-load", help="start-up time of JSON versus binary snapshots")
+    snapshot_load.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+
+    shards = commands.add_parser("shards", help="load and save time of a single file versus shards")
+    shards.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    shards.add_argument("--shards", type=int, default=8)
+
+    backends = commands.add_parser("backends", help="import, open, lookup, stats and save time of JSON versus SQLite")
+    backends.add_argument("--sizes", type=int, nargs="+", default=[10000, 1000000, 10000000])
+    backends.add_argument("--lookups", type=int, default=1000)
+
+    math_aggregates = commands.add_parser("math-aggregates", help="math_utils aggregates on lists, array.array and NumPy")
+    math_aggregates.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+
+    math_parallel_command = commands.add_parser("math-parallel", help="math_utils.describe serially versus across processes")
+    math_parallel_command.add_argument("--sizes", type=int, nargs="+", default=[1000000, 10000000])
+    math_parallel_command.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+
+    digit_sums = commands.add_parser("digit-sums", help="sum_of_digits on huge ints and in batches versus the % 10 loop")
+    digit_sums.add_argument("--digits", type=int, nargs="+", default=[1000, 10000, 100000])
+    digit_sums.add_argument("--batch", type=int, default=1000000)
+    digit_sums.add_argument("--loop-max-digits", type=int, default=100000)
+
+    concurrency = commands.add_parser("concurrency", help="stress concurrent lookups, writes and imports")
+    concurrency.add_argument("--readers", type=int, default=8)
+    concurrency.add_argument("--writers", type=int, default=2)
+    concurrency.add_argument("--seconds", type=float, default=5.0)
+    concurrency.add_argument("--size", type=int, default=20000)
+    concurrency.add_argument("--backend", choices=["journal", "sqlite"], default="journal")
+
+    server_load = commands.add_parser("server-load", help="requests/s and latency of the student server")
+    server_load.add_argument("--host", default="127.0.0.1")
+    server_load.add_argument("--port", type=int, default=0, help="server port; 0 starts one in-process")
+    server_load.add_argument("--socket", dest="socket_path")
+    server_load.add_argument("--connections", type=int, default=4)
+    server_load.add_argument("--requests", type=int, default=20000)
+    server_load.add_argument("--pipeline", type=int, default=16)
+    server_load.add_argument("--write-ratio", type=float, default=None,
+                             help="share of adds; 0.1 on the in-process server, 0 on a running one")
+
+    args = parser.parse_args()
+    if args.command == "store-memory":
+        bench_store_memory(args.sizes)
+    elif args.command == "snapshot-load":
+        bench_snapshot_load(args.sizes)
+    elif args.command == "shards":
+        bench_shards(args.sizes, args.shards)
+    elif args.command == "backends":
+        bench_backends(args.sizes, args.lookups)
+    elif args.command == "math-aggregates":
+        bench_math_aggregates(args.sizes)
+    elif args.command == "math-parallel":
+        bench_math_parallel(args.sizes, args.workers)
+    elif args.command == "digit-sums":
+        bench_digit_sums(args.digits, args.batch, args.loop_max_digits)
+    elif args.command == "server-load":
+        bench_server_load(args.host, args.port, args.socket_path, args.connections, args.requests,
+                          args.pipeline, args.write_ratio)
+    elif args.command == "concurrency":
+        if not bench_concurrency(args.readers, args.writers, args.seconds, args.size, args.backend):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 import math_utils
 import text_utils
-import student_utils
 import sys
 import os
 import csv
+import itertools
+
+# student_utils is imported inside the student handlers: it pulls in the
+# storage modules and the roster, which the math and text menus never need.
 
 def display_menu():
     print("\n" + "="*50)
@@ -23,6 +26,8 @@ def display_menu():
     print("12. Math Operations (Average, Min/Max)")
     print("13. Text Operations (Word Count, Capitalize)")
     print("14. Create Sample CSV File")
+    print("15. Search Students by Name")
+    print("16. Find Students by Age Range")
     print("0.  Exit")
     print("-"*50)
 
@@ -90,12 +95,12 @@ def handle_count_even_odd():
         if numbers is None:
             return
             
-        even_count, odd_count = math_utils.count_even_odd(numbers)
+        summary = math_utils.describe(numbers)
         
         print(f"\nResults for {numbers}:")
-        print(f"Even numbers: {even_count}")
-        print(f"Odd numbers: {odd_count}")
-        print(f"Total numbers: {len(numbers)}")
+        print(f"Even numbers: {summary['even']}")
+        print(f"Odd numbers: {summary['odd']}")
+        print(f"Total numbers: {summary['count']}")
         
     except Exception as e:
         print(f"Error: {e}")
@@ -149,6 +154,7 @@ def handle_reverse_sentence():
         print(f"Error: {e}")
 
 def handle_lookup_student():
+    import student_utils
     print("\n--- Lookup Student Age ---")
     try:
         name = get_safe_input("Enter student name: ", "string")
@@ -162,6 +168,7 @@ def handle_lookup_student():
         print(f"Error: {e}")
 
 def handle_add_student():
+    import student_utils
     print("\n--- Add New Student ---")
     try:
         name = get_safe_input("Enter student name: ", "string")
@@ -183,10 +190,11 @@ def handle_add_student():
         print(f"Error: {e}")
 
 def handle_remove_student():
+    import student_utils
     print("\n--- Remove Student ---")
     try:
         print("Current students:")
-        print(student_utils.list_all_students())
+        print(student_utils.list_all_students(limit=student_utils.LIST_PAGE_SIZE))
         print()
         
         name = get_safe_input("Enter student name to remove: ", "string")
@@ -204,16 +212,72 @@ def handle_remove_student():
     except Exception as e:
         print(f"Error: {e}")
 
+def handle_search_students():
+    import student_utils
+    print("\n--- Search Students by Name ---")
+    try:
+        query = get_safe_input("Enter a name or the start of a name: ", "string")
+        if query is None:
+            return
+        
+        result = student_utils.search_students(query)
+        print(f"\n{result}")
+        
+    except Exception as e:
+        print(f"Error: {e}")
+
+def handle_students_by_age():
+    import student_utils
+    print("\n--- Find Students by Age Range ---")
+    try:
+        min_age = get_safe_input("Enter minimum age: ", "int")
+        if min_age is None:
+            return
+        max_age = get_safe_input("Enter maximum age: ", "int")
+        if max_age is None:
+            return
+        
+        print(f"\n{student_utils.list_students_by_age(min_age, max_age)}")
+        
+        oldest = student_utils.oldest_students(3)
+        if oldest:
+            print("\nOldest students overall:")
+            for name, age in oldest:
+                print(f"  - {name}: {age} years old")
+        
+    except Exception as e:
+        print(f"Error: {e}")
+
 def handle_list_students():
+    import student_utils
     print("\n--- All Students ---")
     try:
-        result = student_utils.list_all_students()
-        print(f"\n{result}")
+        total = len(student_utils.students)
+        if total == 0:
+            print(f"\n{student_utils.list_all_students()}")
+            return
+        
+        print(f"\nCurrent students ({total} total):")
+        cursor = None
+        shown = 0
+        while True:
+            page = list(student_utils.iter_students(limit=student_utils.LIST_PAGE_SIZE, start_after=cursor))
+            for name, age in page:
+                print(f"  - {name}: {age} years old")
+            shown += len(page)
+            if len(page) < student_utils.LIST_PAGE_SIZE:
+                break
+            
+            more = input(f"-- {shown} of {total} shown. Press Enter for more, or 'q' to stop: ").strip().lower()
+            if more == 'q':
+                break
+            cursor = page[-1][0]
         
     except Exception as e:
         print(f"Error: {e}")
 
 def handle_student_stats():
+    import student_utils
     print("\n--- Student Database Statistics ---")
     try:
         result = student_utils.get_student_stats()
@@ -223,6 +287,7 @@ def handle_student_stats():
         print(f"Error: {e}")
 
 def handle_export_csv():
+    import student_utils
     print("\n--- Export Students to CSV ---")
     try:
         result = student_utils.export_to_csv()
@@ -231,8 +296,19 @@ def handle_export_csv():
     except Exception as e:
         print(f"Error: {e}")
 
+def show_import_progress(report):
+    """Print a single updating progress line while a CSV import runs."""
+    if report.total_bytes:
+        percent = 100 * report.bytes_read / report.total_bytes
+        print(f"\r  {percent:5.1f}% - {report.rows_read:,} rows, "
+              f"{report.rows_per_second:,.0f} rows/s, {report.megabytes_per_second:.1f} MB/s",
+              end="", flush=True)
+    if report.bytes_read >= report.total_bytes:
+        print()
+
 def handle_import_csv():
     """Handle importing students from a custom CSV file with error handling."""
+    import student_utils
     print("\n--- Import Students from CSV ---")
     try:
         print("Choose import option:")
@@ -244,6 +320,8 @@ def handle_import_csv():
         if choice is None:
             return
         
+        staged = None
+        
         if choice == "1":
             # Use default CSV file
             file_path = "students.csv"
@@ -274,10 +352,12 @@ def handle_import_csv():
                 return
             
             file_path = file_path.strip('"\'')
-            validation_result = student_utils.validate_csv_format(file_path)
-            print(f"\n{validation_result}")
+            # Validate and parse in one pass; the staged records are committed
+            # below without reading the file again
+            staged = student_utils.stage_csv_import(file_path, progress=show_import_progress, workers=None)
+            print(f"\n{staged.validation_message()}")
             
-            if "ready for import" in validation_result.lower():
+            if staged.ready:
                 proceed = get_safe_input("\nProceed with import? (yes/no): ", "string")
                 if proceed is None or proceed.lower() not in ['yes', 'y']:
                     print("Import cancelled.")
@@ -296,6 +376,16 @@ def handle_import_csv():
             print("Please check the path and try again.")
             return
         
+        def run_import(merge):
+            """Run the import; returns (result message, report)."""
+            if staged:
+                return student_utils.commit_staged_import(staged, merge), staged.report
+            # Created here so its clock does not include the prompts above
+            report = student_utils.ImportReport(file_path)
+            if merge:
+                return student_utils.import_and_merge_csv(file_path, report, show_import_progress, workers=None), report
+            return student_utils.import_from_csv(file_path, report, show_import_progress, workers=None), report
+        
         # Show current data warning
         if len(student_utils.students) > 0:
             print(f"\nWarning: This will replace current student data ({len(student_utils.students)} students).")
@@ -312,22 +402,25 @@ def handle_import_csv():
                 if confirm is None or confirm.lower() not in ['yes', 'y']:
                     print("Import cancelled.")
                     return
-                result = student_utils.import_from_csv(file_path)
+                result, report = run_import(merge=False)
             elif mode_choice == "2":
-                result = student_utils.import_and_merge_csv(file_path)
+                result, report = run_import(merge=True)
             else:
                 print("Invalid choice. Import cancelled.")
                 return
         else:
             # No existing data, just import
-            result = student_utils.import_from_csv(file_path)
+            result, report = run_import(merge=False)
         
         print(f"\n{result}")
+        if report.rows_read:
+            print(f"Read {report.rows_read} rows in {report.elapsed:.2f}s ({report.rows_per_second:,.0f} rows/s)")
+            print(report.format_warnings())
         
         # Show sample of imported data
         if "Successfully" in result:
             print("\nSample of imported data:")
-            sample_students = list(student_utils.students.items())[:5]
+            sample_students = list(itertools.islice(student_utils.students.items(), 5))
             for name, age in sample_students:
                 print(f"  - {name}: {age} years old")
             if len(student_utils.students) > 5:
@@ -378,14 +471,14 @@ def handle_math_operations():
         if numbers is None:
             return
         
-        average = math_utils.calculate_average(numbers)
+        summary = math_utils.describe(numbers, median=True)
         print(f"\nNumbers: {numbers}")
-        print(f"Average: {average:.2f}")
-        
-        min_val, max_val = math_utils.find_min_max(numbers)
-        print(f"Minimum: {min_val}")
-        print(f"Maximum: {max_val}")
-        print(f"Range: {max_val - min_val}")
+        print(f"Average: {summary['mean']:.2f}")
+        print(f"Median: {summary['median']:.2f}")
+        print(f"Minimum: {summary['min']}")
+        print(f"Maximum: {summary['max']}")
+        print(f"Range: {summary['range']}")
+        print(f"Standard deviation: {summary['std_dev']:.2f}")
         
     except Exception as e:
         print(f"Error: {e}")
@@ -423,11 +516,14 @@ def main():
         while True:
             try:
                 display_menu()
-                choice = input("Enter your choice (0-14): ").strip()
+                choice = input("Enter your choice (0-16): ").strip()
                 
                 if choice == '0':
                     print("\nSaving data and exiting...")
-                    if student_utils.save_students_to_json():
+                    student_utils = sys.modules.get("student_utils")
+                    if student_utils is None or not student_utils.is_dirty():
+                        print("No changes to save.")
+                    elif student_utils.save_students_to_json():
                         print("Data saved successfully!")
                     else:
                         print("Warning: Could not save data to file")
@@ -462,13 +558,18 @@ def main():
                     handle_text_operations()
                 elif choice == '14':
                     handle_create_sample_csv()
+                elif choice == '15':
+                    handle_search_students()
+                elif choice == '16':
+                    handle_students_by_age()
                 else:
-                    print("\nInvalid choice. Please select a number from 0-14.")
+                    print("\nInvalid choice. Please select a number from 0-16.")
                     
             except KeyboardInterrupt:
                 print("\n\nProgram interrupted by user.")
                 save_choice = input("Save data before exiting? (yes/no): ").strip().lower()
-                if save_choice in ['yes', 'y']:
+                student_utils = sys.modules.get("student_utils")
+                if save_choice in ['yes', 'y'] and student_utils is not None:
                     if student_utils.save_students_to_json():
                         print("Data saved successfully!")
                     else:
@@ -490,4 +591,9 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:2] == ["--serve"]:
+        # python main.py --serve [--port N | --socket PATH]
+        import student_server
+        student_server.main(sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,602 @@
+"""
+Mergeable streaming accumulators for integer data.
+
+Each accumulator takes values one at a time with add() or in chunks with
+update(), merges with another of its kind built over a different part of
+the data with merge(), and reports its result so far with snapshot():
+
+    stats = RunningStats(sketch=True)
+    with open("numbers.txt") as file:
+        stats.update(int(line) for line in file)
+    print(stats.snapshot(median=True))
+
+update() accepts lists, NumPy arrays, array.array, other buffers of
+integers and any iterable, reading generators CHUNK_SIZE values at a time,
+so input of any length is summarised in bounded memory. Each chunk is
+validated and reduced in a single pass, vectorised for arrays, and the
+reduction is then folded into the accumulator. With workers, large lists
+and arrays are reduced across processes by math_parallel instead.
+"""
+import itertools
+import math
+import operator
+import sys
+from typing import Iterable, NamedTuple, Optional
+
+# Values read from an iterator per chunk
+CHUNK_SIZE = 65536
+# struct format characters of the integer types a buffer may hold
+_INT_FORMATS = frozenset("bBhHiIlLqQnN")
+# The numpy module, None if it is not installed, or _NOT_LOADED before load_numpy()
+_NOT_LOADED = object()
+_numpy = _NOT_LOADED
+
+
+def load_numpy():
+    """
+    Return the numpy module, importing it on first use, or None if it is not installed.
+
+    NumPy is only needed for arrays and buffers, so it is not imported with
+    this module and programs that only pass lists never load it.
+    """
+    global _numpy
+    if _numpy is _NOT_LOADED:
+        try:
+            import numpy
+        except ImportError:  # optional: arrays and buffers are then reduced in pure Python
+            numpy = None
+        _numpy = numpy
+    return _numpy
+
+
+def is_ndarray(value) -> bool:
+    """True if value is a NumPy array; never imports NumPy, since any array implies it is loaded."""
+    numpy = sys.modules.get("numpy")
+    return numpy is not None and isinstance(value, numpy.ndarray)
+
+
+class Partial(NamedTuple):
+    """
+    The reduction of one chunk, which accumulators fold in.
+
+    Fields an accumulator did not ask for are left as None.
+    """
+    count: int
+    total: Optional[int] = None
+    total_sq: Optional[int] = None
+    minimum: Optional[int] = None
+    maximum: Optional[int] = None
+    odd: Optional[int] = None
+
+
+ALL_FIELDS = frozenset(("total", "total_sq", "minimum", "maximum", "odd"))
+
+
+def combine_partials(partials) -> Partial:
+    """Combine the Partials of consecutive chunks into one; fields left as None stay None."""
+    partials = list(partials)
+    first = partials[0]
+
+    def combined(field, reduce):
+        if getattr(first, field) is None:
+            return None
+        return reduce(getattr(partial, field) for partial in partials)
+
+    return Partial(
+        sum(partial.count for partial in partials),
+        combined("total", sum),
+        combined("total_sq", sum),
+        combined("minimum", min),
+        combined("maximum", max),
+        combined("odd", sum),
+    )
+
+
+def as_int_array(numbers):
+    """
+    Return numbers as a flat array of integers validated by its type code, or None.
+
+    NumPy arrays, array.array and other buffer-protocol objects are accepted
+    when their dtype or format is an integer type, so no element needs
+    checking. With NumPy the result is a 1-D ndarray, otherwise a 1-D
+    memoryview. Lists and other iterables return None and are checked
+    element by element.
+    """
+    if isinstance(numbers, list):
+        return None
+    if is_ndarray(numbers):
+        if numbers.dtype.kind not in "iu":
+            raise TypeError(f"Array must hold integers, got dtype {numbers.dtype}")
+        return numbers.ravel()
+    try:
+        view = memoryview(numbers)
+    except TypeError:
+        return None
+    format_char = view.format.lstrip("@")
+    numpy = load_numpy()
+    if numpy is not None:
+        values = numpy.asarray(view).ravel()
+        if values.dtype.kind not in "iu":
+            raise TypeError(f"Buffer must hold integers, got format '{view.format}'")
+        return values
+    if format_char not in _INT_FORMATS:
+        raise TypeError(f"Buffer must hold native integers, got format '{view.format}'")
+    if view.ndim == 1:
+        return view
+    return memoryview(view.tobytes()).cast(format_char)
+
+
+def _array_sum(values, bound: int) -> int:
+    """Sum an integer array exactly, as Python's sum() would; bound is its largest absolute value."""
+    numpy = load_numpy()
+    if numpy is None:
+        return sum(values)
+    if values.dtype.itemsize < 8 or bound * len(values) < 2 ** 63:
+        return int(values.sum(dtype=numpy.int64))
+    # Sum the low and high 32 bits separately so neither total can overflow
+    word = values.dtype.type
+    low = int((values & word(0xFFFFFFFF)).sum(dtype=numpy.uint64))
+    high = int((values >> word(32)).sum(dtype=values.dtype))
+    return (high << 32) + low
+
+
+def _array_sum_sq(values, bound: int) -> int:
+    numpy = load_numpy()
+    if numpy is not None and bound * bound * len(values) < 2 ** 63:
+        wide = values.astype(numpy.int64, copy=False)
+        return int(numpy.dot(wide, wide))
+    return sum(value * value for value in (values.tolist() if numpy is not None else values))
+
+
+def _array_odd_count(values) -> int:
+    numpy = load_numpy()
+    if numpy is None:
+        return sum(value & 1 for value in values)
+    return int(numpy.count_nonzero(values & values.dtype.type(1)))
+
+
+def _array_min_max(values) -> tuple:
+    if not is_ndarray(values):
+        return min(values), max(values)
+    return int(values.min()), int(values.max())
+
+
+def fold_array(values, fields=ALL_FIELDS) -> Partial:
+    """Reduce a non-empty integer array from as_int_array() with vectorised kernels."""
+    minimum = maximum = bound = None
+    if fields & {"minimum", "maximum", "total_sq"} or (is_ndarray(values) and values.dtype.itemsize == 8):
+        minimum, maximum = _array_min_max(values)
+        bound = max(abs(minimum), abs(maximum))
+    return Partial(
+        len(values),
+        _array_sum(values, bound) if "total" in fields else None,
+        _array_sum_sq(values, bound) if "total_sq" in fields else None,
+        minimum,
+        maximum,
+        _array_odd_count(values) if "odd" in fields else None,
+    )
+
+
+def check_list(numbers: list, start_index: int = 0) -> None:
+    """Raise TypeError naming the first element of numbers that is not an integer."""
+    # Comparing the set of types runs in C; only a list holding something
+    # other than plain ints and bools needs the element-by-element check
+    if set(map(type, numbers)) <= {int, bool}:
+        return
+    for i, num in enumerate(numbers):
+        if not isinstance(num, int):
+            raise TypeError(f"Element at index {start_index + i} is not an integer: {num}")
+
+
+def fold_list(numbers: list, start_index: int = 0, fields=ALL_FIELDS) -> Partial:
+    """
+    Validate a non-empty list of integers and reduce it.
+
+    Every field is computed in a single fused pass. A few fields are cheaper
+    as separate passes of built-in functions, which run in C, so that is how
+    smaller requests are served.
+
+    Args:
+        numbers: The values
+        start_index: Index of numbers[0] in the whole input, for error messages
+        fields: The Partial fields wanted
+    """
+    if fields != ALL_FIELDS:
+        check_list(numbers, start_index)
+        return Partial(
+            len(numbers),
+            sum(numbers) if "total" in fields else None,
+            sum(map(operator.mul, numbers, numbers)) if "total_sq" in fields else None,
+            min(numbers) if "minimum" in fields else None,
+            max(numbers) if "maximum" in fields else None,
+            sum(map(operator.and_, numbers, itertools.repeat(1))) if "odd" in fields else None,
+        )
+
+    first = numbers[0]
+    if not isinstance(first, int):
+        raise TypeError(f"Element at index {start_index} is not an integer: {first}")
+    total = minimum = maximum = first
+    total_sq = first * first
+    odd_count = first & 1
+    for i in range(1, len(numbers)):
+        num = numbers[i]
+        if not isinstance(num, int):
+            raise TypeError(f"Element at index {start_index + i} is not an integer: {num}")
+        total += num
+        total_sq += num * num
+        odd_count += num & 1
+        if num < minimum:
+            minimum = num
+        elif num > maximum:
+            maximum = num
+    return Partial(len(numbers), total, total_sq, minimum, maximum, odd_count)
+
+
+def iter_chunks(values, start_index: int = 0, fields=ALL_FIELDS, workers: int = 1) -> Iterable[tuple]:
+    """
+    Split input into chunks and reduce each one.
+
+    Args:
+        values: A list, array, buffer or iterable of integers
+        start_index: Number of values already consumed, for error messages
+        fields: The Partial fields wanted
+        workers: Worker processes for lists and arrays above the cutoffs in
+            math_parallel; None uses every CPU
+
+    Yields:
+        (partial, chunk) pairs for each non-empty chunk, where chunk is a
+        list or an array from as_int_array()
+    """
+    if workers != 1:
+        # Imported here: multiprocessing is slow to import and only large inputs need it
+        import math_parallel
+        partial = math_parallel.parallel_partial(values, fields, workers)
+        if partial is not None:
+            yield partial, values if isinstance(values, list) else as_int_array(values)
+            return
+    array = as_int_array(values)
+    if array is not None:
+        if len(array):
+            yield fold_array(array, fields), array
+        return
+    if isinstance(values, list):
+        if values:
+            yield fold_list(values, start_index, fields), values
+        return
+    try:
+        iterator = iter(values)
+    except TypeError:
+        raise TypeError("Input must be a list, array or iterable of integers") from None
+    while True:
+        chunk = list(itertools.islice(iterator, CHUNK_SIZE))
+        if not chunk:
+            return
+        yield fold_list(chunk, start_index, fields), chunk
+        start_index += len(chunk)
+
+
+def _check_value(value) -> None:
+    if not isinstance(value, int):
+        raise TypeError(f"Value is not an integer: {value}")
+
+
+class Accumulator:
+    """
+    Base class for the accumulators: count, add(), update() and merge().
+
+    Subclasses name the Partial fields they use in fields, fold each
+    chunk's Partial in _absorb() and another accumulator's state in
+    _merge(); count is kept here, after both.
+    """
+
+    fields = frozenset()
+
+    def __init__(self):
+        self.count = 0
+
+    def add(self, value: int) -> "Accumulator":
+        """Fold in a single integer."""
+        _check_value(value)
+        self._absorb(Partial(1, value, value * value, value, value, value & 1), (value,))
+        self.count += 1
+        return self
+
+    def update(self, values, workers: int = 1) -> "Accumulator":
+        """
+        Fold in a list, array, buffer or iterable of integers, chunk by chunk.
+
+        Args:
+            values: The integers
+            workers: Worker processes to reduce large lists and arrays with;
+                None uses every CPU
+        """
+        for partial, chunk in iter_chunks(values, self.count, self.fields, workers):
+            self._absorb(partial, chunk)
+            self.count += partial.count
+        return self
+
+    def absorb(self, partial: Partial, chunk=None) -> "Accumulator":
+        """Fold in a chunk already reduced elsewhere, such as in another process."""
+        self._absorb(partial, chunk)
+        self.count += partial.count
+        return self
+
+    def merge(self, other: "Accumulator") -> "Accumulator":
+        """Fold in another accumulator of the same kind, built over other data."""
+        if type(other) is not type(self):
+            raise TypeError(f"Cannot merge {type(other).__name__} into {type(self).__name__}")
+        self._merge(other)
+        self.count += other.count
+        return self
+
+    def _absorb(self, partial: Partial, chunk) -> None:
+        raise NotImplementedError
+
+    def _merge(self, other: "Accumulator") -> None:
+        raise NotImplementedError
+
+    def snapshot(self) -> dict:
+        raise NotImplementedError
+
+
+class EvenOddCounter(Accumulator):
+    """Counts of even and odd values."""
+
+    fields = frozenset(("odd",))
+
+    def __init__(self):
+        super().__init__()
+        self.odd = 0
+
+    @property
+    def even(self) -> int:
+        return self.count - self.odd
+
+    def _absorb(self, partial: Partial, chunk) -> None:
+        self.odd += partial.odd
+
+    def _merge(self, other: "EvenOddCounter") -> None:
+        self.odd += other.odd
+
+    def snapshot(self) -> dict:
+        return {"count": self.count, "even": self.even, "odd": self.odd}
+
+
+class MinMax(Accumulator):
+    """Running minimum and maximum; both None until a value arrives."""
+
+    fields = frozenset(("minimum", "maximum"))
+
+    def __init__(self):
+        super().__init__()
+        self.minimum = None
+        self.maximum = None
+
+    def _absorb(self, partial: Partial, chunk) -> None:
+        self._include(partial.minimum, partial.maximum)
+
+    def _merge(self, other: "MinMax") -> None:
+        if other.count:
+            self._include(other.minimum, other.maximum)
+
+    def _include(self, minimum: int, maximum: int) -> None:
+        if self.minimum is None or minimum < self.minimum:
+            self.minimum = minimum
+        if self.maximum is None or maximum > self.maximum:
+            self.maximum = maximum
+
+    def snapshot(self) -> dict:
+        value_range = None if self.minimum is None else self.maximum - self.minimum
+        return {"count": self.count, "min": self.minimum, "max": self.maximum, "range": value_range}
+
+
+class MeanVariance(Accumulator):
+    """
+    Exact running sum, mean and population variance.
+
+    The values are integers, so the sum and sum of squares are kept as exact
+    Python ints: merging partitions adds them, and the variance is computed
+    with integer arithmetic up to the final division. That is exact and
+    order-independent, where Welford's floating-point update only bounds the
+    rounding error.
+
+    With variance=False only the sum is kept, which is all the mean needs.
+    """
+
+    def __init__(self, variance: bool = True):
+        super().__init__()
+        self.fields = frozenset(("total", "total_sq")) if variance else frozenset(("total",))
+        self.total = 0
+        self.total_sq = 0 if variance else None
+
+    def _absorb(self, partial: Partial, chunk) -> None:
+        self.total += partial.total
+        if self.total_sq is not None:
+            self.total_sq += partial.total_sq
+
+    def _merge(self, other: "MeanVariance") -> None:
+        if (self.total_sq is None) != (other.total_sq is None):
+            raise ValueError("Cannot merge MeanVariance with and without variance")
+        self.total += other.total
+        if self.total_sq is not None:
+            self.total_sq += other.total_sq
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    @property
+    def variance(self) -> Optional[float]:
+        if not self.count or self.total_sq is None:
+            return None
+        return (self.count * self.total_sq - self.total * self.total) / (self.count * self.count)
+
+    def snapshot(self) -> dict:
+        variance = self.variance
+        return {"count": self.count, "sum": self.total, "mean": self.mean, "variance": variance,
+                "std_dev": None if variance is None else math.sqrt(variance)}
+
+
+def interpolate(ordered, count: int, percent: float) -> float:
+    """
+    Return a percentile by linear interpolation between ranks.
+
+    Args:
+        ordered: Callable returning the value at a zero-based rank in sorted order
+        count: Number of values
+        percent: Percentile between 0 and 100
+    """
+    if not 0 <= percent <= 100:
+        raise ValueError(f"Percentile must be between 0 and 100, got {percent}")
+    position = (count - 1) * percent / 100
+    lower = ordered(math.floor(position))
+    upper = ordered(math.ceil(position))
+    return lower + (upper - lower) * (position - math.floor(position))
+
+
+class QuantileSketch(Accumulator):
+    """
+    Approximate percentiles in bounded memory (a KLL sketch).
+
+    Values are buffered in a stack of compactors. When one is full it is
+    sorted and every other value is promoted to the level above, where each
+    value stands for twice as many; which half is promoted alternates, so
+    errors do not build up in one direction. A percentile's rank error is
+    typically within a few times count / k, and memory is O(k) values plus a
+    few per level. Results are exact until k values have been added.
+    """
+
+    fields = frozenset()
+
+    def __init__(self, k: int = 200):
+        super().__init__()
+        if k < 2:
+            raise ValueError(f"k must be at least 2, got {k}")
+        self.k = k
+        self._levels = [[]]
+        self._flips = [0]
+
+    def _capacity(self, level: int) -> int:
+        # Lower levels get geometrically smaller buffers
+        depth = len(self._levels) - level - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def _absorb(self, partial: Partial, chunk) -> None:
+        if chunk is None:
+            raise ValueError("QuantileSketch needs the values, not just their reduction")
+        self._levels[0].extend(chunk.tolist() if hasattr(chunk, "tolist") else chunk)
+        self._compress()
+
+    def _merge(self, other: "QuantileSketch") -> None:
+        while len(self._levels) < len(other._levels):
+            self._levels.append([])
+            self._flips.append(0)
+        for level, items in enumerate(other._levels):
+            self._levels[level].extend(items)
+        self._compress()
+
+    def _compress(self) -> None:
+        level = 0
+        while level < len(self._levels):
+            items = self._levels[level]
+            if len(items) >= self._capacity(level):
+                if level + 1 == len(self._levels):
+                    self._levels.append([])
+                    self._flips.append(0)
+                items.sort()
+                # An odd value out stays at this level
+                keep = items[-1:] if len(items) % 2 else []
+                self._flips[level] ^= 1
+                self._levels[level + 1].extend(items[self._flips[level]:len(items) - len(keep):2])
+                self._levels[level] = keep
+            level += 1
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Return the approximate percentile, interpolating while the sketch is still exact."""
+        if not self.count:
+            return None
+        if len(self._levels) == 1:
+            ordered = sorted(self._levels[0])
+            return interpolate(ordered.__getitem__, self.count, percent)
+        if not 0 <= percent <= 100:
+            raise ValueError(f"Percentile must be between 0 and 100, got {percent}")
+        weighted = sorted((value, 1 << level) for level, items in enumerate(self._levels) for value in items)
+        rank = (self.count - 1) * percent / 100
+        seen = 0
+        for value, weight in weighted:
+            seen += weight
+            if seen > rank:
+                return float(value)
+        return float(weighted[-1][0])
+
+    @property
+    def retained(self) -> int:
+        """Number of values held, which bounds memory."""
+        return sum(len(items) for items in self._levels)
+
+    def snapshot(self, percentiles: Iterable[float] = (25, 50, 75)) -> dict:
+        return {"count": self.count, "percentiles": {percent: self.percentile(percent) for percent in percentiles}}
+
+
+class RunningStats(Accumulator):
+    """
+    Everything math_utils.describe() reports, accumulated chunk by chunk.
+
+    Each chunk is reduced once and folded into a MeanVariance, MinMax and
+    EvenOddCounter, and, with sketch=True, a QuantileSketch for the median
+    and percentiles.
+    """
+
+    fields = ALL_FIELDS
+
+    def __init__(self, sketch: bool = False, k: int = 200):
+        super().__init__()
+        self.moments = MeanVariance()
+        self.extremes = MinMax()
+        self.parity = EvenOddCounter()
+        self.sketch = QuantileSketch(k) if sketch else None
+
+    def _parts(self) -> list:
+        parts = [self.moments, self.extremes, self.parity]
+        return parts + [self.sketch] if self.sketch is not None else parts
+
+    def _absorb(self, partial: Partial, chunk) -> None:
+        for part in self._parts():
+            part.absorb(partial, chunk)
+
+    def _merge(self, other: "RunningStats") -> None:
+        if (self.sketch is None) != (other.sketch is None):
+            raise ValueError("Cannot merge RunningStats with and without a quantile sketch")
+        for part, other_part in zip(self._parts(), other._parts()):
+            part.merge(other_part)
+
+    def snapshot(self, percentiles: Iterable[float] = None, median: bool = False) -> dict:
+        """
+        Return count, sum, mean, min, max, range, even, odd, variance and std_dev so far.
+
+        Args:
+            percentiles: Percentiles to estimate from the sketch, returned as
+                "percentiles" ({percent: value})
+            median: Also estimate the median, returned as "median"
+        """
+        moments = self.moments.snapshot()
+        extremes = self.extremes.snapshot()
+        summary = {
+            "count": self.count,
+            "sum": moments["sum"],
+            "mean": moments["mean"],
+            "min": extremes["min"],
+            "max": extremes["max"],
+            "range": extremes["range"],
+            "even": self.parity.even,
+            "odd": self.parity.odd,
+            "variance": moments["variance"],
+            "std_dev": moments["std_dev"],
+        }
+        if (percentiles or median) and self.sketch is None:
+            raise ValueError("Percentiles need RunningStats(sketch=True)")
+        if percentiles:
+            summary["percentiles"] = {percent: self.sketch.percentile(percent) for percent in percentiles}
+        if median:
+            summary["median"] = self.sketch.percentile(50)
+        return summary
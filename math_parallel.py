@@ -0,0 +1,129 @@
+"""
+Parallel reduction of large integer inputs for math_accumulators.
+
+The input is copied once into a multiprocessing.shared_memory block as a
+flat array of fixed-size integers. Each worker attaches to the block by
+name and reduces its own slice with the vectorised kernels, so only the
+block's name and a small Partial per slice cross process boundaries;
+the input itself is never pickled. The partials are then combined in the
+calling process.
+
+Inputs shorter than a cutoff are reduced serially, where copying them and
+starting worker processes would cost more than it saves. The cutoff is
+much higher for arrays and buffers, which are already reduced by
+vectorised kernels, than for lists, which are otherwise folded in Python.
+"""
+import array
+import os
+from multiprocessing import shared_memory
+from typing import List, Optional
+
+import math_accumulators
+from math_accumulators import ALL_FIELDS, Partial, combine_partials
+
+# Lists with fewer elements than this are always reduced serially
+PARALLEL_MIN_ELEMENTS = 1_000_000
+# Arrays and buffers with fewer elements than this are always reduced serially
+PARALLEL_MIN_ARRAY_ELEMENTS = 20_000_000
+
+
+def resolve_workers(workers: int) -> int:
+    """Return the worker count to use; None means every CPU."""
+    if workers is None:
+        return os.cpu_count() or 1
+    return max(1, workers)
+
+
+def _shared_layout(numbers):
+    """
+    Return (source, format character, item count) for copying numbers into shared memory.
+
+    Lists are packed into an array.array of 64-bit ints, which checks every
+    element's type in C. Returns None for input that cannot be packed, such
+    as lists holding integers outside the int64 range or other types; the
+    serial path then reduces or rejects it.
+    """
+    values = math_accumulators.as_int_array(numbers)
+    if values is None:
+        if not isinstance(numbers, list):
+            return None
+        try:
+            values = array.array("q", numbers)
+        except (OverflowError, TypeError):
+            return None
+    if math_accumulators.is_ndarray(values):
+        values = math_accumulators.load_numpy().ascontiguousarray(values)
+        return values, values.dtype.char, len(values)
+    view = memoryview(values)
+    return view, view.format.lstrip("@"), len(view)
+
+
+def _reduce_slice(name: str, format_char: str, start: int, stop: int, fields) -> Partial:
+    """Attach to a shared block in a worker and reduce items [start, stop) of it."""
+    # Workers share the caller's resource tracker, so attaching here
+    # registers nothing new and the caller's unlink() accounts for the block
+    block = shared_memory.SharedMemory(name=name)
+    numpy = math_accumulators.load_numpy()
+    try:
+        itemsize = array.array(format_char).itemsize if numpy is None else numpy.dtype(format_char).itemsize
+        view = block.buf[start * itemsize:stop * itemsize]
+        values = view.cast(format_char) if numpy is None else numpy.frombuffer(view, dtype=format_char)
+        try:
+            return math_accumulators.fold_array(values, fields)
+        finally:
+            # Every export of the buffer must be gone before the block closes
+            del values
+            view.release()
+    finally:
+        block.close()
+
+
+def parallel_partial(numbers, fields=ALL_FIELDS, workers: int = None) -> Optional[Partial]:
+    """
+    Reduce a list, array or buffer of integers across worker processes.
+
+    Args:
+        numbers: The input; iterables that are not lists, arrays or buffers
+            are not supported
+        fields: The Partial fields wanted
+        workers: Number of worker processes; None uses every CPU
+
+    Returns:
+        The combined Partial, or None if the input is below its cutoff,
+        only one worker is available, or the input cannot be shared; the
+        caller then reduces it serially
+    """
+    workers = resolve_workers(workers)
+    cutoff = PARALLEL_MIN_ELEMENTS if isinstance(numbers, list) else PARALLEL_MIN_ARRAY_ELEMENTS
+    if workers < 2 or not hasattr(numbers, "__len__") or len(numbers) < cutoff:
+        return None
+    layout = _shared_layout(numbers)
+    if layout is None:
+        return None
+    source, format_char, count = layout
+    if count < cutoff:
+        return None
+
+    # Imported here: concurrent.futures pulls in multiprocessing's pool machinery
+    from concurrent.futures import ProcessPoolExecutor
+
+    numpy = math_accumulators.load_numpy()
+    nbytes = source.nbytes
+    block = shared_memory.SharedMemory(create=True, size=nbytes)
+    try:
+        if numpy is not None and isinstance(source, numpy.ndarray):
+            target = numpy.ndarray(source.shape, dtype=source.dtype, buffer=block.buf)
+            target[:] = source
+            del target
+        else:
+            block.buf[:nbytes] = source.cast("B")
+
+        bounds = [count * i // workers for i in range(workers + 1)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_reduce_slice, block.name, format_char, start, stop, fields)
+                       for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+            partials: List[Partial] = [future.result() for future in futures]
+    finally:
+        block.close()
+        block.unlink()
+    return combine_partials(partials)
@@ -1,78 +1,213 @@
-def count_even_odd(numbers: list[int]) -> tuple[int, int]:
+import decimal
+import math
+
+import math_accumulators
+from math_accumulators import EvenOddCounter, MeanVariance, MinMax, RunningStats, interpolate
+
+
+def _accumulate(accumulator, numbers, workers: int = 1):
+    """Feed numbers to accumulator, rejecting empty input as the list functions always have."""
+    accumulator.update(numbers, workers)
+    if not accumulator.count:
+        raise ValueError("List cannot be empty" if isinstance(numbers, list) else "Input cannot be empty")
+    return accumulator
+
+
+def count_even_odd(numbers: list[int], workers: int = 1) -> tuple[int, int]:
     try:
-        if not isinstance(numbers, list):
-            raise TypeError("Input must be a list")
-        
-        if not numbers:
-            raise ValueError("List cannot be empty")
-        
-        even_count = 0
-        odd_count = 0
-        
-        for i, num in enumerate(numbers):
-            if not isinstance(num, int):
-                raise TypeError(f"Element at index {i} is not an integer: {num}")
-            
-            if num % 2 == 0:
-                even_count += 1
-            else:
-                odd_count += 1
-        
-        return even_count, odd_count
+        counter = _accumulate(EvenOddCounter(), numbers, workers)
+        return counter.even, counter.odd
         
     except Exception as e:
         raise Exception(f"Error in count_even_odd: {e}")
 
+# Integers up to this many bits are converted with str(), which is quadratic
+# but fast at this size and well inside Python's int-to-str digit limit
+_STR_DIGITS_MAX_BITS = 8192
+# Bit width at which _decimal_digits stops splitting and converts directly
+_DECIMAL_LEAF_BITS = 2048
+
+
+def _digit_string_sum(digits: str) -> int:
+    # str.count runs in C, once per non-zero digit
+    return sum(digit * digits.count(str(digit)) for digit in range(1, 10))
+
+
+def _decimal_digits(n: int) -> str:
+    """
+    Return the decimal digits of a huge non-negative integer in subquadratic time.
+
+    n is split in binary, which is linear, and reassembled as hi * 2**w + lo
+    in decimal.Decimal, whose multiplication is subquadratic for large
+    operands; str() of the resulting Decimal is linear.
+    """
+    powers = {}
+
+    def power_of_two(bits: int):
+        if bits not in powers:
+            powers[bits] = decimal.Decimal(2) ** bits
+        return powers[bits]
+
+    def convert(value: int, bits: int):
+        if bits <= _DECIMAL_LEAF_BITS:
+            return decimal.Decimal(value)
+        low_bits = bits >> 1
+        high = value >> low_bits
+        low = value - (high << low_bits)
+        return convert(low, low_bits) + convert(high, bits - low_bits) * power_of_two(low_bits)
+
+    with decimal.localcontext() as context:
+        context.prec = decimal.MAX_PREC
+        context.Emax = decimal.MAX_EMAX
+        context.Emin = decimal.MIN_EMIN
+        context.traps[decimal.Inexact] = True
+        return str(convert(n, n.bit_length()))
+
+
+def _digit_sum(n: int) -> int:
+    n = abs(n)
+    if n.bit_length() <= _STR_DIGITS_MAX_BITS:
+        try:
+            return _digit_string_sum(str(n))
+        except ValueError:
+            pass  # sys.set_int_max_str_digits() lowered below n's length
+    return _digit_string_sum(_decimal_digits(n))
+
+
 def sum_of_digits(n: int) -> int:
     try:
         if not isinstance(n, int):
             raise TypeError(f"Input must be an integer, got {type(n).__name__}")
         
-        n = abs(n)
-        digit_sum = 0
-        
-        if n == 0:
-            return 0
-        
-        while n > 0:
-            digit_sum += n % 10
-            n //= 10
-        
-        return digit_sum
+        return _digit_sum(n)
         
     except Exception as e:
         raise Exception(f"Error in sum_of_digits: {e}")
 
-def calculate_average(numbers: list[int]) -> float:
+def _digit_sums_vectorised(values) -> list[int]:
+    """Digit sums of a NumPy integer array, three digits per step via a lookup table."""
+    numpy = math_accumulators.load_numpy()
+    if values.dtype.kind == "i":
+        # Widen first: abs() of a narrow type's minimum wraps within that type.
+        # For int64 it still wraps, but reads back correctly as unsigned.
+        values = numpy.abs(values.astype(numpy.int64)).astype(numpy.uint64)
+    else:
+        values = values.astype(numpy.uint64)
+    table = numpy.array([_digit_string_sum(str(i)) for i in range(1000)], dtype=numpy.int64)
+    sums = numpy.zeros(len(values), dtype=numpy.int64)
+    while len(values) and values.any():
+        values, low = numpy.divmod(values, numpy.uint64(1000))
+        sums += table[low]
+    return sums.tolist()
+
+
+def sum_of_digits_batch(numbers: list[int]) -> list[int]:
+    """
+    Return the digit sum of every integer in numbers.
+
+    NumPy arrays, array.array and other integer buffers, and lists whose
+    values fit in 64 bits, are processed with vectorised digit extraction
+    when NumPy is installed; anything else falls back to sum_of_digits()
+    per value.
+
+    Args:
+        numbers: A list, array or buffer of integers
+
+    Returns:
+        The digit sums, in input order
+    """
     try:
-        if not isinstance(numbers, list):
-            raise TypeError("Input must be a list")
-        
-        if not numbers:
-            raise ValueError("List cannot be empty")
-        
-        for i, num in enumerate(numbers):
-            if not isinstance(num, int):
-                raise TypeError(f"Element at index {i} is not an integer: {num}")
-        
-        return sum(numbers) / len(numbers)
+        numpy = math_accumulators.load_numpy()
+        values = math_accumulators.as_int_array(numbers)
+        if values is None:
+            if not isinstance(numbers, list):
+                raise TypeError("Input must be a list, array or buffer of integers")
+            math_accumulators.check_list(numbers)
+            if numpy is not None:
+                try:
+                    values = numpy.array(numbers, dtype=numpy.int64)
+                except OverflowError:
+                    pass
+        if numpy is not None and values is not None:
+            return _digit_sums_vectorised(values)
+        return [_digit_sum(n) for n in (numbers if values is None else values)]
+
+    except Exception as e:
+        raise Exception(f"Error in sum_of_digits_batch: {e}")
+
+def calculate_average(numbers: list[int], workers: int = 1) -> float:
+    try:
+        return _accumulate(MeanVariance(variance=False), numbers, workers).mean
         
     except Exception as e:
         raise Exception(f"Error in calculate_average: {e}")
 
-def find_min_max(numbers: list[int]) -> tuple[int, int]:
+def find_min_max(numbers: list[int], workers: int = 1) -> tuple[int, int]:
     try:
-        if not isinstance(numbers, list):
-            raise TypeError("Input must be a list")
-        
-        if not numbers:
-            raise ValueError("List cannot be empty")
-        
-        for i, num in enumerate(numbers):
-            if not isinstance(num, int):
-                raise TypeError(f"Element at index {i} is not an integer: {num}")
-        
-        return min(numbers), max(numbers)
+        extremes = _accumulate(MinMax(), numbers, workers)
+        return extremes.minimum, extremes.maximum
         
     except Exception as e:
         raise Exception(f"Error in find_min_max: {e}")
+
+def _order_statistics(values, ranks: set) -> dict:
+    """
+    Return {rank: value} for the given zero-based ranks in sorted order.
+
+    NumPy arrays are partitioned around just those ranks in linear time;
+    anything else is sorted, since sorted() in C beats a selection loop in Python.
+    """
+    if math_accumulators.is_ndarray(values):
+        ordered = math_accumulators.load_numpy().partition(values, sorted(ranks))
+        return {rank: int(ordered[rank]) for rank in ranks}
+    ordered = sorted(values)
+    return {rank: ordered[rank] for rank in ranks}
+
+
+def describe(numbers: list[int], percentiles=None, median: bool = False, workers: int = 1) -> dict:
+    """
+    Summarise integers in a single pass.
+
+    Args:
+        numbers: A list, array, buffer or any iterable of integers
+        percentiles: Optional percentiles between 0 and 100 to compute, by
+            linear interpolation between ranks
+        median: Also compute the median
+        workers: Number of processes used to reduce lists and arrays above
+            the cutoffs in math_parallel; None uses every CPU
+
+    Returns:
+        Dict with count, sum, mean, min, max, range, even, odd, population
+        variance and std_dev, plus "median" and "percentiles" ({percent:
+        value}) when requested. For lists and arrays those are exact and
+        need a second, selection step over the data; other iterables are
+        read only once, so they are estimated with a QuantileSketch.
+    """
+    try:
+        wanted = list(percentiles or ()) + ([50] if median else [])
+        values = math_accumulators.as_int_array(numbers)
+        if values is None and isinstance(numbers, list):
+            values = numbers
+        streamed = values is None and bool(wanted)
+
+        stats = _accumulate(RunningStats(sketch=streamed), numbers, workers)
+        summary = stats.snapshot(percentiles, median) if streamed else stats.snapshot()
+
+        if wanted and not streamed:
+            ranks = set()
+            for percent in wanted:
+                if not 0 <= percent <= 100:
+                    raise ValueError(f"Percentile must be between 0 and 100, got {percent}")
+                position = (stats.count - 1) * percent / 100
+                ranks.update((math.floor(position), math.ceil(position)))
+            ordered = _order_statistics(values, ranks).__getitem__
+            if percentiles:
+                summary["percentiles"] = {percent: interpolate(ordered, stats.count, percent)
+                                          for percent in percentiles}
+            if median:
+                summary["median"] = interpolate(ordered, stats.count, 50)
+
+        return summary
+
+    except Exception as e:
+        raise Exception(f"Error in describe: {e}")
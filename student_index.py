@@ -0,0 +1,358 @@
+import heapq
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+MAX_FUZZY_DISTANCE = 2
+# Keys up to this long are also indexed by their deletion neighbourhood. That
+# covers every candidate for a query too short for the trigram filter, which
+# has at most 3 * MAX_FUZZY_DISTANCE - 1 characters.
+SHORT_KEY_LENGTH = 4 * MAX_FUZZY_DISTANCE - 1
+
+
+def normalize_name(name: str) -> str:
+    """Case-fold a name and collapse runs of whitespace, for case-insensitive matching."""
+    return " ".join(name.casefold().split())
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _deletions(key: str, depth: int) -> List[Set[str]]:
+    """Return, for 0 to depth, the strings made by deleting exactly that many characters from key."""
+    levels = [{key}]
+    for _ in range(depth):
+        levels.append({word[:i] + word[i + 1:] for word in levels[-1] for i in range(len(word))})
+    return levels
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> Optional[int]:
+    """
+    Return the Levenshtein distance between a and b, or None if it exceeds max_distance.
+
+    Uses Hyyro's bit-parallel form of Myers' algorithm: each column of the
+    dynamic-programming table is held as bit vectors of its vertical deltas,
+    so a character of b costs a few integer operations instead of a loop over
+    a. The bottom cell can fall by at most one per remaining character, which
+    ends the scan early once max_distance is out of reach.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    if len(a) > len(b):
+        a, b = b, a
+    if not a:
+        return len(b)
+
+    matches: Dict[str, int] = {}
+    for i, char in enumerate(a):
+        matches[char] = matches.get(char, 0) | (1 << i)
+    mask = (1 << len(a)) - 1
+    last = 1 << (len(a) - 1)
+    # Positive and negative vertical deltas; the first column counts up from 0
+    positive, negative = mask, 0
+    distance = len(a)
+    remaining = len(b)
+    for char in b:
+        remaining -= 1
+        equal = matches.get(char, 0)
+        vertical = equal | negative
+        horizontal = (((equal & positive) + positive) ^ positive) | equal
+        h_positive = (negative | ~(horizontal | positive)) & mask
+        h_negative = positive & horizontal
+        if h_positive & last:
+            distance += 1
+        elif h_negative & last:
+            distance -= 1
+        # The top row counts up by one per character of b
+        h_positive = (h_positive << 1) | 1
+        h_negative <<= 1
+        positive = (h_negative | ~(vertical | h_positive)) & mask
+        negative = h_positive & vertical & mask
+        if distance - remaining > max_distance:
+            return None
+    return distance if distance <= max_distance else None
+
+
+class NameIndex:
+    """
+    Secondary index over student names for case-insensitive, prefix and fuzzy lookup.
+
+    Names are normalised with normalize_name. A sorted list of normalised keys
+    answers prefix queries with one binary search, and a map from key to the
+    original spellings answers case-insensitive matches.
+
+    Fuzzy suggestions never scan every key. Two posting maps are kept up to
+    date as names are added and removed:
+
+    - A trigram index. A name within edit distance d of the query must share
+      at least one of the query's 3d + 1 rarest trigrams, so only those
+      posting lists are read.
+    - For keys of at most SHORT_KEY_LENGTH characters, maps from every
+      string made by deleting 0 to MAX_FUZZY_DISTANCE characters, one map
+      per number deleted. Two keys within d edits share a string made by at
+      most d deletions from each, so queries too short for the trigram
+      filter look up their own deletions instead.
+
+    The candidates are then checked with a banded edit distance. To keep the
+    maps small, each key gets an integer id and the posting lists are arrays
+    of ids, 4 bytes per entry; the spellings of a key are a sorted tuple. A
+    removed key's id is only marked dead, since taking it out of every array
+    would cost a scan of each; the arrays are rebuilt without dead ids once
+    those outnumber the live ones.
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        spellings = defaultdict(set)
+        for name in names:
+            spellings[normalize_name(name)].add(name)
+        self._names_by_key: Dict[str, Tuple[str, ...]] = {
+            key: tuple(sorted(names)) for key, names in spellings.items()}
+        del spellings
+        self._keys = sorted(self._names_by_key)
+        self._build_postings()
+
+    def _build_postings(self) -> None:
+        """Number the keys in order and index each of them."""
+        self._keys_by_id: List[Optional[str]] = list(self._keys)
+        self._ids: Dict[str, int] = {key: key_id for key_id, key in enumerate(self._keys)}
+        # Ids of removed keys still present in the posting arrays
+        self._dead = 0
+        self._grams: Dict[str, array] = {}
+        self._deletes: List[Dict[str, array]] = [{} for _ in range(MAX_FUZZY_DISTANCE + 1)]
+        for key_id, key in enumerate(self._keys):
+            self._index_key(key_id, key)
+
+    def __len__(self) -> int:
+        return sum(len(names) for names in self._names_by_key.values())
+
+    def add(self, name: str) -> None:
+        key = normalize_name(name)
+        names = self._names_by_key.get(key)
+        if names is None:
+            self._names_by_key[key] = (name,)
+            insort(self._keys, key)
+            key_id = len(self._keys_by_id)
+            self._keys_by_id.append(key)
+            self._ids[key] = key_id
+            self._index_key(key_id, key)
+        elif name not in names:
+            self._names_by_key[key] = tuple(sorted(names + (name,)))
+
+    def discard(self, name: str) -> None:
+        key = normalize_name(name)
+        names = self._names_by_key.get(key)
+        if names is None or name not in names:
+            return
+        if len(names) > 1:
+            self._names_by_key[key] = tuple(spelling for spelling in names if spelling != name)
+            return
+
+        del self._names_by_key[key]
+        position = bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            del self._keys[position]
+        self._keys_by_id[self._ids.pop(key)] = None
+        self._dead += 1
+        if self._dead > len(self._ids):
+            self._build_postings()
+
+    def _index_key(self, key_id: int, key: str) -> None:
+        lookups = [(self._grams, _trigrams(key))]
+        if len(key) <= SHORT_KEY_LENGTH:
+            lookups.extend(zip(self._deletes, _deletions(key, MAX_FUZZY_DISTANCE)))
+        for index, entries in lookups:
+            for entry in entries:
+                postings = index.get(entry)
+                if postings is None:
+                    index[entry] = array('I', (key_id,))
+                else:
+                    postings.append(key_id)
+
+    def exact(self, name: str) -> List[str]:
+        """Return every stored spelling that matches name case-insensitively."""
+        return list(self._names_by_key.get(normalize_name(name), ()))
+
+    def prefix(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """Return names whose normalised form starts with prefix, in key order."""
+        key = normalize_name(prefix)
+        start = bisect_left(self._keys, key)
+        results = []
+        for position in range(start, len(self._keys)):
+            candidate = self._keys[position]
+            if not candidate.startswith(key):
+                break
+            results.extend(self._names_by_key[candidate])
+            if limit is not None and len(results) >= limit:
+                return results[:limit]
+        return results
+
+    def fuzzy(self, query: str, limit: int = 5,
+              max_distance: int = MAX_FUZZY_DISTANCE) -> List[Tuple[str, int]]:
+        """
+        Return up to limit (name, distance) pairs within max_distance edits of query.
+
+        Results are ordered by distance, then by name. Only a query with few
+        distinct trigrams that is also too long for the deletion index, such
+        as a long run of one letter, or a max_distance above
+        MAX_FUZZY_DISTANCE with a short query, checks every key.
+        """
+        key = normalize_name(query)
+        if not key:
+            return []
+
+        query_grams = _trigrams(key)
+        if len(query_grams) > 3 * max_distance:
+            # Each edit removes at most 3 of the query's distinct trigrams, so
+            # a match is in at least used - 3d of the rarest used lists; two
+            # lists past the minimum of 3d + 1 make that at least 3, which
+            # leaves few candidates to check while still reading short lists
+            postings = sorted((self._grams.get(gram, ()) for gram in query_grams), key=len)
+            used = min(len(postings), 3 * max_distance + 3)
+            counts = Counter()
+            for posting in postings[:used]:
+                counts.update(posting)
+            needed = used - 3 * max_distance
+            keys_by_id = self._keys_by_id
+            candidates = [keys_by_id[key_id] for key_id, shared in counts.items()
+                          if shared >= needed and keys_by_id[key_id] is not None]
+            return self._rank(key, candidates, max_distance, limit)
+
+        if max_distance <= MAX_FUZZY_DISTANCE and len(key) + max_distance <= SHORT_KEY_LENGTH:
+            # Every key within max_distance is at most SHORT_KEY_LENGTH long.
+            # Names are ranked by distance first, so once limit of them lie
+            # within a smaller distance the farther candidates are not checked.
+            levels = _deletions(key, max_distance)
+            for depth in range(max_distance + 1):
+                candidates = set()
+                for variants in levels[:depth + 1]:
+                    for variant in variants:
+                        for deletes in self._deletes[:depth + 1]:
+                            candidates.update(deletes.get(variant, ()))
+                keys_by_id = self._keys_by_id
+                live = [keys_by_id[key_id] for key_id in candidates if keys_by_id[key_id] is not None]
+                results = self._rank(key, live, depth, limit)
+                if len(results) >= limit:
+                    break
+            return results
+
+        return self._rank(key, self._keys, max_distance, limit)
+
+    def _rank(self, key: str, candidates: Iterable[str], max_distance: int,
+              limit: int) -> List[Tuple[str, int]]:
+        """Return the limit closest names among candidates, by distance then name."""
+        scored = []
+        for candidate in candidates:
+            distance = edit_distance(key, candidate, max_distance)
+            if distance is not None:
+                scored.append((distance, candidate))
+        scored.sort()
+
+        results = []
+        for distance, candidate in scored:
+            for name in self._names_by_key[candidate]:
+                results.append((name, distance))
+            if len(results) >= limit:
+                break
+        return results[:limit]
+
+
+class AgeIndex:
+    """
+    Secondary index over a bounded range of ages, bucketed by age.
+
+    The per-age counts are always maintained and answer group counts, min,
+    max and rank queries in at most one pass over the buckets. The sets of
+    names in each bucket cost memory proportional to the roster, so they are
+    only materialised by build() when a range or top-k query first needs them,
+    and are kept up to date from then on. Range and top-k queries then touch
+    only the buckets they return names from.
+    """
+
+    def __init__(self, max_age: int):
+        self.max_age = max_age
+        self.counts = [0] * (max_age + 1)
+        self._buckets: Optional[List[Set[str]]] = None
+
+    @property
+    def built(self) -> bool:
+        return self._buckets is not None
+
+    def build(self, items: Iterable[Tuple[str, int]]) -> None:
+        """Materialise the name buckets from (name, age) pairs matching the counts."""
+        buckets = [set() for _ in range(self.max_age + 1)]
+        for name, age in items:
+            buckets[age].add(name)
+        self._buckets = buckets
+
+    def copy_counts(self) -> "AgeIndex":
+        """Return a new index with the same counts and unbuilt name buckets."""
+        index = AgeIndex(self.max_age)
+        index.counts = list(self.counts)
+        return index
+
+    def add(self, name: str, age: int) -> None:
+        self.counts[age] += 1
+        if self._buckets is not None:
+            self._buckets[age].add(name)
+
+    def discard(self, name: str, age: int) -> None:
+        self.counts[age] -= 1
+        if self._buckets is not None:
+            self._buckets[age].discard(name)
+
+    def count_by_age(self) -> Dict[int, int]:
+        """Return how many students have each age, for ages that occur."""
+        return {age: count for age, count in enumerate(self.counts) if count}
+
+    def count_in_range(self, min_age: int, max_age: int) -> int:
+        low, high = max(min_age, 0), min(max_age, self.max_age)
+        return sum(self.counts[low:high + 1])
+
+    def min(self) -> Optional[int]:
+        return next((age for age, count in enumerate(self.counts) if count), None)
+
+    def max(self) -> Optional[int]:
+        return next((age for age in range(self.max_age, -1, -1) if self.counts[age]), None)
+
+    def age_at_rank(self, rank: int) -> int:
+        """Return the age of the student at a 0-based position in age order."""
+        seen = 0
+        for age, count in enumerate(self.counts):
+            seen += count
+            if seen > rank:
+                return age
+        raise IndexError(rank)
+
+    def in_range(self, min_age: int, max_age: int, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Return (name, age) pairs with min_age <= age <= max_age, by age then name."""
+        if self._buckets is None:
+            raise RuntimeError("AgeIndex.build() must be called before range queries")
+
+        results = []
+        for age in range(max(min_age, 0), min(max_age, self.max_age) + 1):
+            bucket = self._buckets[age]
+            if not bucket:
+                continue
+            if limit is not None and len(results) + len(bucket) > limit:
+                results.extend((name, age) for name in heapq.nsmallest(limit - len(results), bucket))
+                break
+            results.extend((name, age) for name in sorted(bucket))
+        return results
+
+    def top(self, k: int, oldest: bool = True) -> List[Tuple[str, int]]:
+        """Return the k oldest (or youngest) students as (name, age) pairs, ties by name."""
+        if self._buckets is None:
+            raise RuntimeError("AgeIndex.build() must be called before top-k queries")
+
+        ages = range(self.max_age, -1, -1) if oldest else range(self.max_age + 1)
+        results = []
+        for age in ages:
+            if len(results) >= k:
+                break
+            bucket = self._buckets[age]
+            if bucket:
+                results.extend((name, age) for name in heapq.nsmallest(k - len(results), bucket))
+        return results
@@ -0,0 +1,531 @@
+import json
+import os
+import threading
+from typing import Dict, List, Mapping, Optional, Protocol, TextIO, Tuple
+
+from student_locks import FileLock
+
+COMPACT_THRESHOLD_BYTES = 1024 * 1024
+FLUSH_EVERY_N_MUTATIONS = 1
+FLUSH_INTERVAL_SECONDS = None
+
+
+def _file_signature(path: str) -> Optional[tuple]:
+    """Return (inode, size, mtime) for path, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+class StorageBackend(Protocol):
+    """
+    Where student_utils keeps the roster between runs.
+
+    StudentJournal and BinarySnapshotJournal persist an in-memory roster as a
+    snapshot plus a journal of changes, ShardedJournal spreads that over
+    several files, and SQLiteJournal keeps the roster in a database. load()
+    returns the roster, as a dict to adopt or as a StudentStore, and
+    write_snapshot() may return a different roster for the caller to swap in.
+    """
+
+    snapshot_path: str
+    journal_path: str
+    flush_every: int
+    flush_interval: Optional[float]
+
+    @property
+    def dirty(self) -> bool:
+        """True while the stored roster is missing changes made here."""
+
+    @property
+    def tracked(self) -> bool:
+        """False while the roster may hold changes that were not recorded."""
+
+    def mark_dirty(self) -> None:
+        """Record that the roster changed without append()."""
+
+    def exists(self) -> bool:
+        """True if anything has been stored yet."""
+
+    def load(self) -> Optional[Mapping[str, int]]:
+        """Return the stored roster, or None if nothing has been stored."""
+
+    def refresh(self, students) -> Optional[int]:
+        """Bring students up to date with other processes; None if a full load is needed."""
+
+    def append(self, op: str, name: str, age: Optional[int] = None) -> None:
+        """Record one change already made to the roster."""
+
+    def append_batch(self, records: List[List]) -> None:
+        """Record a group of changes all-or-nothing, durably."""
+
+    def flush(self) -> int:
+        """Make recorded changes durable."""
+
+    def maybe_compact(self, students: Optional[Mapping[str, int]]) -> bool:
+        """Start background housekeeping if it is due."""
+
+    def wait_for_compaction(self) -> None:
+        """Wait for housekeeping started by maybe_compact()."""
+
+    def write_snapshot(self, students: Optional[Mapping[str, int]]) -> Optional[Mapping[str, int]]:
+        """Store the whole roster; return a roster to use in its place, or None."""
+
+    def close(self) -> None:
+        """Flush and release files."""
+
+
+class StudentJournal:
+    """
+    A JSON snapshot file paired with an append-only journal of mutations.
+
+    Every change is appended to the journal as one JSON line, so the cost of
+    a write does not depend on the size of the roster. Loading reads the last
+    snapshot and replays the journal on top of it. Once the journal grows past
+    ``compact_threshold`` bytes it is rotated aside and folded into a fresh
+    snapshot on a background thread.
+
+    Appends are write-behind: records are buffered in memory and written out
+    once ``flush_every`` of them are pending, ``flush_interval`` seconds after
+    the first unflushed change, or on an explicit ``flush()``. The defaults
+    write every record immediately.
+
+    Several processes may share the same files. Each read of them happens
+    under a shared advisory lock on ``<snapshot>.lock`` and each change under
+    an exclusive one, and the journal remembers the (inode, size, mtime) of
+    the files as it last read or wrote them. If another process has changed
+    them since, a snapshot is rebuilt from the files rather than from this
+    process's roster, so journaled changes from every process are merged
+    instead of overwritten. Changes made outside the journal (mark_dirty),
+    such as replacing imports, still replace the database wholesale.
+
+    Journal records are JSON arrays: ``["set", name, age]``, ``["del", name]``,
+    or ``["batch", [record, ...]]`` for a group of changes that is replayed
+    all-or-nothing.
+    """
+
+    def __init__(self, snapshot_path: str, journal_path: str,
+                 compact_threshold: int = COMPACT_THRESHOLD_BYTES, fsync: bool = True,
+                 flush_every: int = FLUSH_EVERY_N_MUTATIONS,
+                 flush_interval: Optional[float] = FLUSH_INTERVAL_SECONDS):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compacting_path = journal_path + ".compacting"
+        self.lock_path = snapshot_path + ".lock"
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(self.lock_path)
+        self._handle = None
+        self._compactor = None
+        self._pending = []
+        self._timer = None
+        # True while the snapshot on disk is missing changes (pending or journaled)
+        self._dirty = False
+        # File signatures as this journal last read or wrote them
+        self._snapshot_seen = None
+        self._journal_seen = None
+        # Another process changed the files since they were last read
+        self._foreign = False
+        # The roster may differ from the files in ways the journal has not
+        # recorded; true until the first load or snapshot
+        self._untracked = True
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    @property
+    def tracked(self) -> bool:
+        """False while the roster may hold changes this journal has not recorded."""
+        return not self._untracked
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def mark_dirty(self) -> None:
+        """Record that the roster changed outside of the journal."""
+        self._dirty = True
+        self._untracked = True
+
+    def exists(self) -> bool:
+        return (os.path.exists(self.snapshot_path) or os.path.exists(self.journal_path)
+                or os.path.exists(self.compacting_path))
+
+    def _check_foreign(self) -> bool:
+        """Note whether another process changed the files; call with the file lock held."""
+        if (_file_signature(self.snapshot_path) != self._snapshot_seen
+                or _file_signature(self.journal_path) != self._journal_seen):
+            self._foreign = True
+        return self._foreign
+
+    def _mark_synced(self) -> None:
+        self._snapshot_seen = _file_signature(self.snapshot_path)
+        self._journal_seen = _file_signature(self.journal_path)
+        self._foreign = False
+        self._untracked = False
+
+    def in_sync(self) -> bool:
+        """
+        Return True if the roster last loaded or saved still matches the files.
+
+        That is the case when no other process has changed them since and no
+        change was made outside the journal; it costs one stat() per file.
+        """
+        with self._lock:
+            if self._untracked:
+                return False
+            with self._file_lock.shared():
+                return not self._check_foreign()
+
+    def load(self) -> Optional[Dict[str, int]]:
+        """
+        Read the snapshot and replay any journal entries on top of it.
+
+        Returns:
+            The recovered roster, or None if neither snapshot nor journal exists
+        """
+        with self._lock:
+            with self._file_lock.shared():
+                if not self.exists():
+                    self._mark_synced()
+                    return None
+                students, replayed, intact = self._read_files()
+                leftover = os.path.exists(self.compacting_path)
+                self._mark_synced()
+
+            if leftover or not intact:
+                # An interrupted compaction, here or in another process, or a
+                # record torn by a crash; fold what was replayed into a fresh
+                # snapshot now, so new records are not appended behind the
+                # torn one and lost with it on the next load
+                self.write_snapshot(students)
+            else:
+                self._dirty = replayed > 0
+            return students
+
+    def _read_files(self) -> Tuple[Dict[str, int], int, bool]:
+        """
+        Rebuild the roster from the snapshot and journals; call with the file lock held.
+
+        Returns:
+            (roster, number of journal entries replayed, False if a journal
+            ended in a torn record)
+        """
+        students = self._read_snapshot()
+        # A rotated journal holds entries older than the live one, so it is
+        # replayed first
+        replayed, rotated_intact = self._replay(self.compacting_path, students)
+        applied, intact = self._replay(self.journal_path, students)
+        return students, replayed + applied, rotated_intact and intact
+
+    def _read_snapshot(self) -> Dict[str, int]:
+        if not os.path.exists(self.snapshot_path):
+            return {}
+        with open(self.snapshot_path, 'r') as file:
+            return json.load(file)
+
+    def _replay(self, path: str, students: Dict[str, int], offset: int = 0) -> Tuple[int, bool]:
+        """
+        Apply the records in path from offset on.
+
+        Returns:
+            (number of records applied, False if replay stopped at a torn record)
+        """
+        if not os.path.exists(path):
+            return 0, True
+
+        applied = 0
+        with open(path, 'rb') as file:
+            file.seek(offset)
+            for line in file:
+                try:
+                    # Every record is written with its newline in one write
+                    if not line.endswith(b"\n"):
+                        raise ValueError("record has no line end")
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final write from a crash; nothing after it is trusted
+                    return applied, False
+                self._apply(record, students)
+                applied += 1
+        return applied, True
+
+    @staticmethod
+    def _apply(record: List, students: Dict[str, int]) -> None:
+        op = record[0]
+        if op == "set":
+            students[record[1]] = record[2]
+        elif op == "del":
+            students.pop(record[1], None)
+        elif op == "batch":
+            for entry in record[1]:
+                StudentJournal._apply(entry, students)
+
+    def refresh(self, students) -> Optional[int]:
+        """
+        Apply journal entries that other processes appended since the last read.
+
+        Returns:
+            The number of entries applied, or None if the files changed in a
+            way that needs a full load
+        """
+        with self._lock:
+            if self._untracked or self._foreign:
+                return None
+            with self._file_lock.shared():
+                if _file_signature(self.snapshot_path) != self._snapshot_seen:
+                    return None
+                current = _file_signature(self.journal_path)
+                seen = self._journal_seen
+                if current == seen:
+                    return 0
+                if current is None or (seen is not None and (current[0] != seen[0] or current[1] < seen[1])):
+                    return None
+
+                applied, _ = self._replay(self.journal_path, students, seen[1] if seen else 0)
+                self._journal_seen = current
+
+            # Changes not yet flushed here come after the ones just read
+            for line in self._pending:
+                self._apply(json.loads(line), students)
+            self._dirty = True
+            return applied
+
+    def append(self, op: str, name: str, age: Optional[int] = None) -> None:
+        """Queue a single mutation, flushing it according to the flush policy."""
+        record = [op, name] if age is None else [op, name, age]
+        self._queue(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def append_batch(self, records: List[List]) -> None:
+        """
+        Queue a group of mutations as one journal line and flush it immediately.
+
+        A batch is written as a single line, so a crash mid-write drops the
+        whole batch on replay rather than leaving part of it applied.
+        """
+        line = json.dumps(["batch", records], ensure_ascii=False) + "\n"
+        with self._lock:
+            self._queue(line)
+            try:
+                self.flush()
+            except OSError:
+                # The caller rolls the batch back, so it must not be retried later
+                if self._pending and self._pending[-1] is line:
+                    self._pending.pop()
+                raise
+
+    def _queue(self, line: str) -> None:
+        with self._lock:
+            self._pending.append(line)
+            self._dirty = True
+            if self.flush_every and len(self._pending) >= self.flush_every:
+                self.flush()
+            elif self.flush_interval is not None and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> int:
+        """
+        Write all pending records to the journal in a single durable append.
+
+        Returns:
+            The number of records written
+        """
+        with self._lock:
+            self._cancel_timer()
+            if not self._pending:
+                return 0
+
+            with self._file_lock.exclusive():
+                self._check_foreign()
+                if self._handle is not None:
+                    # Another process may have rotated or folded in the
+                    # journal this handle points at
+                    current = _file_signature(self.journal_path)
+                    if current is None or current[0] != os.fstat(self._handle.fileno()).st_ino:
+                        self._close_handle()
+                if self._handle is None:
+                    self._handle = open(self.journal_path, 'a', encoding='utf-8')
+                self._handle.write("".join(self._pending))
+                self._handle.flush()
+                if self.fsync:
+                    os.fsync(self._handle.fileno())
+                stat = os.fstat(self._handle.fileno())
+                self._journal_seen = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+            written = len(self._pending)
+            self._pending = []
+            return written
+
+    def _flush_from_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except OSError:
+            # Records stay pending and are retried on the next flush
+            pass
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def journal_size(self) -> int:
+        try:
+            return os.path.getsize(self.journal_path)
+        except OSError:
+            return 0
+
+    def maybe_compact(self, students: Optional[Mapping[str, int]]) -> bool:
+        """
+        Start a background compaction if the journal has outgrown its threshold.
+
+        Args:
+            students: The current roster, or None to rebuild the snapshot from
+                the files alone
+
+        Returns:
+            True if a compaction was started
+        """
+        if self.journal_size() < self.compact_threshold:
+            return False
+
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return False
+
+            # Rotate the journal so new writes land in a fresh file while the
+            # snapshot is rebuilt from a copy of the current roster, or from
+            # the files if another process has written to them. A store's
+            # snapshot() is O(1), so the caller is not held up copying it.
+            with self._file_lock.exclusive():
+                if os.path.exists(self.compacting_path) or not os.path.exists(self.journal_path):
+                    return False
+                foreign = self._check_foreign()
+                self._close_handle()
+                os.replace(self.journal_path, self.compacting_path)
+                self._journal_seen = None
+                base = _file_signature(self.snapshot_path)
+            if foreign or students is None:
+                frozen = None
+            elif hasattr(students, "snapshot"):
+                frozen = students.snapshot()
+            else:
+                frozen = dict(students.items())
+
+            self._compactor = threading.Thread(
+                target=self._compact, args=(frozen, base), name="student-journal-compactor", daemon=True
+            )
+            self._compactor.start()
+        return True
+
+    def _compact(self, frozen: Optional[Mapping[str, int]], base: Optional[tuple]) -> None:
+        temp_path = self.snapshot_path + ".compacting.tmp"
+        try:
+            if frozen is None:
+                # Only this process moves the rotated journal, and snapshots
+                # are replaced atomically, so both can be read unlocked
+                frozen = self._read_snapshot()
+                self._replay(self.compacting_path, frozen)
+            self._write_snapshot_file(frozen, temp_path)
+
+            with self._lock, self._file_lock.exclusive():
+                # Install only if nobody has folded the rotated journal in or
+                # replaced the snapshot since the rotation
+                if os.path.exists(self.compacting_path) and _file_signature(self.snapshot_path) == base:
+                    os.replace(temp_path, self.snapshot_path)
+                    os.remove(self.compacting_path)
+                    if self._snapshot_seen == base:
+                        self._snapshot_seen = _file_signature(self.snapshot_path)
+                else:
+                    os.remove(temp_path)
+        except (OSError, ValueError):
+            # The rotated journal stays on disk and is replayed on next load
+            pass
+
+    def wait_for_compaction(self) -> None:
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    def write_snapshot(self, students: Optional[Mapping[str, int]]) -> Optional[Mapping[str, int]]:
+        """
+        Write a full snapshot and discard the journal it supersedes.
+
+        If another process has journaled changes since the files were last
+        read and this roster has no changes outside the journal, the snapshot
+        is rebuilt from the files instead, so those changes are kept.
+
+        Args:
+            students: The current roster, or None to rebuild the snapshot from
+                the files alone, which needs every change to have been journaled
+
+        Returns:
+            The merged roster that was written in place of students, or None
+        """
+        self.wait_for_compaction()
+        with self._lock, self._file_lock.exclusive():
+            merged = None
+            foreign = not self._untracked and self._check_foreign()
+            if students is None or foreign:
+                if self._untracked:
+                    raise ValueError(f"'{self.snapshot_path}' has changes that were not journaled")
+                self.flush()
+                students, _, _ = self._read_files()
+                if foreign:
+                    merged = students
+
+            temp_path = self.snapshot_path + ".tmp"
+            self._write_snapshot_file(students, temp_path)
+            os.replace(temp_path, self.snapshot_path)
+
+            self._cancel_timer()
+            self._pending = []
+            self._dirty = False
+            self._close_handle()
+            for path in (self.journal_path, self.compacting_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._mark_synced()
+            return merged
+
+    def _write_snapshot_file(self, students: Mapping[str, int], path: str) -> None:
+        """Durably write students to path; callers rename it over the snapshot."""
+        with open(path, 'w') as file:
+            dump_students_json(students, file)
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+
+    def _close_handle(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def close(self) -> None:
+        self.flush()
+        self.wait_for_compaction()
+        with self._lock:
+            self._close_handle()
+
+
+def dump_students_json(students: Mapping[str, int], file: TextIO) -> None:
+    """
+    Write students in the same layout as json.dump(students, file, indent=2).
+
+    Records are streamed from items(), so stores that are not dicts do not
+    need to be copied into one first.
+    """
+    separator = "{\n  "
+    for name, age in students.items():
+        file.write(f"{separator}{json.dumps(name)}: {age}")
+        separator = ",\n  "
+    file.write("{}" if separator == "{\n  " else "\n}")
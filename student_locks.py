@@ -0,0 +1,206 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: file locking is a no-op
+    fcntl = None
+
+
+# After a writer finishes, newly arriving readers may still join the readers it
+# let in for this long, even with writers waiting
+READ_PHASE_SECONDS = 0.002
+# Writers waiting behind one another may go this many times in a row before
+# queued readers get their turn
+MAX_WRITES_IN_ROW = 32
+
+
+class ReadWriteLock:
+    """
+    A readers-writer lock: any number of readers, or a single writer.
+
+    Waiting readers and writers take turns in phases. Once a writer is
+    waiting, new readers queue behind it, so a steady stream of lookups cannot
+    starve an import. Queued writers then go up to MAX_WRITES_IN_ROW times in
+    a row, after which every reader already waiting is let in before the next
+    writer, so back-to-back writes cannot starve lookups either. Readers that
+    arrive within READ_PHASE_SECONDS of that may join them. Handing the lock
+    over costs a thread switch under the GIL, so phases, rather than strict
+    alternation, keep writers from waiting behind one reader switch after
+    another.
+
+    Both sides are re-entrant for the thread that holds them, and a writer may
+    also take the read side, so locked functions can call each other.
+    Upgrading a read lock to a write lock would deadlock against another
+    upgrading reader, so it raises RuntimeError instead.
+    """
+
+    def __init__(self):
+        mutex = threading.Lock()
+        # Readers and writers wait on separate conditions, so a release wakes
+        # only the side whose turn it is, instead of every waiting thread
+        self._can_read = threading.Condition(mutex)
+        self._can_write = threading.Condition(mutex)
+        # Thread id -> re-entrancy depth for every thread holding the read side
+        self._readers: Dict[int, int] = {}
+        self._writer: Optional[int] = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+        self._readers_waiting = 0
+        # Bumped by every writer as it finishes; it lets in exactly the readers
+        # that queued before, and writers wait until all of those are in
+        self._generation = 0
+        self._admitted = 0
+        # End of the current read phase on the time.monotonic() clock
+        self._read_until = 0.0
+        self._writes_in_row = 0
+
+    def acquire_read(self, blocking: bool = True) -> bool:
+        """Take the read side; with blocking=False, return False instead of waiting."""
+        me = threading.get_ident()
+        with self._can_read:
+            if self._writer == me or me in self._readers:
+                self._readers[me] = self._readers.get(me, 0) + 1
+                return True
+            if self._writer is not None or (self._writers_waiting and time.monotonic() >= self._read_until):
+                if not blocking:
+                    return False
+                # Readers arriving later queue for the writer after next, so
+                # they cannot stretch this batch while a writer waits
+                ticket = self._generation
+                self._readers_waiting += 1
+                try:
+                    while self._generation == ticket:
+                        self._can_read.wait()
+                finally:
+                    self._readers_waiting -= 1
+                    if self._generation != ticket:
+                        self._admitted -= 1
+                        if not self._admitted and not self._readers and self._writers_waiting:
+                            self._can_write.notify()
+            self._readers[me] = 1
+            return True
+
+    def release_read(self) -> None:
+        me = threading.get_ident()
+        with self._can_read:
+            depth = self._readers[me] - 1
+            if depth:
+                self._readers[me] = depth
+                return
+            del self._readers[me]
+            if not self._readers and not self._admitted and self._writers_waiting:
+                self._can_write.notify()
+
+    def acquire_write(self) -> None:
+        me = threading.get_ident()
+        with self._can_write:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+            if me in self._readers:
+                raise RuntimeError("Cannot upgrade a read lock to a write lock")
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers or self._admitted:
+                    self._can_write.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+            self._writer_depth = 1
+
+    def release_write(self) -> None:
+        with self._can_write:
+            self._writer_depth -= 1
+            if self._writer_depth:
+                return
+            self._writer = None
+            if self._writers_waiting and (not self._readers_waiting or self._writes_in_row < MAX_WRITES_IN_ROW):
+                self._writes_in_row += 1
+                self._can_write.notify()
+                return
+            self._writes_in_row = 0
+            self._generation += 1
+            self._admitted = self._readers_waiting
+            self._read_until = time.monotonic() + READ_PHASE_SECONDS
+            self._can_read.notify_all()
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class FileLock:
+    """
+    An advisory lock shared between processes, held on a separate lock file.
+
+    Uses fcntl.flock, so it only coordinates processes that also take it.
+    Shared holders may read the files it guards; an exclusive holder may
+    change them. The lock is re-entrant, but it is not thread-safe: callers
+    serialise threads with their own lock first, because every thread in a
+    process shares one flock. Where fcntl is unavailable it does nothing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._handle = None
+        self._depth = 0
+        self._exclusive = False
+
+    def acquire(self, exclusive: bool = True) -> None:
+        if fcntl is None:
+            return
+        if self._depth:
+            if exclusive and not self._exclusive:
+                raise RuntimeError(f"Cannot upgrade a shared lock on '{self.path}' to an exclusive one")
+            self._depth += 1
+            return
+
+        handle = open(self.path, 'a')
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        except BaseException:
+            handle.close()
+            raise
+        self._handle = handle
+        self._depth = 1
+        self._exclusive = exclusive
+
+    def release(self) -> None:
+        if fcntl is None:
+            return
+        self._depth -= 1
+        if not self._depth:
+            # Closing the file drops the lock
+            self._handle.close()
+            self._handle = None
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        self.acquire(exclusive=False)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        self.acquire(exclusive=True)
+        try:
+            yield
+        finally:
+            self.release()
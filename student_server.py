@@ -0,0 +1,270 @@
+"""
+JSON-lines server exposing the student database to other programs.
+
+Usage:
+    python student_server.py [--host 127.0.0.1] [--port 8765]
+    python student_server.py --socket /tmp/msus.sock
+
+Each request is one JSON object per line:
+
+    {"id": 1, "op": "lookup", "args": {"name": "Alice"}}
+
+and each response echoes the id:
+
+    {"id": 1, "ok": true, "result": "Alice is 20 years old."}
+    {"id": 2, "ok": false, "error": "Unknown operation 'frobnicate'"}
+
+Requests on a connection are pipelined: a client may send many before
+reading any responses, and responses are written as requests complete, so
+they can arrive out of order. Every connection shares the same roster.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import student_utils
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Requests a single connection may have in flight before reading pauses
+MAX_PIPELINED_REQUESTS = 128
+# Requests and responses longer than this are rejected
+MAX_LINE_BYTES = 1024 * 1024
+
+
+def _page(offset: int = 0, limit: int = student_utils.LIST_PAGE_SIZE, start_after: str = None) -> list:
+    return list(student_utils.iter_students(offset, limit, start_after))
+
+
+# op -> (function, inline). Inline reads only touch the store's maintained
+# aggregates, so they take constant time whatever the roster's size; they run
+# on the event loop when the roster is in memory and not locked for writing.
+# Everything else can walk the roster, build an index or touch files, and
+# runs in the executor.
+OPERATIONS: Dict[str, Tuple[Callable, bool]] = {
+    "lookup": (student_utils.lookup_student, False),
+    "search": (student_utils.search_students, False),
+    "list": (student_utils.list_all_students, False),
+    "page": (_page, False),
+    "stats": (student_utils.get_student_stats, True),
+    "count_by_age": (student_utils.count_students_by_age, True),
+    "by_age": (student_utils.find_students_by_age, False),
+    "oldest": (student_utils.oldest_students, False),
+    "youngest": (student_utils.youngest_students, False),
+    "add": (student_utils.add_student, False),
+    "remove": (student_utils.remove_student, False),
+    "add_many": (student_utils.add_students, False),
+    "update_many": (student_utils.update_students, False),
+    "remove_many": (student_utils.remove_students, False),
+    "import": (student_utils.import_from_csv, False),
+    "merge": (student_utils.import_and_merge_csv, False),
+    "export": (student_utils.export_to_csv, False),
+    "save": (student_utils.save_students_to_json, False),
+    "flush": (student_utils.flush, False),
+}
+
+
+_BUSY = object()
+
+
+def _run_if_unlocked(function: Callable, args: Dict[str, Any]):
+    """Run function now if the roster is in memory and the read lock is free; return _BUSY if not."""
+    database = student_utils.database
+    # A persistent store answers even aggregate reads with a database query
+    if not database.loaded or database.store.persistent:
+        return _BUSY
+    lock = database.lock
+    if not lock.acquire_read(blocking=False):
+        return _BUSY
+    try:
+        return function(**args)
+    finally:
+        lock.release_read()
+
+
+async def _dispatch(request: Any) -> Dict[str, Any]:
+    if not isinstance(request, dict):
+        return {"id": None, "ok": False, "error": "Request must be a JSON object"}
+    request_id = request.get("id")
+    op = request.get("op")
+    args = request.get("args") or {}
+    if op not in OPERATIONS:
+        return {"id": request_id, "ok": False, "error": f"Unknown operation {op!r}"}
+    if not isinstance(args, dict):
+        return {"id": request_id, "ok": False, "error": "args must be a JSON object"}
+
+    function, inline = OPERATIONS[op]
+    try:
+        result = _run_if_unlocked(function, args) if inline else _BUSY
+        if result is _BUSY:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(None, lambda: function(**args))
+    except TypeError as e:
+        return {"id": request_id, "ok": False, "error": f"Bad arguments for {op!r}: {e}"}
+    except Exception as e:
+        return {"id": request_id, "ok": False, "error": f"Error running {op!r}: {e}"}
+    return {"id": request_id, "ok": True, "result": result}
+
+
+async def _handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    slots = asyncio.Semaphore(MAX_PIPELINED_REQUESTS)
+    tasks = set()
+
+    async def respond(line: bytes) -> None:
+        try:
+            try:
+                response = await _dispatch(json.loads(line))
+            except ValueError as e:
+                response = {"id": None, "ok": False, "error": f"Invalid JSON: {e}"}
+            try:
+                data = json.dumps(response, ensure_ascii=False).encode('utf-8')
+            except (TypeError, ValueError) as e:
+                # The client is waiting on this id, so it still gets a reply
+                data = json.dumps({"id": response.get("id"), "ok": False,
+                                   "error": f"Cannot encode the result as JSON: {e}"}).encode('utf-8')
+            writer.write(data + b"\n")
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            slots.release()
+
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except (ValueError, asyncio.LimitOverrunError):
+                writer.write(b'{"id": null, "ok": false, "error": "Request line too long"}\n')
+                break
+            if not line:
+                break
+            if not line.strip():
+                continue
+            await slots.acquire()
+            task = asyncio.create_task(respond(line))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                       socket_path: Optional[str] = None) -> asyncio.AbstractServer:
+    """
+    Load the database and start listening.
+
+    Args:
+        host: Interface for TCP connections; localhost by default
+        port: TCP port, or 0 to pick a free one
+        socket_path: Listen on this Unix socket instead of TCP
+
+    Returns:
+        The running asyncio server
+    """
+    loop = asyncio.get_running_loop()
+    # Load up front in the executor, so the first request does not pay for it
+    # on the event loop
+    await loop.run_in_executor(None, lambda: student_utils.database.store)
+    if socket_path:
+        return await asyncio.start_unix_server(_handle_connection, socket_path, limit=MAX_LINE_BYTES)
+    return await asyncio.start_server(_handle_connection, host, port, limit=MAX_LINE_BYTES)
+
+
+async def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, socket_path: Optional[str] = None) -> None:
+    """Run the server until cancelled, then flush pending changes."""
+    server = await start_server(host, port, socket_path)
+    where = socket_path or ", ".join(str(sock.getsockname()) for sock in server.sockets)
+    print(f"MSUS server listening on {where}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        student_utils.flush()
+
+
+class StudentClient:
+    """
+    Pipelining client for the JSON-lines protocol.
+
+    call() may be awaited from many tasks at once over a single connection;
+    responses are matched to requests by id.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._ids = itertools.count(1)
+        self._waiting: Dict[int, asyncio.Future] = {}
+        self._receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                      socket_path: Optional[str] = None) -> "StudentClient":
+        if socket_path:
+            reader, writer = await asyncio.open_unix_connection(socket_path, limit=MAX_LINE_BYTES)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE_BYTES)
+        return cls(reader, writer)
+
+    async def _receive(self) -> None:
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self._waiting.pop(response.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self._waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Connection closed"))
+            self._waiting.clear()
+
+    async def call(self, op: str, **args) -> Any:
+        """
+        Send one request and wait for its result.
+
+        Raises:
+            RuntimeError: If the server reports an error
+        """
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[request_id] = future
+        self._writer.write(json.dumps({"id": request_id, "op": op, "args": args}).encode('utf-8') + b"\n")
+        await self._writer.drain()
+        response = await future
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error"))
+        return response.get("result")
+
+    async def close(self) -> None:
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+        self._receiver.cancel()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--socket", dest="socket_path", help="listen on a Unix socket instead of TCP")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.socket_path))
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+
+
+if __name__ == "__main__":
+    main()
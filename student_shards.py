@@ -0,0 +1,383 @@
+"""
+Sharded on-disk layout: the roster split by name hash across several files.
+
+For a database at students.json with 4 shards the layout is:
+
+    students.json.shards/
+        manifest.json              {"shards": 4}
+        shard-000-of-004.json      snapshot of the names in shard 0
+        shard-000-of-004.journal   journal of changes to those names
+        ...
+
+Each shard is an ordinary StudentJournal (or BinarySnapshotJournal) over its
+own pair of files, with its own locks, so shards are saved in parallel and a
+save rewrites only the shards whose names changed. Loading reads the shards
+one after another: decoding JSON holds the GIL, so threads would not speed it
+up, and each shard's journal keeps state from its load. Names are
+assigned to shards with CRC-32 rather than hash(), which differs between
+processes.
+
+Usage:
+    python student_shards.py split students.json students.journal --shards 8
+    python student_shards.py join students.json students.journal
+"""
+import argparse
+import json
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Mapping, Optional, Set, Tuple
+
+from student_journal import StudentJournal
+
+MANIFEST_FILE = "manifest.json"
+DEFAULT_SHARDS = 8
+
+
+def shard_of(name: str, shards: int) -> int:
+    """Return the shard a name belongs to; the same in every process."""
+    return zlib.crc32(name.encode('utf-8')) % shards
+
+
+def shard_directory(snapshot_path: str) -> str:
+    """Return the directory holding the shards of the database at snapshot_path."""
+    return snapshot_path + ".shards"
+
+
+def shard_paths(directory: str, shards: int, extension: str = ".json") -> List[Tuple[str, str]]:
+    """Return (snapshot path, journal path) for each shard."""
+    paths = []
+    for index in range(shards):
+        stem = os.path.join(directory, f"shard-{index:03d}-of-{shards:03d}")
+        paths.append((stem + extension, stem + ".journal"))
+    return paths
+
+
+def read_shard_count(directory: str) -> Optional[int]:
+    """Return the shard count recorded in directory, or None if it has no manifest."""
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), 'r') as file:
+            return int(json.load(file)["shards"])
+    except FileNotFoundError:
+        return None
+
+
+def _run_parallel(calls: List[Callable[[], Any]]) -> List[Tuple[Any, Optional[Exception]]]:
+    """Run each call on its own thread and return (result, error) pairs in order."""
+    def run(call):
+        try:
+            return call(), None
+        except Exception as e:
+            return None, e
+
+    if len(calls) <= 1:
+        return [run(call) for call in calls]
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        return list(pool.map(run, calls))
+
+
+def _raise_first(outcomes: List[Tuple[Any, Optional[Exception]]]) -> List[Any]:
+    for _, error in outcomes:
+        if error is not None:
+            raise error
+    return [result for result, _ in outcomes]
+
+
+class ShardedJournal:
+    """
+    The StudentJournal interface over a directory of per-shard journals.
+
+    The roster in memory is still one store; only the files are split. Each
+    change is journaled to its name's shard, and a batch is split into one
+    batch per shard, so it is all-or-nothing within a shard but not across
+    shards: if one shard's write fails, the shards that were written are
+    marked dirty, so the next save rewrites them from the rolled-back roster.
+
+    A save writes only dirty shards. A shard whose changes all went through
+    its journal is rebuilt from its own files, so the roster is not scanned;
+    only shards changed some other way, such as by a replacing import, are
+    split out of the roster.
+
+    The shard count in an existing manifest wins over the one requested;
+    changing it means rewriting every record, which migrate_to_shards() does.
+    """
+
+    def __init__(self, directory: str, shards: int = DEFAULT_SHARDS,
+                 journal_class: type = StudentJournal, extension: str = ".json", **options):
+        if shards < 1:
+            raise ValueError(f"Shard count must be at least 1, got {shards}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        # The directory stands in for both files in messages and comparisons
+        self.snapshot_path = directory
+        self.journal_path = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        count = read_shard_count(directory) or shards
+        self.shards = [journal_class(snapshot_path, journal_path, **options)
+                       for snapshot_path, journal_path in shard_paths(directory, count, extension)]
+        self._lock = threading.RLock()
+        # Shards appended to since the last maybe_compact()
+        self._touched: Set[int] = set()
+
+    @property
+    def shard_count(self) -> int:
+        return len(self.shards)
+
+    def shard_for(self, name: str) -> StudentJournal:
+        return self.shards[shard_of(name, len(self.shards))]
+
+    @property
+    def dirty(self) -> bool:
+        return any(shard.dirty for shard in self.shards)
+
+    @property
+    def tracked(self) -> bool:
+        return all(shard.tracked for shard in self.shards)
+
+    @property
+    def pending_count(self) -> int:
+        return sum(shard.pending_count for shard in self.shards)
+
+    @property
+    def flush_every(self) -> int:
+        return self.shards[0].flush_every
+
+    @flush_every.setter
+    def flush_every(self, value: int) -> None:
+        for shard in self.shards:
+            shard.flush_every = value
+
+    @property
+    def flush_interval(self) -> Optional[float]:
+        return self.shards[0].flush_interval
+
+    @flush_interval.setter
+    def flush_interval(self, value: Optional[float]) -> None:
+        for shard in self.shards:
+            shard.flush_interval = value
+
+    def mark_dirty(self) -> None:
+        for shard in self.shards:
+            shard.mark_dirty()
+
+    def exists(self) -> bool:
+        return any(shard.exists() for shard in self.shards)
+
+    def in_sync(self) -> bool:
+        return all(shard.in_sync() for shard in self.shards)
+
+    def partition(self, students: Mapping[str, int], wanted: Optional[Set[int]] = None) -> Dict[int, Dict[str, int]]:
+        """
+        Split a roster into one dict per shard.
+
+        Args:
+            students: Roster to split
+            wanted: Only collect these shards; all of them by default
+        """
+        count = len(self.shards)
+        wanted = set(range(count)) if wanted is None else wanted
+        parts = {index: {} for index in wanted}
+        for name, age in students.items():
+            part = parts.get(shard_of(name, count))
+            if part is not None:
+                part[name] = age
+        return parts
+
+    def load(self) -> Optional[Dict[str, int]]:
+        """
+        Load every shard and combine them.
+
+        Returns:
+            The recovered roster, or None if no shard has any files
+        """
+        with self._lock:
+            parts = [shard.load() for shard in self.shards]
+        if all(part is None for part in parts):
+            return None
+        students = {}
+        for part in parts:
+            if part:
+                students.update(part if isinstance(part, dict) else part.items())
+        return students
+
+    def refresh(self, students) -> Optional[int]:
+        """Apply other processes' journal entries from every shard; None if a full load is needed."""
+        applied = 0
+        with self._lock:
+            for shard in self.shards:
+                refreshed = shard.refresh(students)
+                if refreshed is None:
+                    return None
+                applied += refreshed
+        return applied
+
+    def append(self, op: str, name: str, age: Optional[int] = None) -> None:
+        index = shard_of(name, len(self.shards))
+        self._touched.add(index)
+        self.shards[index].append(op, name, age)
+
+    def append_batch(self, records: List[List]) -> None:
+        """Journal a batch as one batch per shard, writing the shards in parallel."""
+        count = len(self.shards)
+        groups: Dict[int, List[List]] = {}
+        for record in records:
+            groups.setdefault(shard_of(record[1], count), []).append(record)
+        self._touched.update(groups)
+
+        indexes = list(groups)
+        outcomes = _run_parallel([lambda index=index: self.shards[index].append_batch(groups[index])
+                                  for index in indexes])
+        if any(error is not None for _, error in outcomes):
+            for index, (_, error) in zip(indexes, outcomes):
+                if error is None:
+                    # Its part of the batch is on disk but the caller rolls
+                    # the roster back, so the next save must rewrite it
+                    self.shards[index].mark_dirty()
+            _raise_first(outcomes)
+
+    def flush(self) -> int:
+        pending = [shard for shard in self.shards if shard.pending_count]
+        return sum(_raise_first(_run_parallel([shard.flush for shard in pending])))
+
+    def maybe_compact(self, students: Mapping[str, int]) -> bool:
+        """Start a background compaction of each recently written shard that has outgrown its threshold."""
+        touched, self._touched = self._touched, set()
+        started = False
+        for index in touched:
+            # Tracked shards rebuild their snapshot from their own files, which
+            # are a fraction of the roster; others are split out of it
+            shard = self.shards[index]
+            part = None if shard.tracked else self.partition(students, {index})[index]
+            started = shard.maybe_compact(part) or started
+        return started
+
+    def wait_for_compaction(self) -> None:
+        for shard in self.shards:
+            shard.wait_for_compaction()
+
+    def write_snapshot(self, students: Mapping[str, int]) -> Optional[Dict[str, int]]:
+        """
+        Rewrite the snapshot of every shard that changed, in parallel.
+
+        Returns:
+            The roster merged with other processes' changes if any shard had
+            them, or None
+        """
+        with self._lock:
+            stale = [index for index, shard in enumerate(self.shards)
+                     if shard.dirty or not os.path.exists(shard.snapshot_path)]
+            untracked = {index for index in stale if not self.shards[index].tracked}
+            parts = self.partition(students, untracked) if untracked else {}
+            outcomes = _run_parallel([lambda index=index: self.shards[index].write_snapshot(parts.get(index))
+                                      for index in stale])
+            self._write_manifest()
+            merged = {index: result for index, result in zip(stale, _raise_first(outcomes)) if result is not None}
+
+        if not merged:
+            return None
+        count = len(self.shards)
+        roster = {name: age for name, age in students.items() if shard_of(name, count) not in merged}
+        for part in merged.values():
+            roster.update(part if isinstance(part, dict) else part.items())
+        return roster
+
+    def _write_manifest(self) -> None:
+        if read_shard_count(self.directory) == len(self.shards):
+            return
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, 'w') as file:
+            json.dump({"shards": len(self.shards)}, file)
+        os.replace(temp_path, self.manifest_path)
+
+    def close(self) -> None:
+        for shard in self.shards:
+            shard.close()
+
+
+def remove_shards(directory: str) -> None:
+    """Delete a shard directory's manifest, snapshots and journals, if it has any."""
+    if not os.path.isdir(directory):
+        return
+    for entry in os.listdir(directory):
+        # Lock files stay, since other processes may be holding them
+        if entry == MANIFEST_FILE or (entry.startswith("shard-") and not entry.endswith(".lock")):
+            os.remove(os.path.join(directory, entry))
+
+
+def migrate_to_shards(snapshot_path: str, journal_path: str, shards: int = DEFAULT_SHARDS,
+                      journal_class: type = StudentJournal) -> int:
+    """
+    Copy a single-file database into a sharded layout beside it.
+
+    The database is read through its journal, so journaled changes are
+    included. Any existing shards are replaced; the single file is left in
+    place.
+
+    Returns:
+        The number of records written
+    """
+    source = journal_class(snapshot_path, journal_path)
+    students = source.load() or {}
+    source.close()
+
+    directory = shard_directory(snapshot_path)
+    remove_shards(directory)
+    sharded = ShardedJournal(directory, shards, journal_class, os.path.splitext(snapshot_path)[1])
+    sharded.write_snapshot(students)
+    sharded.close()
+    return len(students)
+
+
+def migrate_to_single_file(snapshot_path: str, journal_path: str, journal_class: type = StudentJournal) -> int:
+    """
+    Combine a sharded layout back into a single-file database.
+
+    The single file is replaced and its journal discarded; the shards are
+    left in place.
+
+    Returns:
+        The number of records written
+    """
+    directory = shard_directory(snapshot_path)
+    shards = read_shard_count(directory)
+    if shards is None:
+        raise FileNotFoundError(f"No sharded database in '{directory}'")
+    sharded = ShardedJournal(directory, shards, journal_class, os.path.splitext(snapshot_path)[1])
+    students = sharded.load() or {}
+    sharded.close()
+
+    target = journal_class(snapshot_path, journal_path)
+    target.mark_dirty()
+    target.write_snapshot(students)
+    target.close()
+    return len(students)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("action", choices=["split", "join"])
+    parser.add_argument("snapshot", help="single-file database, e.g. students.json")
+    parser.add_argument("journal", help="its journal, e.g. students.journal")
+    parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS)
+    parser.add_argument("--binary", action="store_true", help="the database uses the binary snapshot format")
+    args = parser.parse_args(argv)
+
+    if args.binary:
+        from student_snapshot import BinarySnapshotJournal
+        journal_class = BinarySnapshotJournal
+    else:
+        journal_class = StudentJournal
+    try:
+        if args.action == "split":
+            count = migrate_to_shards(args.snapshot, args.journal, args.shards, journal_class)
+            print(f"Wrote {count} students to {args.shards} shards in {shard_directory(args.snapshot)}")
+        else:
+            count = migrate_to_single_file(args.snapshot, args.journal, journal_class)
+            print(f"Wrote {count} students to {args.snapshot}")
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
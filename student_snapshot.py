@@ -0,0 +1,322 @@
+"""
+Binary, memory-mapped student snapshots.
+
+File layout (little-endian):
+
+    header      magic b"MSUS", u16 version, u16 reserved, u64 count, u64 blob size
+    histogram   151 x u64, number of students of each age 0-150
+    offsets     (count + 1) x u64, start of each name in the blob
+    ages        count x u8
+    blob        UTF-8 names, concatenated in sorted byte order
+
+The file is opened with mmap and decoded lazily: a lookup binary-searches the
+sorted names touching O(log n) of them, and statistics come straight from the
+histogram, so opening even a very large snapshot costs one header read.
+"""
+import mmap
+import os
+import struct
+import sys
+import weakref
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterator, Optional, Tuple
+
+from student_journal import StudentJournal
+from student_store import MAX_AGE, StudentStore, _check_age
+
+MAGIC = b"MSUS"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHQQ")
+_HISTOGRAM_SIZE = (MAX_AGE + 1) * 8
+_DATA_START = _HEADER.size + _HISTOGRAM_SIZE
+
+
+class SnapshotError(Exception):
+    """Raised when a file is not a valid binary student snapshot."""
+
+
+def write_snapshot(path: str, students: Mapping, fsync: bool = True) -> int:
+    """
+    Write students to path in the binary snapshot format.
+
+    The file is written to a temporary path and renamed into place.
+
+    Returns:
+        The number of records written
+    """
+    records = []
+    for name, age in students.items():
+        _check_age(age)
+        records.append((name.encode('utf-8'), age))
+    records.sort()
+
+    histogram = array('Q', [0]) * (MAX_AGE + 1)
+    offsets = array('Q')
+    ages = array('B')
+    position = 0
+    for key, age in records:
+        offsets.append(position)
+        ages.append(age)
+        histogram[age] += 1
+        position += len(key)
+    offsets.append(position)
+
+    if sys.byteorder == 'big':
+        histogram.byteswap()
+        offsets.byteswap()
+
+    temp_path = path + ".tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, 0, len(records), position))
+        file.write(histogram.tobytes())
+        file.write(offsets.tobytes())
+        file.write(ages.tobytes())
+        for key, _ in records:
+            file.write(key)
+        file.flush()
+        if fsync:
+            os.fsync(file.fileno())
+    os.replace(temp_path, path)
+    return len(records)
+
+
+class StudentSnapshot(Mapping):
+    """
+    Read-only mapping of name -> age over a memory-mapped binary snapshot.
+
+    Nothing is decoded up front; names are decoded only when they are
+    compared or returned.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < _DATA_START:
+                raise SnapshotError(f"'{path}' is too small to be a student snapshot")
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, count, blob_size = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"'{path}' is not a student snapshot")
+        if version != VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {version} in '{path}'")
+
+        offsets_start = _DATA_START
+        ages_start = offsets_start + (count + 1) * 8
+        self._blob_start = ages_start + count
+        if self._blob_start + blob_size != size:
+            raise SnapshotError(f"'{path}' is truncated or corrupt")
+
+        self._count = count
+        view = memoryview(self._mmap)
+        histogram = view[_HEADER.size:_DATA_START]
+        offsets = view[offsets_start:ages_start]
+        if sys.byteorder == 'big':
+            histogram = array('Q', histogram.tobytes())
+            histogram.byteswap()
+            offsets = array('Q', offsets.tobytes())
+            offsets.byteswap()
+        else:
+            histogram = histogram.cast('Q')
+            offsets = offsets.cast('Q')
+        self._histogram = histogram
+        self._offsets = offsets
+        self._ages = view[ages_start:self._blob_start]
+
+    def _key(self, index: int) -> bytes:
+        start = self._blob_start + self._offsets[index]
+        end = self._blob_start + self._offsets[index + 1]
+        return self._mmap[start:end]
+
+    def _find(self, name) -> int:
+        if not isinstance(name, str):
+            return -1
+        key = name.encode('utf-8')
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and self._key(low) == key:
+            return low
+        return -1
+
+    def __getitem__(self, name: str) -> int:
+        index = self._find(name)
+        if index < 0:
+            raise KeyError(name)
+        return self._ages[index]
+
+    def get(self, name: str, default=None):
+        index = self._find(name)
+        return self._ages[index] if index >= 0 else default
+
+    def __contains__(self, name) -> bool:
+        return self._find(name) >= 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._key(index).decode('utf-8') for index in range(self._count))
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        return ((self._key(index).decode('utf-8'), self._ages[index]) for index in range(self._count))
+
+    def age_counts(self) -> list:
+        """Return the number of students of each age 0-150, read from the header."""
+        return list(self._histogram)
+
+    def close(self) -> None:
+        for name in ("_histogram", "_offsets", "_ages"):
+            view = getattr(self, name, None)
+            if isinstance(view, memoryview):
+                view.release()
+        self._mmap.close()
+
+
+_MISSING = object()
+
+
+class MappedStudentStore(StudentStore):
+    """
+    A StudentStore over a read-only StudentSnapshot plus in-memory changes.
+
+    Opening costs only the snapshot header: the age aggregates are seeded from
+    the stored histogram. Changes are kept in a small dict on top of the
+    snapshot (None marks a removal) until the next snapshot is written.
+
+    The store and its snapshot() copies share one mapping; close() unmaps it
+    once the last of them that is still alive is freed.
+    """
+
+    @classmethod
+    def open(cls, path: str) -> "MappedStudentStore":
+        store = cls()
+        snapshot = StudentSnapshot(path)
+        store._snapshot = snapshot
+        store._count = len(snapshot)
+        for age, count in enumerate(snapshot.age_counts()):
+            store._ages.counts[age] = count
+            store._age_sum += age * count
+            store._age_sum_sq += age * age * count
+        return store
+
+    def _init_storage(self) -> None:
+        self._snapshot = None
+        self._changes: Dict[str, Optional[int]] = {}
+        self._count = 0
+        # Copies returned by snapshot(), which keep reading the mapping
+        self._readers = []
+
+    def snapshot(self, sort: bool = False) -> "MappedStudentStore":
+        view = super().snapshot(sort)
+        if view is not self:
+            self._readers[:] = [ref for ref in self._readers if ref() is not None]
+            self._readers.append(weakref.ref(view))
+        return view
+
+    def close(self) -> None:
+        snapshot = self._snapshot
+        if snapshot is None or self._frozen:
+            return
+        readers = [reader for reader in (ref() for ref in self._readers) if reader is not None]
+        if not readers:
+            snapshot.close()
+            return
+        remaining = [len(readers)]
+
+        def release() -> None:
+            remaining[0] -= 1
+            if not remaining[0]:
+                snapshot.close()
+
+        for reader in readers:
+            weakref.finalize(reader, release)
+
+    def _copy_storage(self) -> None:
+        # The mapped snapshot is read-only; only the changes need copying
+        self._changes = dict(self._changes)
+
+    def _adopt_storage(self, data: Dict[str, int]) -> None:
+        self._changes = data
+        self._count = len(data)
+
+    def _lookup(self, name: str) -> Optional[int]:
+        age = self._changes.get(name, _MISSING)
+        if age is not _MISSING:
+            return age
+        if self._snapshot is None:
+            return None
+        return self._snapshot.get(name)
+
+    def _store(self, name: str, age: int) -> None:
+        if self._lookup(name) is None:
+            self._count += 1
+        self._changes[name] = age
+
+    def _drop(self, name: str) -> int:
+        age = self._lookup(name)
+        if age is None:
+            raise KeyError(name)
+        self._changes[name] = None
+        self._count -= 1
+        return age
+
+    def __getitem__(self, name: str) -> int:
+        age = self._lookup(name)
+        if age is None:
+            raise KeyError(name)
+        return age
+
+    def get(self, name: str, default=None):
+        age = self._lookup(name)
+        return default if age is None else age
+
+    def __contains__(self, name) -> bool:
+        return self._lookup(name) is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name, _ in self.items())
+
+    def keys(self):
+        return iter(self)
+
+    def values(self):
+        return (age for _, age in self.items())
+
+    def items(self):
+        if self._snapshot is not None:
+            for name, age in self._snapshot.items():
+                if name not in self._changes:
+                    yield name, age
+        for name, age in self._changes.items():
+            if age is not None:
+                yield name, age
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(self.items())
+
+
+class BinarySnapshotJournal(StudentJournal):
+    """
+    A StudentJournal whose snapshot is a binary file instead of JSON.
+
+    load() returns a MappedStudentStore with the journal replayed on top, so
+    start-up cost depends on the journal length rather than the roster size.
+    """
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return MappedStudentStore()
+        return MappedStudentStore.open(self.snapshot_path)
+
+    def _write_snapshot_file(self, students: Mapping, path: str) -> None:
+        write_snapshot(path, students, fsync=self.fsync)
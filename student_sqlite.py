@@ -0,0 +1,575 @@
+"""
+SQLite storage backend.
+
+The roster is kept in a SQLite database in WAL mode instead of in memory:
+
+    students     name TEXT PRIMARY KEY, age INTEGER, name_key TEXT
+                 (WITHOUT ROWID), indexed on (age, name) and on name_key
+    age_counts   age INTEGER PRIMARY KEY, count INTEGER
+
+name_key is the normalised name used for case-insensitive and prefix
+lookups, and triggers keep age_counts up to date on every insert, update
+and delete. Lookups are primary-key reads, range and top-k queries walk the
+age index, and statistics are aggregates over the 151 rows of age_counts,
+so none of them reads the whole roster. Several processes can share the
+database; SQLite's own locking coordinates them.
+
+Needs SQLite 3.25 or later, for upserts and window functions.
+"""
+import itertools
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from student_index import MAX_FUZZY_DISTANCE, NameIndex, normalize_name
+from student_store import MAX_AGE, MIN_AGE, StudentStore, _check_age
+
+# Rows fetched per query when walking the whole roster
+PAGE_SIZE = 1000
+# Seconds to wait for another connection's write to finish
+BUSY_TIMEOUT_SECONDS = 5.0
+
+_TABLES = [
+    f"""CREATE TABLE IF NOT EXISTS students (
+        name TEXT PRIMARY KEY,
+        age INTEGER NOT NULL CHECK (age BETWEEN {MIN_AGE} AND {MAX_AGE}),
+        name_key TEXT NOT NULL
+    ) WITHOUT ROWID""",
+    "CREATE TABLE IF NOT EXISTS age_counts (age INTEGER PRIMARY KEY, count INTEGER NOT NULL)",
+]
+# Secondary indexes and triggers, by name; replace_all() drops and recreates
+# them around a bulk load, which is several times faster than maintaining
+# them row by row
+_INDEXES = {
+    "students_by_age": "CREATE INDEX IF NOT EXISTS students_by_age ON students (age, name)",
+    "students_by_key": "CREATE INDEX IF NOT EXISTS students_by_key ON students (name_key)",
+}
+_TRIGGERS = {
+    "students_insert": """CREATE TRIGGER IF NOT EXISTS students_insert AFTER INSERT ON students BEGIN
+        UPDATE age_counts SET count = count + 1 WHERE age = NEW.age;
+    END""",
+    "students_delete": """CREATE TRIGGER IF NOT EXISTS students_delete AFTER DELETE ON students BEGIN
+        UPDATE age_counts SET count = count - 1 WHERE age = OLD.age;
+    END""",
+    "students_update": """CREATE TRIGGER IF NOT EXISTS students_update AFTER UPDATE OF age ON students
+    WHEN OLD.age != NEW.age BEGIN
+        UPDATE age_counts SET count = count - 1 WHERE age = OLD.age;
+        UPDATE age_counts SET count = count + 1 WHERE age = NEW.age;
+    END""",
+}
+
+_UPSERT = ("INSERT INTO students (name, age, name_key) VALUES (?, ?, ?) "
+           "ON CONFLICT (name) DO UPDATE SET age = excluded.age")
+
+
+def connect(path: str, synchronous: str = "NORMAL") -> sqlite3.Connection:
+    """
+    Open (creating if needed) a student database in WAL mode.
+
+    The connection is in autocommit mode and may be shared between threads;
+    callers serialise writers themselves.
+    """
+    connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None,
+                                 check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(f"PRAGMA synchronous={synchronous}")
+    for statement in _TABLES + list(_INDEXES.values()) + list(_TRIGGERS.values()):
+        connection.execute(statement)
+    connection.executemany("INSERT OR IGNORE INTO age_counts (age, count) VALUES (?, 0)",
+                           ((age,) for age in range(MIN_AGE, MAX_AGE + 1)))
+    return connection
+
+
+def _row(name: str, age: int) -> Tuple[str, int, str]:
+    _check_age(age)
+    return name, age, normalize_name(name)
+
+
+class SQLiteStudentStore(StudentStore):
+    """
+    A StudentStore whose records live in a SQLite database.
+
+    Every change is written straight to the database, in its own transaction
+    unless it is made inside transaction(). Reads query the database, so
+    changes committed by other processes are seen at once. Case-insensitive
+    and prefix lookups use the name_key index; only fuzzy suggestions build
+    an in-memory NameIndex. Single-row changes made through this store are
+    applied to it as they happen; it is rebuilt after bulk changes, a rolled
+    back transaction or a commit from another connection.
+
+    snapshot() opens a second connection and holds a read transaction on it,
+    which SQLite's WAL keeps at that point in time until the snapshot is
+    dropped.
+    """
+
+    persistent = True
+
+    def __init__(self, connection: sqlite3.Connection):
+        self._connection = connection
+        self._depth = 0
+        # (store version, database data_version) -> NameIndex for fuzzy lookups
+        self._fuzzy_index = None
+        super().__init__()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        return self._connection
+
+    def _init_storage(self) -> None:
+        pass
+
+    def _query(self, sql: str, parameters: Iterable = ()) -> sqlite3.Cursor:
+        return self._connection.execute(sql, parameters)
+
+    def _check_writable(self) -> None:
+        if self._frozen:
+            raise TypeError("Store snapshots are read-only")
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Apply the changes made inside the block in one SQLite transaction."""
+        self._check_writable()
+        if not self._depth:
+            self._query("BEGIN IMMEDIATE")
+        self._depth += 1
+        try:
+            yield
+        except BaseException:
+            self._depth -= 1
+            if not self._depth:
+                self._query("ROLLBACK")
+                # Anything derived from the rolled-back changes is stale
+                self._version += 1
+            raise
+        self._depth -= 1
+        if not self._depth:
+            self._query("COMMIT")
+
+    # Mapping API
+
+    def _lookup(self, name: str) -> Optional[int]:
+        if not isinstance(name, str):
+            return None
+        row = self._query("SELECT age FROM students WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def __getitem__(self, name: str) -> int:
+        age = self._lookup(name)
+        if age is None:
+            raise KeyError(name)
+        return age
+
+    def get(self, name: str, default=None):
+        age = self._lookup(name)
+        return default if age is None else age
+
+    def __contains__(self, name) -> bool:
+        return self._lookup(name) is not None
+
+    def __setitem__(self, name: str, age: int) -> None:
+        self._check_writable()
+        self._query(_UPSERT, _row(name, age))
+        self._changed_name(name, added=True)
+
+    def __delitem__(self, name: str) -> None:
+        self._check_writable()
+        if not self._query("DELETE FROM students WHERE name = ?", (name,)).rowcount:
+            raise KeyError(name)
+        self._changed_name(name, added=False)
+
+    def _changed_name(self, name: str, added: bool) -> None:
+        """Bump the version after a single-row change, keeping a current fuzzy index current."""
+        fuzzy = self._fuzzy_index
+        self._version += 1
+        if fuzzy is not None and fuzzy[0][0] == self._version - 1:
+            # Commits on this connection leave data_version unchanged
+            (_, data_version), index = fuzzy
+            if added:
+                index.add(name)
+            else:
+                index.discard(name)
+            self._fuzzy_index = ((self._version, data_version), index)
+
+    def __len__(self) -> int:
+        return self._query("SELECT COALESCE(SUM(count), 0) FROM age_counts").fetchone()[0]
+
+    def _walk(self, after: Optional[str] = None) -> Iterator[Tuple[str, int]]:
+        # Paged by key rather than through one open cursor, so a long walk
+        # does not hold a statement open across other queries and commits
+        while True:
+            if after is None:
+                rows = self._query("SELECT name, age FROM students ORDER BY name LIMIT ?",
+                                   (PAGE_SIZE,)).fetchall()
+            else:
+                rows = self._query("SELECT name, age FROM students WHERE name > ? ORDER BY name LIMIT ?",
+                                   (after, PAGE_SIZE)).fetchall()
+            yield from rows
+            if len(rows) < PAGE_SIZE:
+                return
+            after = rows[-1][0]
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name, _ in self._walk())
+
+    def keys(self):
+        return iter(self)
+
+    def values(self):
+        return (age for _, age in self._walk())
+
+    def items(self):
+        return self._walk()
+
+    def clear(self) -> None:
+        self._check_writable()
+        self._query("DELETE FROM students")
+        self._version += 1
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(self._walk())
+
+    # Bulk changes
+
+    def merge(self, records: Iterable[Tuple[str, int]]) -> Tuple[int, int]:
+        """Upsert every (name, age) pair with executemany in one transaction."""
+        records = list(records)
+        with self.transaction():
+            if not len(self):
+                # Nothing to update, so load in bulk
+                self.replace_all(records)
+                added = len(self)
+                return added, len(records) - added
+            before = len(self)
+            self._connection.executemany(_UPSERT, (_row(name, age) for name, age in records))
+            added = len(self) - before
+        self._version += 1
+        return added, len(records) - added
+
+    def replace_all(self, records: Iterable[Tuple[str, int]]) -> None:
+        """
+        Replace every record with records, in one transaction.
+
+        The age index, name_key index and age_counts triggers are dropped for
+        the load and rebuilt in bulk afterwards, all inside the transaction.
+        """
+        with self.transaction():
+            for name in _TRIGGERS:
+                self._query(f"DROP TRIGGER {name}")
+            for name in _INDEXES:
+                self._query(f"DROP INDEX {name}")
+            self._query("DELETE FROM students")
+            self._connection.executemany("INSERT OR REPLACE INTO students (name, age, name_key) VALUES (?, ?, ?)",
+                                         (_row(name, age) for name, age in records))
+            for statement in list(_INDEXES.values()) + list(_TRIGGERS.values()):
+                self._query(statement)
+            self._query("UPDATE age_counts SET count = 0")
+            self._connection.executemany("UPDATE age_counts SET count = ? WHERE age = ?", (
+                (count, age) for age, count in self._query("SELECT age, COUNT(*) FROM students GROUP BY age")))
+        self._version += 1
+
+    # Ordered listings
+
+    def sorted_names(self) -> list:
+        """Return every name in sorted order, read from the primary key."""
+        return list(self)
+
+    def iter_sorted(self, offset: int = 0, limit: Optional[int] = None,
+                    start_after: Optional[str] = None) -> Iterator[tuple]:
+        offset = max(offset, 0)
+        if limit is None:
+            return itertools.islice(self._walk(start_after), offset, None)
+        if start_after is None:
+            rows = self._query("SELECT name, age FROM students ORDER BY name LIMIT ? OFFSET ?",
+                               (max(limit, 0), offset))
+        else:
+            rows = self._query("SELECT name, age FROM students WHERE name > ? ORDER BY name LIMIT ? OFFSET ?",
+                               (start_after, max(limit, 0), offset))
+        return iter(rows.fetchall())
+
+    # Indexes and statistics
+
+    def name_index(self) -> "SQLiteNameIndex":
+        return SQLiteNameIndex(self)
+
+    def age_index(self) -> "SQLiteAgeIndex":
+        return SQLiteAgeIndex(self)
+
+    def fuzzy_index(self) -> NameIndex:
+        """Return an in-memory NameIndex for fuzzy lookups, rebuilt after any change."""
+        key = (self._version, self._query("PRAGMA data_version").fetchone()[0])
+        if self._fuzzy_index is None or self._fuzzy_index[0] != key:
+            self._fuzzy_index = (key, NameIndex(self))
+        return self._fuzzy_index[1]
+
+    def age_counts(self) -> Dict[int, int]:
+        return dict(self._query("SELECT age, count FROM age_counts WHERE count > 0 ORDER BY age"))
+
+    def _age_at_rank(self, rank: int) -> int:
+        row = self._query(
+            "SELECT age FROM (SELECT age, SUM(count) OVER (ORDER BY age) AS seen FROM age_counts) "
+            "WHERE seen > ? ORDER BY age LIMIT 1", (rank,)).fetchone()
+        if row is None:
+            raise IndexError(rank)
+        return row[0]
+
+    def stats(self) -> Dict[str, Any]:
+        count, age_sum, age_sum_sq, minimum, maximum = self._query(
+            "SELECT COALESCE(SUM(count), 0), COALESCE(SUM(age * count), 0), "
+            "COALESCE(SUM(age * age * count), 0), MIN(age), MAX(age) "
+            "FROM age_counts WHERE count > 0").fetchone()
+        return self._summarise(count, age_sum, age_sum_sq, minimum, maximum)
+
+    def snapshot(self, sort: bool = False) -> "SQLiteStudentStore":
+        """
+        Return a read-only view of the database as it is now.
+
+        Changes made inside an unfinished transaction() are not included.
+        """
+        if self._frozen:
+            return self
+        path = self._query("PRAGMA database_list").fetchone()[2]
+        if not path:
+            raise ValueError("Snapshots need a database file, not an in-memory database")
+        connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None,
+                                     check_same_thread=False)
+        # The first read starts the transaction that pins this version
+        connection.execute("BEGIN")
+        connection.execute("SELECT count FROM age_counts LIMIT 1").fetchall()
+        view = SQLiteStudentStore(connection)
+        view._version = self._version
+        view._frozen = True
+        return view
+
+
+class SQLiteNameIndex:
+    """The NameIndex lookups of a SQLiteStudentStore, run against its name_key index."""
+
+    def __init__(self, store: SQLiteStudentStore):
+        self._store = store
+
+    def exact(self, name: str) -> List[str]:
+        """Return every stored spelling that matches name case-insensitively."""
+        rows = self._store._query("SELECT name FROM students WHERE name_key = ? ORDER BY name",
+                                  (normalize_name(name),))
+        return [name for name, in rows]
+
+    def prefix(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """Return names whose normalised form starts with prefix, in key order."""
+        key = normalize_name(prefix)
+        # Every key that starts with prefix sorts below prefix + the largest code point
+        rows = self._store._query(
+            "SELECT name FROM students WHERE name_key >= ? AND name_key < ? ORDER BY name_key, name LIMIT ?",
+            (key, key + "\U0010ffff", -1 if limit is None else limit))
+        return [name for name, in rows]
+
+    def fuzzy(self, query: str, limit: int = 5,
+              max_distance: int = MAX_FUZZY_DISTANCE) -> List[Tuple[str, int]]:
+        """Return up to limit (name, distance) pairs within max_distance edits of query."""
+        return self._store.fuzzy_index().fuzzy(query, limit, max_distance)
+
+
+class SQLiteAgeIndex:
+    """The AgeIndex queries of a SQLiteStudentStore, run against its age index."""
+
+    def __init__(self, store: SQLiteStudentStore):
+        self._store = store
+
+    def count_by_age(self) -> Dict[int, int]:
+        return self._store.age_counts()
+
+    def count_in_range(self, min_age: int, max_age: int) -> int:
+        return self._store._query("SELECT COALESCE(SUM(count), 0) FROM age_counts WHERE age BETWEEN ? AND ?",
+                                  (min_age, max_age)).fetchone()[0]
+
+    def min(self) -> Optional[int]:
+        return self._store._query("SELECT MIN(age) FROM students").fetchone()[0]
+
+    def max(self) -> Optional[int]:
+        return self._store._query("SELECT MAX(age) FROM students").fetchone()[0]
+
+    def in_range(self, min_age: int, max_age: int, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Return (name, age) pairs with min_age <= age <= max_age, by age then name."""
+        rows = self._store._query(
+            "SELECT name, age FROM students WHERE age BETWEEN ? AND ? ORDER BY age, name LIMIT ?",
+            (min_age, max_age, -1 if limit is None else limit))
+        return rows.fetchall()
+
+    def top(self, k: int, oldest: bool = True) -> List[Tuple[str, int]]:
+        """Return the k oldest (or youngest) students as (name, age) pairs, ties by name."""
+        order = "age DESC, name" if oldest else "age, name"
+        return self._store._query(f"SELECT name, age FROM students ORDER BY {order} LIMIT ?",
+                                  (max(k, 0),)).fetchall()
+
+
+class SQLiteJournal:
+    """
+    The storage backend interface over a SQLite database.
+
+    load() returns a SQLiteStudentStore that reads and writes the database
+    directly, so there is no journal to replay or compact: each change is
+    committed as it is made, and each batch as one transaction. With
+    flush_every=1 every commit is synced to disk (synchronous=FULL);
+    otherwise commits are synced when the WAL is checkpointed, after
+    flush_every changes and on flush() or save (synchronous=NORMAL).
+    flush_interval is not used.
+
+    A roster that is not this database's own store, such as a replacing
+    import built in memory, is copied in by write_snapshot() in a single
+    transaction, which returns the database's store to use in its place.
+    """
+
+    def __init__(self, path: str, journal_path: Optional[str] = None,
+                 flush_every: int = 1, flush_interval: Optional[float] = None):
+        self.snapshot_path = path
+        # There is no separate journal; the WAL file is SQLite's own
+        self.journal_path = path
+        self._flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._connection = None
+        self._store = None
+        self._pending = 0
+        self._dirty = False
+        self._untracked = True
+        self._data_version = None
+
+    @property
+    def flush_every(self) -> int:
+        return self._flush_every
+
+    @flush_every.setter
+    def flush_every(self, value: int) -> None:
+        self._flush_every = value
+        if self._connection is not None:
+            self._connection.execute(f"PRAGMA synchronous={self._synchronous()}")
+
+    def _synchronous(self) -> str:
+        return "FULL" if self._flush_every == 1 else "NORMAL"
+
+    def _connect(self) -> SQLiteStudentStore:
+        if self._connection is None:
+            self._connection = connect(self.snapshot_path, self._synchronous())
+            self._store = SQLiteStudentStore(self._connection)
+        return self._store
+
+    def _owns(self, students) -> bool:
+        return isinstance(students, SQLiteStudentStore) and students.connection is self._connection
+
+    def _data_version_now(self) -> int:
+        return self._connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def _mark_synced(self) -> None:
+        self._data_version = self._data_version_now()
+        self._dirty = False
+        self._untracked = False
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty or self._pending > 0
+
+    @property
+    def tracked(self) -> bool:
+        return not self._untracked
+
+    @property
+    def pending_count(self) -> int:
+        return self._pending
+
+    def mark_dirty(self) -> None:
+        self._dirty = True
+        self._untracked = True
+
+    def exists(self) -> bool:
+        return os.path.exists(self.snapshot_path)
+
+    def in_sync(self) -> bool:
+        with self._lock:
+            return (not self._untracked and self._connection is not None
+                    and self._data_version_now() == self._data_version)
+
+    def load(self) -> Optional[SQLiteStudentStore]:
+        """
+        Open the database.
+
+        Returns:
+            The database's store, or None if the database did not exist
+        """
+        with self._lock:
+            existed = self.exists()
+            store = self._connect()
+            self._mark_synced()
+            return store if existed else None
+
+    def refresh(self, students) -> Optional[int]:
+        """Return 0 for the database's own store, which always reads current data; else None."""
+        with self._lock:
+            if self._untracked or not self._owns(students):
+                return None
+            # Other processes' commits are already visible; note having seen them
+            self._data_version = self._data_version_now()
+            return 0
+
+    def append(self, op: str, name: str, age: Optional[int] = None) -> None:
+        """Count a change the store has already committed, syncing every flush_every changes."""
+        with self._lock:
+            # A roster not yet copied in is only written by write_snapshot()
+            self._dirty = self._dirty or self._untracked
+            self._pending += 1
+            if self._flush_every and self._pending >= self._flush_every:
+                self.flush()
+
+    def append_batch(self, records: List[List]) -> None:
+        """Sync a batch the store has already committed as one transaction."""
+        with self._lock:
+            self._dirty = self._dirty or self._untracked
+            self._pending += 1
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Make committed changes durable by checkpointing the WAL, which syncs it first.
+
+        Returns:
+            The number of changes made durable
+        """
+        with self._lock:
+            written = self._pending
+            self._pending = 0
+            if written and self._connection is not None and self._synchronous() != "FULL":
+                self._connection.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+            return written
+
+    def maybe_compact(self, students: Optional[Mapping[str, int]]) -> bool:
+        # SQLite checkpoints its WAL by itself
+        return False
+
+    def wait_for_compaction(self) -> None:
+        pass
+
+    def write_snapshot(self, students: Optional[Mapping[str, int]]) -> Optional[SQLiteStudentStore]:
+        """
+        Store the whole roster, unless it is already the database's own store.
+
+        Returns:
+            The database's store if students was copied into it, or None
+        """
+        with self._lock:
+            store = self._connect()
+            copied = None
+            if students is not None and not self._owns(students):
+                store.replace_all(students.items())
+                copied = store
+            self._pending = 0
+            self._connection.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+            self._mark_synced()
+            return copied
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+                self._store = None
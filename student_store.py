@@ -0,0 +1,634 @@
+import copy
+import math
+import threading
+import weakref
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from collections.abc import Mapping, MutableMapping
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from student_index import AgeIndex, NameIndex
+
+MIN_AGE = 0
+MAX_AGE = 150
+
+
+class StudentStore(MutableMapping):
+    """
+    A name -> age mapping that keeps running aggregates up to date on every change.
+
+    Alongside the records it maintains the count, the sum and sum of squares
+    of all ages, and an AgeIndex counting how many students have each age
+    from 0 to 150. Because ages are bounded, those counts make min, max,
+    median and any percentile exact after removals, and every statistic
+    costs at most one pass over 151 buckets regardless of roster size. The
+    AgeIndex's per-age name buckets are materialised on the first range or
+    top-k query.
+
+    A sorted list of names is built the first time an ordered listing is
+    requested and kept sorted from then on, so listings do not re-sort. A
+    NameIndex for case-insensitive, prefix and fuzzy lookup is likewise built
+    on first use and then updated with every insert and removal;
+    prepare_name_index() builds it ahead of time on a background thread.
+
+    snapshot() returns a read-only copy of the store as it is now, in O(1):
+    the copy shares the storage, and the next change to the store copies the
+    storage first if any snapshot is still alive. Each version's storage is
+    freed with the last snapshot that holds it.
+    """
+
+    # True for stores whose records live in a database rather than in memory
+    persistent = False
+
+    def __init__(self, data=None):
+        self._init_storage()
+        self._reset_indexes()
+        # Bumped on every change, so callers can tell whether a store was modified
+        self._version = 0
+        # Set by snapshot(); the next change copies the storage if a snapshot
+        # taken since the last change is still alive
+        self._shared = False
+        self._snapshots = []
+        self._frozen = False
+        # Guards installing a name index built by prepare_name_index()
+        self._name_lock = threading.Lock()
+        if data:
+            self.update(data)
+
+    def _init_storage(self) -> None:
+        self._data = {}
+
+    def _reset_indexes(self) -> None:
+        self._ages = AgeIndex(MAX_AGE)
+        self._age_sum = 0
+        self._age_sum_sq = 0
+        self._sorted_names = None
+        self._name_index = None
+        # (thread, result) of a background name index build, and the names
+        # added or removed since the snapshot it reads was taken
+        self._name_builder = None
+        self._name_backlog = None
+
+    @classmethod
+    def adopt(cls, data: Dict[str, int]) -> "StudentStore":
+        """
+        Build a store from a freshly loaded dict, computing aggregates in bulk.
+
+        The dict-backed store wraps the dict without copying it, so it must
+        not be modified directly afterwards.
+        """
+        store = cls()
+        counts = Counter(data.values())
+        for age in counts:
+            _check_age(age)
+        for age, count in counts.items():
+            store._ages.counts[age] = count
+            store._age_sum += age * count
+            store._age_sum_sq += age * age * count
+        store._adopt_storage(data)
+        return store
+
+    def _adopt_storage(self, data: Dict[str, int]) -> None:
+        self._data = data
+
+    # Storage primitives; subclasses with a different layout override these
+    # together with the read-only mapping methods below.
+
+    def _lookup(self, name: str) -> Optional[int]:
+        return self._data.get(name)
+
+    def _store(self, name: str, age: int) -> None:
+        self._data[name] = age
+
+    def _drop(self, name: str) -> int:
+        return self._data.pop(name)
+
+    def __getitem__(self, name: str) -> int:
+        return self._data[name]
+
+    def __setitem__(self, name: str, age: int) -> None:
+        _check_age(age)
+        if self._shared:
+            self._unshare()
+        self._version += 1
+        old_age = self._lookup(name)
+        if old_age is not None:
+            self._remove_age(name, old_age)
+        else:
+            if self._sorted_names is not None:
+                insort(self._sorted_names, name)
+            self._index_name(name, True)
+        self._store(name, age)
+        self._add_age(name, age)
+
+    def __delitem__(self, name: str) -> None:
+        if self._shared:
+            self._unshare()
+        age = self._drop(name)
+        self._version += 1
+        self._remove_age(name, age)
+        if self._sorted_names is not None:
+            del self._sorted_names[bisect_left(self._sorted_names, name)]
+        self._index_name(name, False)
+
+    def _index_name(self, name: str, added: bool) -> None:
+        if self._name_builder is not None and not self._name_builder[0].is_alive():
+            self.name_index()
+        if self._name_index is not None:
+            if added:
+                self._name_index.add(name)
+            else:
+                self._name_index.discard(name)
+        elif self._name_backlog is not None:
+            self._name_backlog.append((name, added))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, name) -> bool:
+        return name in self._data
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, StudentStore):
+            other = other.as_dict()
+        elif not isinstance(other, Mapping):
+            return NotImplemented
+        return self.as_dict() == dict(other)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.as_dict()!r})"
+
+    def get(self, name: str, default=None):
+        return self._data.get(name, default)
+
+    def keys(self):
+        return self._data.keys()
+
+    def values(self):
+        return self._data.values()
+
+    def items(self):
+        return self._data.items()
+
+    def clear(self) -> None:
+        if self._frozen:
+            raise TypeError("Store snapshots are read-only")
+        # Fresh storage, so snapshots keep the old one without a copy
+        self._shared = False
+        self._snapshots = []
+        self._init_storage()
+        self._reset_indexes()
+        self._version += 1
+
+    def as_dict(self) -> Dict[str, int]:
+        """Return the records as a dict, for read-only use such as serialisation."""
+        return self._data
+
+    @property
+    def version(self) -> int:
+        """A counter that changes whenever the store is modified."""
+        return self._version
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Group changes so a persistent store applies them all or none.
+
+        In-memory stores apply changes as they are made; their callers roll
+        back themselves if journaling fails.
+        """
+        yield
+
+    def merge(self, records: Iterable[Tuple[str, int]]) -> Tuple[int, int]:
+        """
+        Set every (name, age) pair, later pairs winning.
+
+        Returns:
+            (number of names added, number of existing names updated)
+        """
+        added = updated = 0
+        for name, age in records:
+            if name in self:
+                updated += 1
+            else:
+                added += 1
+            self[name] = age
+        return added, updated
+
+    def snapshot(self, sort: bool = False) -> "StudentStore":
+        """
+        Return a read-only, point-in-time copy of the store in O(1).
+
+        The snapshot shares this store's storage and sorted-name list, copies
+        only the 151 age counts, and keeps this store's version. It can be
+        read, listed and exported without any lock while the store keeps
+        changing. Take it while no other thread is changing the store.
+
+        Args:
+            sort: Build the sorted-name list first, on this store, which then
+                keeps it up to date, so ordered walks of snapshots share it
+
+        Returns:
+            A store of the same type that raises TypeError on any change
+        """
+        if self._frozen:
+            return self
+        if sort:
+            self.sorted_names()
+        view = copy.copy(self)
+        view._ages = self._ages.copy_counts()
+        view._name_index = None
+        view._name_builder = None
+        view._name_backlog = None
+        view._snapshots = []
+        view._frozen = True
+        view._shared = True
+        self._snapshots.append(weakref.ref(view))
+        self._shared = True
+        return view
+
+    @property
+    def frozen(self) -> bool:
+        """True for a read-only store returned by snapshot()."""
+        return self._frozen
+
+    def close(self) -> None:
+        """Release resources held outside memory once the store is no longer the roster; none here."""
+
+    def _unshare(self) -> None:
+        if self._frozen:
+            raise TypeError("Store snapshots are read-only")
+        if any(ref() is not None for ref in self._snapshots):
+            self._copy_storage()
+            if self._sorted_names is not None:
+                self._sorted_names = list(self._sorted_names)
+        self._snapshots = []
+        self._shared = False
+
+    def _copy_storage(self) -> None:
+        """Give this store its own copy of storage it shares with snapshots."""
+        self._data = dict(self._data)
+
+    def sorted_names(self) -> list:
+        """Return the maintained list of names in sorted order (read-only)."""
+        if self._sorted_names is None:
+            self._sorted_names = sorted(self)
+        return self._sorted_names
+
+    def name_index(self) -> NameIndex:
+        """Return the name lookup index, building it on first use."""
+        if self._name_index is None:
+            with self._name_lock:
+                if self._name_index is None:
+                    self._name_index = self._take_built_index() or NameIndex(self)
+        return self._name_index
+
+    def _take_built_index(self) -> Optional[NameIndex]:
+        """Wait for a background build and bring its index up to date."""
+        if self._name_builder is None:
+            return None
+        thread, result = self._name_builder
+        thread.join()
+        index = result.get("index")
+        if index is not None:
+            for name, added in self._name_backlog:
+                if added:
+                    index.add(name)
+                else:
+                    index.discard(name)
+        self._name_builder = None
+        self._name_backlog = None
+        return index
+
+    def prepare_name_index(self) -> None:
+        """
+        Start building the name index on a background thread.
+
+        The thread indexes a snapshot, so the store stays usable meanwhile;
+        names added or removed before the build finishes are queued and
+        applied when the index is installed. Call it while no other thread
+        is changing the store.
+        """
+        if self._frozen or self._name_index is not None or self._name_builder is not None:
+            return
+        view = self.snapshot()
+        result = {}
+
+        def build() -> None:
+            result["index"] = NameIndex(view)
+
+        thread = threading.Thread(target=build, name="student-name-index", daemon=True)
+        self._name_backlog = []
+        self._name_builder = (thread, result)
+        thread.start()
+
+    def iter_sorted(self, offset: int = 0, limit: Optional[int] = None,
+                    start_after: Optional[str] = None) -> Iterator[tuple]:
+        """
+        Yield (name, age) pairs in name order, one page at a time.
+
+        Args:
+            offset: Number of records to skip after the starting point
+            limit: Maximum number of records to yield, or None for all
+            start_after: Start after this name instead of at the beginning,
+                so callers can page with a cursor that survives inserts and removals
+
+        Yields:
+            (name, age) tuples
+        """
+        names = self.sorted_names()
+        start = 0 if start_after is None else bisect_right(names, start_after)
+        start += max(offset, 0)
+        stop = len(names) if limit is None else min(len(names), start + max(limit, 0))
+        # Slice the page up front so later changes cannot shift it mid-iteration
+        for name in names[start:stop]:
+            age = self.get(name)
+            if age is not None:
+                yield name, age
+
+    def age_index(self) -> AgeIndex:
+        """Return the age index, materialising its name buckets on first use."""
+        if not self._ages.built:
+            self._ages.build(self.items())
+        return self._ages
+
+    def _add_age(self, name: str, age: int) -> None:
+        self._ages.add(name, age)
+        self._age_sum += age
+        self._age_sum_sq += age * age
+
+    def _remove_age(self, name: str, age: int) -> None:
+        self._ages.discard(name, age)
+        self._age_sum -= age
+        self._age_sum_sq -= age * age
+
+    def age_counts(self) -> Dict[int, int]:
+        """Return how many students have each age, for ages that occur."""
+        return self._ages.count_by_age()
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+        Return the given percentile of ages, interpolating between ranks.
+
+        Args:
+            percent: Percentile between 0 and 100
+
+        Returns:
+            The percentile, or None if the store is empty
+        """
+        if not 0 <= percent <= 100:
+            raise ValueError(f"Percentile must be between 0 and 100, got {percent}")
+        if not len(self):
+            return None
+
+        position = (len(self) - 1) * percent / 100
+        lower = math.floor(position)
+        upper = math.ceil(position)
+        lower_age = self._age_at_rank(lower)
+        if upper == lower:
+            return float(lower_age)
+        upper_age = self._age_at_rank(upper)
+        return lower_age + (upper_age - lower_age) * (position - lower)
+
+    def _age_at_rank(self, rank: int) -> int:
+        return self._ages.age_at_rank(rank)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return count, mean, median, population variance and standard deviation, min and max.
+
+        Returns:
+            Dict of statistics; every value except count is None for an empty store
+        """
+        count = len(self)
+        if not count:
+            return self._summarise(0, 0, 0, None, None)
+        return self._summarise(count, self._age_sum, self._age_sum_sq, self._ages.min(), self._ages.max())
+
+    def _summarise(self, count: int, age_sum: int, age_sum_sq: int,
+                   minimum: Optional[int], maximum: Optional[int]) -> Dict[str, Any]:
+        if not count:
+            return {"count": 0, "sum": 0, "mean": None, "median": None, "variance": None,
+                    "std_dev": None, "min": None, "max": None}
+
+        # Exact integer arithmetic until the final division
+        variance = (count * age_sum_sq - age_sum ** 2) / (count * count)
+        return {
+            "count": count,
+            "sum": age_sum,
+            "mean": age_sum / count,
+            "median": self.percentile(50),
+            "variance": variance,
+            "std_dev": math.sqrt(variance),
+            "min": minimum,
+            "max": maximum,
+        }
+
+
+def _check_age(age) -> None:
+    if isinstance(age, bool) or not isinstance(age, int):
+        raise TypeError(f"Age must be an integer, got {type(age).__name__}")
+    if not (MIN_AGE <= age <= MAX_AGE):
+        raise ValueError(f"Age must be between {MIN_AGE} and {MAX_AGE}, got {age}")
+
+
+_EMPTY = -1
+_DELETED = -2
+_FREE_AGE = 255
+
+
+class CompactStudentStore(StudentStore):
+    """
+    A StudentStore that keeps records in flat arrays instead of a dict.
+
+    Names are stored once, UTF-8 encoded, in a single ``bytearray`` and
+    referenced by offset and length arrays, so no per-name ``str`` object is
+    kept alive. Ages take one byte per slot in an ``array('B')`` and an
+    open-addressing hash table of 4-byte slot numbers maps names to slots.
+    Removed slots are reused and the name blob is compacted once more than
+    half of it is dead. Run ``python benchmarks.py store-memory`` to compare
+    it with the dict store.
+
+    It supports the same mapping API, statistics and indexes as StudentStore,
+    but names are decoded on every access, and as_dict() builds a new dict.
+    The sorted-name and name-lookup indexes hold ``str`` objects, so building
+    them gives back much of the saving.
+    """
+
+    def _init_storage(self) -> None:
+        self._blob = bytearray()
+        self._offsets = array('I')
+        self._lengths = array('H')
+        self._slot_ages = array('B')
+        self._free_slots = array('I')
+        self._table = array('i', [_EMPTY]) * 8
+        self._count = 0
+        self._filled = 0
+        self._dead_bytes = 0
+
+    def _copy_storage(self) -> None:
+        self._blob = bytearray(self._blob)
+        self._offsets = self._offsets[:]
+        self._lengths = self._lengths[:]
+        self._slot_ages = self._slot_ages[:]
+        self._free_slots = self._free_slots[:]
+        self._table = self._table[:]
+
+    def _adopt_storage(self, data: Dict[str, int]) -> None:
+        for name, age in data.items():
+            self._append_slot(name.encode('utf-8'), age)
+        self._count = len(data)
+        self._rebuild_table()
+
+    def _append_slot(self, key: bytes, age: int) -> int:
+        if len(key) > 0xFFFF:
+            raise ValueError("Student name is too long")
+        slot = len(self._slot_ages)
+        self._offsets.append(len(self._blob))
+        self._lengths.append(len(key))
+        self._slot_ages.append(age)
+        self._blob += key
+        return slot
+
+    def _slot_key(self, slot: int) -> bytes:
+        offset = self._offsets[slot]
+        return bytes(self._blob[offset:offset + self._lengths[slot]])
+
+    def _slot_name(self, slot: int) -> str:
+        offset = self._offsets[slot]
+        return self._blob[offset:offset + self._lengths[slot]].decode('utf-8')
+
+    def _live_slots(self) -> Iterator[int]:
+        return (slot for slot, age in enumerate(self._slot_ages) if age != _FREE_AGE)
+
+    def _rebuild_table(self) -> None:
+        capacity = 8
+        while capacity < self._count * 2:
+            capacity *= 2
+        table = array('i', [_EMPTY]) * capacity
+        mask = capacity - 1
+        for slot in self._live_slots():
+            position = hash(self._slot_key(slot)) & mask
+            while table[position] != _EMPTY:
+                position = (position + 1) & mask
+            table[position] = slot
+        self._table = table
+        self._filled = self._count
+
+    def _compact_blob(self) -> None:
+        blob = bytearray()
+        for slot in self._live_slots():
+            offset = self._offsets[slot]
+            self._offsets[slot] = len(blob)
+            blob += self._blob[offset:offset + self._lengths[slot]]
+        self._blob = blob
+        self._dead_bytes = 0
+
+    def _probe(self, key: bytes) -> tuple:
+        """Return (table position, slot) for an encoded name; slot is -1 if it is absent."""
+        table = self._table
+        mask = len(table) - 1
+        position = hash(key) & mask
+        reusable = -1
+        length = len(key)
+        while True:
+            slot = table[position]
+            if slot == _EMPTY:
+                return (reusable if reusable >= 0 else position), -1
+            if slot == _DELETED:
+                if reusable < 0:
+                    reusable = position
+            elif self._lengths[slot] == length:
+                offset = self._offsets[slot]
+                if self._blob[offset:offset + length] == key:
+                    return position, slot
+            position = (position + 1) & mask
+
+    def _find(self, name) -> int:
+        if not isinstance(name, str):
+            return -1
+        return self._probe(name.encode('utf-8'))[1]
+
+    def _lookup(self, name: str) -> Optional[int]:
+        slot = self._find(name)
+        return self._slot_ages[slot] if slot >= 0 else None
+
+    def _store(self, name: str, age: int) -> None:
+        key = name.encode('utf-8')
+        position, slot = self._probe(key)
+        if slot >= 0:
+            self._slot_ages[slot] = age
+            return
+
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            if len(key) > 0xFFFF:
+                raise ValueError("Student name is too long")
+            self._offsets[slot] = len(self._blob)
+            self._lengths[slot] = len(key)
+            self._slot_ages[slot] = age
+            self._blob += key
+        else:
+            slot = self._append_slot(key, age)
+
+        if self._table[position] == _EMPTY:
+            self._filled += 1
+        self._table[position] = slot
+        self._count += 1
+        # Grow (or clear out tombstones) once two thirds of the table is used
+        if self._filled * 3 >= len(self._table) * 2:
+            self._rebuild_table()
+
+    def _drop(self, name: str) -> int:
+        key = name.encode('utf-8')
+        position, slot = self._probe(key)
+        if slot < 0:
+            raise KeyError(name)
+        age = self._slot_ages[slot]
+        self._table[position] = _DELETED
+        self._slot_ages[slot] = _FREE_AGE
+        self._free_slots.append(slot)
+        self._count -= 1
+        self._dead_bytes += len(key)
+        if self._dead_bytes * 2 > len(self._blob):
+            self._compact_blob()
+        return age
+
+    def __getitem__(self, name: str) -> int:
+        slot = self._find(name)
+        if slot < 0:
+            raise KeyError(name)
+        return self._slot_ages[slot]
+
+    def get(self, name: str, default=None):
+        slot = self._find(name)
+        return self._slot_ages[slot] if slot >= 0 else default
+
+    def __contains__(self, name) -> bool:
+        return self._find(name) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._slot_name(slot) for slot in self._live_slots())
+
+    def __len__(self) -> int:
+        return self._count
+
+    # keys, values and items are iterators rather than views, so walking a
+    # large roster never materialises it
+
+    def keys(self):
+        return iter(self)
+
+    def values(self):
+        return (age for age in self._slot_ages if age != _FREE_AGE)
+
+    def items(self):
+        return ((self._slot_name(slot), self._slot_ages[slot]) for slot in self._live_slots())
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(self.items())
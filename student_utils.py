@@ -1,92 +1,554 @@
+import atexit
+import functools
+import hashlib
+import io
 import json
 import csv
 import os
-from typing import Dict, Any
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from student_journal import StorageBackend, StudentJournal, _file_signature, dump_students_json
+from student_locks import FileLock, ReadWriteLock
+from student_shards import ShardedJournal, remove_shards, shard_directory
+from student_snapshot import BinarySnapshotJournal, SnapshotError, StudentSnapshot, write_snapshot
+from student_sqlite import SQLiteJournal
+from student_store import MAX_AGE, CompactStudentStore, StudentStore
 
 DEFAULT_STUDENTS = {"Alice": 20, "Bob": 22, "Charlie": 19}
 JSON_FILE = "students.json"
+JOURNAL_FILE = "students.journal"
 CSV_FILE = "students.csv"
-students = {}
+# "json" keeps the database in students.json; "binary" uses a memory-mapped
+# snapshot that opens without parsing every record (see student_snapshot.py)
+SNAPSHOT_FORMAT = "json"
+BINARY_SNAPSHOT_FILE = "students.msus"
+BINARY_JOURNAL_FILE = "students.msus.journal"
+# 0 keeps the database in a single snapshot file; N splits it by name hash
+# across N shard files in <snapshot>.shards/, saved in parallel (see
+# student_shards.py). An existing layout's own shard count wins.
+SHARD_COUNT = 0
+# "journal" keeps the roster in memory, saved to the files above; "sqlite"
+# keeps it in a SQLite database that is queried directly (see student_sqlite.py)
+STORAGE_BACKEND = "journal"
+SQLITE_FILE = "students.db"
+# Storage choices made through use_sqlite_backend(), use_binary_snapshot() and
+# use_sharded_layout(), saved so the next process
+# opens the same files; when present it overrides the defaults above
+STORAGE_SETTINGS_FILE = "students.storage.json"
+# Write-behind policy: journal records are flushed after this many changes or
+# this many seconds after the first unflushed change, whichever comes first.
+FLUSH_EVERY_N_MUTATIONS = 100
+FLUSH_INTERVAL_SECONDS = 2.0
+# CSV imports are streamed and applied this many records at a time
+IMPORT_BATCH_SIZE = 10000
+# Number of students shown per page in listings
+LIST_PAGE_SIZE = 20
+# "dict" keeps records in a plain dict; "compact" uses the array-backed
+# CompactStudentStore, which needs far less memory per record on large rosters
+STORE_TYPE = "dict"
+MAX_IMPORT_WARNINGS = 20
+# Files smaller than this are always parsed serially; process start-up dominates below it
+PARALLEL_IMPORT_MIN_BYTES = 32 * 1024 * 1024
+# Shards a parallel import keeps parsed or in progress per worker process
+PARALLEL_IMPORT_SHARDS_PER_WORKER = 2
+# True builds the name lookup index of in-memory rosters of at least
+# NAME_INDEX_PREPARE_MIN_STUDENTS in the background as soon as they are loaded,
+# so the first name search does not wait for it. Off by default, since every
+# load and import would then pay for an index no search may ever use.
+PREPARE_NAME_INDEX = False
+NAME_INDEX_PREPARE_MIN_STUDENTS = 20000
+# Size, mtime and content hash of every CSV file merged by import_and_merge_csv,
+# so unchanged files are skipped and appended ones only have their new rows applied
+IMPORT_CACHE_FILE = "students.imports.json"
+_journal = None
+_journal_settings_used = None
+_journal_lock = threading.Lock()
+_storage_settings_read = False
+# (path, file signature, store, store version) of the last CSV load
+_csv_cache = None
+
+
+class StudentDatabase:
+    """
+    Holds the student roster and loads it from disk on first access.
+
+    Importing this module does no file I/O; the first function that needs the
+    roster loads it through load_students_from_json().
+
+    Access is guarded by a readers-writer lock: lookups, listings and
+    statistics run concurrently under reading(), while changes take
+    writing(). Long reads such as exports take a snapshot() under the lock
+    and then walk it without the lock. A new roster, such as a replacing CSV import, is built
+    without the lock and swapped in whole by replace(), so readers see
+    either the old roster or the new one and never a partial one.
+    """
+
+    def __init__(self):
+        self._store = None
+        self.lock = ReadWriteLock()
+        self._load_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._store is not None
+
+    @property
+    def store(self) -> StudentStore:
+        if self._store is None:
+            with self._load_lock:
+                if self._store is None:
+                    try:
+                        load_students_from_json()
+                    except Exception as e:
+                        print(f"Warning: Could not initialize student data: {e}")
+                        self.replace(_new_store(DEFAULT_STUDENTS))
+        return self._store
+
+    @contextmanager
+    def reading(self) -> Iterator[StudentStore]:
+        """Hold the read lock and yield the current roster."""
+        # Load first: loading swaps the roster in under the write lock
+        self.store
+        with self.lock.read():
+            yield self._store
+
+    @contextmanager
+    def writing(self) -> Iterator[StudentStore]:
+        """Hold the write lock and yield the current roster."""
+        self.store
+        with self.lock.write():
+            yield self._store
+
+    def snapshot(self) -> StudentStore:
+        """
+        Return a read-only, point-in-time copy of the roster in O(1).
+
+        Exports and full listings walk the copy without holding the lock, so
+        changes carry on meanwhile. See StudentStore.snapshot().
+        """
+        with self.reading() as students:
+            return students.snapshot(sort=True)
+
+    def replace(self, store: StudentStore) -> None:
+        """Atomically make store the current roster and close the one it replaces."""
+        if PREPARE_NAME_INDEX and not store.persistent and len(store) >= NAME_INDEX_PREPARE_MIN_STUDENTS:
+            store.prepare_name_index()
+        with self.lock.write():
+            old, self._store = self._store, store
+        if old is not None and old is not store:
+            old.close()
+
+    def unload(self) -> None:
+        """Drop the in-memory roster; the next access loads it again."""
+        with self.lock.write():
+            old, self._store = self._store, None
+        if old is not None:
+            old.close()
+
+
+database = StudentDatabase()
+
+def _reads(function: Callable) -> Callable:
+    """Run function while holding the roster's read lock."""
+    @functools.wraps(function)
+    def locked(*args, **kwargs):
+        with database.reading():
+            return function(*args, **kwargs)
+    return locked
+
+def _writes(function: Callable) -> Callable:
+    """Run function while holding the roster's write lock."""
+    @functools.wraps(function)
+    def locked(*args, **kwargs):
+        with database.writing():
+            return function(*args, **kwargs)
+    return locked
+
+def __getattr__(name: str):
+    # student_utils.students still works, but loads the roster on first use
+    if name == "students":
+        return database.store
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _store_class() -> type:
+    return CompactStudentStore if STORE_TYPE == "compact" else StudentStore
+
+def _new_store(data: Dict[str, int] = None) -> StudentStore:
+    return _store_class()(data)
+
+def _adopt_store(data: Dict[str, int]) -> StudentStore:
+    """Wrap a freshly loaded dict in the configured store type."""
+    return _store_class().adopt(data)
+
+@_writes
+def use_compact_store(enabled: bool = True) -> str:
+    """
+    Switch between the dict-backed and the array-backed student store.
+
+    The current roster is converted in place of the old store; the public
+    functions work the same against either.
+    """
+    global STORE_TYPE
+    STORE_TYPE = "compact" if enabled else "dict"
+    students = database.store
+    if students.persistent:
+        return f"Using the {STORE_TYPE} student store when the SQLite backend is turned off."
+    if type(students) is not _store_class():
+        students = _adopt_store(dict(students.items()))
+        database.replace(students)
+    return f"Using the {STORE_TYPE} student store ({len(students)} students)."
+
+def _read_storage_settings() -> None:
+    """Apply the storage choices saved by _save_storage_settings(), once per process."""
+    global _storage_settings_read, STORAGE_BACKEND, SNAPSHOT_FORMAT, SHARD_COUNT
+    if _storage_settings_read:
+        return
+    _storage_settings_read = True
+    try:
+        with open(STORAGE_SETTINGS_FILE, 'r', encoding='utf-8') as file:
+            settings = json.load(file)
+    except FileNotFoundError:
+        return
+    except ValueError as e:
+        print(f"Warning: Ignoring unreadable {STORAGE_SETTINGS_FILE}: {e}")
+        return
+    if not isinstance(settings, dict):
+        return
+    if settings.get("backend") in ("journal", "sqlite"):
+        STORAGE_BACKEND = settings["backend"]
+    if settings.get("format") in ("json", "binary"):
+        SNAPSHOT_FORMAT = settings["format"]
+    shards = settings.get("shards")
+    if isinstance(shards, int) and not isinstance(shards, bool) and shards >= 0:
+        SHARD_COUNT = shards
+
+def _save_storage_settings() -> None:
+    """Record the current storage choices for later processes."""
+    settings = {"backend": STORAGE_BACKEND, "format": SNAPSHOT_FORMAT, "shards": SHARD_COUNT}
+    temp_path = STORAGE_SETTINGS_FILE + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(settings, file, indent=2)
+    os.replace(temp_path, STORAGE_SETTINGS_FILE)
+
+def _journal_settings() -> tuple:
+    _read_storage_settings()
+    if STORAGE_BACKEND == "sqlite":
+        return SQLiteJournal, SQLITE_FILE, SQLITE_FILE, 0
+    if SNAPSHOT_FORMAT == "binary":
+        return BinarySnapshotJournal, BINARY_SNAPSHOT_FILE, BINARY_JOURNAL_FILE, SHARD_COUNT
+    return StudentJournal, JSON_FILE, JOURNAL_FILE, SHARD_COUNT
+
+def _get_journal() -> StorageBackend:
+    """Return the journal for the current SNAPSHOT_FORMAT, SHARD_COUNT and file paths."""
+    global _journal, _journal_settings_used
+    settings = _journal_settings()
+    with _journal_lock:
+        if _journal is None or _journal_settings_used != settings:
+            if _journal is not None:
+                _journal.close()
+            journal_class, snapshot_path, journal_path, shards = settings
+            options = {"flush_every": FLUSH_EVERY_N_MUTATIONS, "flush_interval": FLUSH_INTERVAL_SECONDS}
+            if shards:
+                _journal = ShardedJournal(shard_directory(snapshot_path), shards, journal_class,
+                                          os.path.splitext(snapshot_path)[1], **options)
+            else:
+                _journal = journal_class(snapshot_path, journal_path, **options)
+            _journal_settings_used = settings
+        return _journal
+
+@_writes
+def use_binary_snapshot(enabled: bool = True) -> str:
+    """
+    Switch the database between students.json and the binary snapshot.
+
+    The current roster is written out in the new format, so nothing is lost,
+    and the choice is saved to STORAGE_SETTINGS_FILE; later loads, in this
+    process or the next, open the binary snapshot without decoding its records.
+    """
+    global SNAPSHOT_FORMAT
+    _read_storage_settings()
+    if not flush():
+        return "Error: Could not flush pending changes."
+    SNAPSHOT_FORMAT = "binary" if enabled else "json"
+    if not save_students_to_json(force=True):
+        return f"Error: Could not write {_get_journal().snapshot_path}."
+    try:
+        _save_storage_settings()
+    except OSError as e:
+        return f"Error: Saved to {_get_journal().snapshot_path} but could not record the setting: {e}"
+    return f"Now saving {len(database.store)} students to {_get_journal().snapshot_path}."
+
+@_writes
+def use_sharded_layout(shards: int = 8) -> str:
+    """
+    Switch the database between a single snapshot file and shard files.
+
+    The current roster is written out in the new layout, replacing any shards
+    already there; the files of the old layout are left in place. The layout
+    is saved to STORAGE_SETTINGS_FILE, so later processes open it too. Use
+    student_shards.py to convert files without loading them here.
+
+    Args:
+        shards: Number of shards, or 0 for the single-file layout
+    """
+    global SHARD_COUNT, _journal, _journal_settings_used
+    _read_storage_settings()
+    if shards < 0:
+        return "Error: Shard count cannot be negative."
+    if not flush():
+        return "Error: Could not flush pending changes."
+    SHARD_COUNT = shards
+    if shards:
+        # Replace any shards already there; their manifest would override the new count
+        with _journal_lock:
+            if _journal is not None:
+                _journal.close()
+            _journal = _journal_settings_used = None
+            remove_shards(shard_directory(_journal_settings()[1]))
+    journal = _get_journal()
+    journal.mark_dirty()
+    if not save_students_to_json(force=True):
+        return f"Error: Could not write {journal.snapshot_path}."
+    try:
+        _save_storage_settings()
+    except OSError as e:
+        return f"Error: Saved to {journal.snapshot_path} but could not record the setting: {e}"
+    layout = f"{journal.shard_count} shards in" if shards else "a single file,"
+    return f"Now saving {len(database.store)} students to {layout} {journal.snapshot_path}."
+
+@_writes
+def use_sqlite_backend(enabled: bool = True) -> str:
+    """
+    Switch the database between the in-memory roster and SQLite.
+
+    The current roster is copied into the new backend, so nothing is lost.
+    With SQLite, lookups, listings and statistics run as queries against
+    students.db instead of over records held in memory. The choice is saved
+    to STORAGE_SETTINGS_FILE, so later processes open the same backend.
+    """
+    global STORAGE_BACKEND
+    _read_storage_settings()
+    if not flush():
+        return "Error: Could not flush pending changes."
+    if not enabled and database.store.persistent:
+        # Read the records out before the database is closed
+        database.replace(_adopt_store(dict(database.store.items())))
+    STORAGE_BACKEND = "sqlite" if enabled else "journal"
+    journal = _get_journal()
+    journal.mark_dirty()
+    if not save_students_to_json(force=True):
+        return f"Error: Could not write {journal.snapshot_path}."
+    try:
+        _save_storage_settings()
+    except OSError as e:
+        return f"Error: Saved to {journal.snapshot_path} but could not record the setting: {e}"
+    return f"Now saving {len(database.store)} students to {journal.snapshot_path}."
+
+def configure_persistence(flush_every: int = None, flush_interval: float = None) -> None:
+    """
+    Change the write-behind flush policy.
+
+    Args:
+        flush_every: Flush once this many changes are pending (1 writes every change)
+        flush_interval: Flush this many seconds after the first unflushed change
+    """
+    global FLUSH_EVERY_N_MUTATIONS, FLUSH_INTERVAL_SECONDS
+    if flush_every is not None:
+        FLUSH_EVERY_N_MUTATIONS = flush_every
+    if flush_interval is not None:
+        FLUSH_INTERVAL_SECONDS = flush_interval
+
+    journal = _get_journal()
+    journal.flush_every = FLUSH_EVERY_N_MUTATIONS
+    journal.flush_interval = FLUSH_INTERVAL_SECONDS
+
+def flush() -> bool:
+    """Write any pending changes to the journal. Does nothing when none are pending."""
+    try:
+        _get_journal().flush()
+        return True
+    except (IOError, PermissionError) as e:
+        print(f"Error flushing changes: {e}")
+        return False
+
+def is_dirty() -> bool:
+    """Return True if students.json is missing changes made since it was last saved."""
+    return _journal is not None and _journal.dirty
+
+def _flush_at_exit() -> None:
+    if _journal is not None:
+        try:
+            _journal.close()
+        except OSError:
+            pass
+
+atexit.register(_flush_at_exit)
+
+def _record_change(op: str, name: str, age: int = None) -> bool:
+    """Append a single mutation to the journal instead of rewriting the database."""
+    try:
+        journal = _get_journal()
+        journal.append(op, name, age)
+        journal.maybe_compact(database.store)
+        return True
+    except (IOError, PermissionError) as e:
+        print(f"Error writing to journal: {e}")
+        return False
+
+def _adopt_loaded(loaded) -> StudentStore:
+    # The binary snapshot already comes back as a memory-mapped store
+    return loaded if isinstance(loaded, StudentStore) else _adopt_store(loaded)
 
 def load_students_from_json() -> bool:
-    global students
+    """
+    Load the database, re-reading only what changed since the last load or save.
+
+    If no other process has touched the files this costs a stat() per file;
+    if others only appended to the journal, just their entries are applied.
+    """
     try:
-        if os.path.exists(JSON_FILE):
-            with open(JSON_FILE, 'r') as file:
-                students = json.load(file)
-            print(f"Loaded {len(students)} students from {JSON_FILE}")
+        journal = _get_journal()
+        if database.loaded:
+            with database.writing() as students:
+                refreshed = journal.refresh(students)
+            if refreshed is not None:
+                if refreshed:
+                    print(f"Applied {refreshed} changes made by other processes")
+                return True
+
+        loaded = journal.load()
+        if loaded is not None:
+            database.replace(_adopt_loaded(loaded))
+            print(f"Loaded {len(database.store)} students from {journal.snapshot_path}")
             return True
         else:
-            students = DEFAULT_STUDENTS.copy()
-            save_students_to_json()
-            print(f"Created new student database with {len(students)} default students")
+            database.replace(_new_store(DEFAULT_STUDENTS))
+            journal.mark_dirty()
+            save_students_to_json(force=True)
+            print(f"Created new student database with {len(database.store)} default students")
             return True
-    except (json.JSONDecodeError, IOError, PermissionError) as e:
+    except (json.JSONDecodeError, IOError, PermissionError, TypeError, ValueError, SnapshotError) as e:
         print(f"Error loading from JSON: {e}")
-        students = DEFAULT_STUDENTS.copy()
+        database.replace(_new_store(DEFAULT_STUDENTS))
         return False
 
-def save_students_to_json() -> bool:
+def save_students_to_json(force: bool = False) -> bool:
+    """Write the database snapshot (students.json, or the binary snapshot when enabled)."""
     try:
-        with open(JSON_FILE, 'w') as file:
-            json.dump(students, file, indent=2)
+        if not force and not database.loaded:
+            # Nothing has been read, so nothing can have changed
+            return True
+        journal = _get_journal()
+        if not force and not journal.dirty and os.path.exists(journal.snapshot_path):
+            return True
+        # Held for writing so a roster merged with other processes' changes
+        # can be swapped in before anything else changes
+        with database.writing() as students:
+            merged = journal.write_snapshot(students)
+            if merged is not None:
+                database.replace(_adopt_loaded(merged))
         return True
     except (IOError, PermissionError) as e:
         print(f"Error saving to JSON: {e}")
         return False
 
 def load_students_from_csv() -> bool:
-    global students
+    """
+    Replace the roster with the contents of CSV_FILE.
+
+    If neither the file nor the roster loaded from it has changed since the
+    last call, the file is not read again.
+    """
+    global _csv_cache
     try:
         if os.path.exists(CSV_FILE):
-            students = {}
-            with open(CSV_FILE, 'r', newline='') as file:
-                reader = csv.reader(file)
-                header = next(reader, None)
-                if header and header != ['Name', 'Age']:
-                    try:
-                        students[header[0]] = int(header[1])
-                    except (ValueError, IndexError):
-                        pass
-                
-                for row in reader:
-                    if len(row) >= 2:
-                        try:
-                            name = row[0].strip()
-                            age = int(row[1].strip())
-                            if name and age >= 0:
-                                students[name] = age
-                        except ValueError:
-                            continue
-            
-            if not students:
-                students = DEFAULT_STUDENTS.copy()
+            with FileLock(CSV_FILE + ".lock").shared():
+                signature = _file_signature(CSV_FILE)
+                if (_csv_cache is not None and _csv_cache[:2] == (CSV_FILE, signature)
+                        and database.loaded and database.store is _csv_cache[2]
+                        and _csv_cache[2].version == _csv_cache[3]):
+                    return True
+                loaded = _read_students_csv(CSV_FILE)
+
+            students = _adopt_store(loaded) if loaded else _new_store(DEFAULT_STUDENTS)
+            database.replace(students)
+            _get_journal().mark_dirty()
+            _forget_imports()
+            _csv_cache = (CSV_FILE, signature, students, students.version)
             
             print(f"Loaded {len(students)} students from {CSV_FILE}")
             return True
         else:
-            students = DEFAULT_STUDENTS.copy()
+            database.replace(_new_store(DEFAULT_STUDENTS))
+            _get_journal().mark_dirty()
             save_students_to_csv()
-            print(f"Created new CSV file with {len(students)} default students")
+            print(f"Created new CSV file with {len(database.store)} default students")
             return True
     except (IOError, PermissionError) as e:
         print(f"Error loading from CSV: {e}")
-        students = DEFAULT_STUDENTS.copy()
+        database.replace(_new_store(DEFAULT_STUDENTS))
         return False
 
-def save_students_to_csv() -> bool:
-    try:
-        with open(CSV_FILE, 'w', newline='') as file:
+def _read_students_csv(file_path: str) -> Dict[str, int]:
+    loaded = {}
+    with open(file_path, 'r', newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header and header != ['Name', 'Age']:
+            try:
+                age = int(header[1])
+                if 0 <= age <= MAX_AGE:
+                    loaded[header[0]] = age
+            except (ValueError, IndexError):
+                pass
+        
+        for row in reader:
+            if len(row) >= 2:
+                try:
+                    name = row[0].strip()
+                    age = int(row[1].strip())
+                    if name and 0 <= age <= MAX_AGE:
+                        loaded[name] = age
+                except ValueError:
+                    continue
+    return loaded
+
+def _write_students_csv(file_path: str, records) -> None:
+    # Written beside the target and renamed over it, under the same lock
+    # loads take, so other processes never read a half-written file
+    temp_path = file_path + ".tmp"
+    with FileLock(file_path + ".lock").exclusive():
+        with open(temp_path, 'w', newline='') as file:
             writer = csv.writer(file)
             writer.writerow(['Name', 'Age'])
-            for name, age in sorted(students.items()):
-                writer.writerow([name, age])
+            writer.writerows(records)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, file_path)
+
+def save_students_to_csv(students: StudentStore = None) -> bool:
+    """
+    Write the roster to CSV_FILE in name order.
+
+    Args:
+        students: Roster to write; a fresh snapshot of the database by default
+    """
+    try:
+        if students is None:
+            students = database.snapshot()
+        _write_students_csv(CSV_FILE, students.iter_sorted())
         return True
     except (IOError, PermissionError) as e:
         print(f"Error saving to CSV: {e}")
         return False
 
+@_reads
 def lookup_student(name: str) -> str:
+    students = database.store
     try:
         if not name or not name.strip():
             return "Please enter a valid student name."
@@ -94,12 +556,71 @@ def lookup_student(name: str) -> str:
         name = name.strip()
         if name in students:
             return f"{name} is {students[name]} years old."
-        else:
-            return "Student not found."
+        
+        matches = find_students_ignore_case(name)
+        if len(matches) == 1:
+            match, age = matches[0]
+            return f"{match} is {age} years old."
+        
+        suggestions = matches or suggest_students(name)
+        if suggestions:
+            return f"Student not found. Did you mean: {', '.join(match for match, _ in suggestions)}?"
+        return "Student not found."
     except Exception as e:
         return f"Error looking up student: {e}"
 
+@_reads
+def find_students_ignore_case(name: str) -> List[Tuple[str, int]]:
+    """Return (name, age) pairs whose name matches ignoring case and extra spaces."""
+    students = database.store
+    return [(match, students[match]) for match in students.name_index().exact(name)]
+
+@_reads
+def find_students_by_prefix(prefix: str, limit: int = LIST_PAGE_SIZE) -> List[Tuple[str, int]]:
+    """Return up to limit (name, age) pairs whose name starts with prefix, ignoring case."""
+    students = database.store
+    return [(match, students[match]) for match in students.name_index().prefix(prefix, limit)]
+
+@_reads
+def suggest_students(name: str, limit: int = 5) -> List[Tuple[str, int]]:
+    """Return up to limit (name, age) pairs with names close to name, closest first."""
+    students = database.store
+    return [(match, students[match]) for match, _ in students.name_index().fuzzy(name, limit)]
+
+@_reads
+def search_students(query: str, limit: int = LIST_PAGE_SIZE) -> str:
+    """
+    Find students by name prefix, falling back to typo-tolerant suggestions.
+
+    Args:
+        query: Start of a name, or a possibly misspelled name
+        limit: Maximum number of students to show
+
+    Returns:
+        Formatted search results
+    """
+    try:
+        if not query or not query.strip():
+            return "Please enter a valid search term."
+        
+        query = query.strip()
+        matches = find_students_by_prefix(query, limit)
+        if matches:
+            header = f"Students starting with '{query}':"
+        else:
+            matches = suggest_students(query, limit)
+            if not matches:
+                return f"No students match '{query}'."
+            header = f"No names start with '{query}'. Closest matches:"
+        
+        lines = [header] + [f"  - {name}: {age} years old" for name, age in matches]
+        return "\n".join(lines)
+    except Exception as e:
+        return f"Error searching students: {e}"
+
+@_writes
 def add_student(name: str, age: int) -> str:
+    students = database.store
     try:
         if not name or not name.strip():
             return "Error: Student name cannot be empty."
@@ -112,13 +633,13 @@ def add_student(name: str, age: int) -> str:
         if name in students:
             old_age = students[name]
             students[name] = age
-            if save_students_to_json():
+            if _record_change("set", name, age):
                 return f"Updated {name}'s age from {old_age} to {age}."
             else:
                 return f"Updated {name}'s age but failed to save to file."
         else:
             students[name] = age
-            if save_students_to_json():
+            if _record_change("set", name, age):
                 return f"Student {name} (age {age}) has been added successfully."
             else:
                 return f"Added {name} but failed to save to file."
@@ -126,7 +647,9 @@ def add_student(name: str, age: int) -> str:
     except Exception as e:
         return f"Error adding student: {e}"
 
+@_writes
 def remove_student(name: str) -> str:
+    students = database.store
     try:
         if not name or not name.strip():
             return "Please enter a valid student name."
@@ -134,7 +657,7 @@ def remove_student(name: str) -> str:
         name = name.strip()
         if name in students:
             age = students.pop(name)
-            if save_students_to_json():
+            if _record_change("del", name):
                 return f"Student {name} (age {age}) has been removed successfully."
             else:
                 return f"Removed {name} but failed to save to file."
@@ -143,192 +666,883 @@ def remove_student(name: str) -> str:
     except Exception as e:
         return f"Error removing student: {e}"
 
-def list_all_students() -> str:
+def _as_records(records) -> list:
+    if isinstance(records, dict):
+        return list(records.items())
+    return list(records)
+
+def _validate_record(index: int, record) -> tuple:
+    """Return (name, age, error) for a single bulk record."""
     try:
-        if not students:
+        name, age = record
+    except (TypeError, ValueError):
+        return None, None, f"Record {index}: expected (name, age), got {record!r}"
+
+    if not isinstance(name, str) or not name.strip():
+        return None, None, f"Record {index}: Student name cannot be empty"
+    if isinstance(age, bool) or not isinstance(age, int):
+        return None, None, f"Record {index}: Age must be an integer, got {age!r}"
+    if age < 0 or age > 150:
+        return None, None, f"Record {index}: Age must be between 0 and 150, got {age}"
+    return name.strip(), age, None
+
+def _empty_summary() -> Dict[str, Any]:
+    return {"added": 0, "updated": 0, "removed": 0, "errors": [], "saved": False}
+
+@_writes
+def _commit_batch(changes: Dict[str, Any], summary: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Apply a validated set of changes to students and journal them as one record.
+
+    Args:
+        changes: Mapping of name to new age, or to None for removal
+        summary: Summary dict to fill in with counts
+
+    Returns:
+        The summary, with nothing applied if the journal write fails
+    """
+    students = database.store
+    if not changes:
+        summary["saved"] = True
+        return summary
+
+    undo = {}
+    records = []
+    with students.transaction():
+        for name, age in changes.items():
+            undo[name] = students.get(name)
+            if age is None:
+                del students[name]
+                summary["removed"] += 1
+                records.append(["del", name])
+            else:
+                if name in students:
+                    summary["updated"] += 1
+                else:
+                    summary["added"] += 1
+                students[name] = age
+                records.append(["set", name, age])
+
+    try:
+        journal = _get_journal()
+        journal.append_batch(records)
+        journal.maybe_compact(students)
+        summary["saved"] = True
+    except (IOError, PermissionError) as e:
+        # Roll back so the in-memory roster matches what is on disk
+        for name, old_age in undo.items():
+            if old_age is None:
+                students.pop(name, None)
+            else:
+                students[name] = old_age
+        summary["added"] = summary["updated"] = summary["removed"] = 0
+        summary["errors"].append(f"Failed to save changes: {e}")
+    return summary
+
+def add_students(records) -> Dict[str, Any]:
+    """
+    Add or update many students in a single all-or-nothing transaction.
+
+    Args:
+        records: Mapping of name to age, or an iterable of (name, age) pairs.
+            Later records for the same name win.
+
+    Returns:
+        Summary dict with "added", "updated", "removed", "errors" and "saved".
+        If any record is invalid, "errors" lists every problem and nothing is applied.
+    """
+    summary = _empty_summary()
+    changes = {}
+    for index, record in enumerate(_as_records(records), 1):
+        name, age, error = _validate_record(index, record)
+        if error:
+            summary["errors"].append(error)
+        else:
+            changes[name] = age
+
+    if summary["errors"]:
+        return summary
+    return _commit_batch(changes, summary)
+
+@_writes
+def update_students(records) -> Dict[str, Any]:
+    """
+    Update the ages of many existing students in a single transaction.
+
+    Args:
+        records: Mapping of name to age, or an iterable of (name, age) pairs.
+            Every name must already be in the database.
+
+    Returns:
+        Summary dict as returned by add_students
+    """
+    summary = _empty_summary()
+    changes = {}
+    for index, record in enumerate(_as_records(records), 1):
+        name, age, error = _validate_record(index, record)
+        if error:
+            summary["errors"].append(error)
+        elif name not in database.store:
+            summary["errors"].append(f"Record {index}: Student {name} not found")
+        else:
+            changes[name] = age
+
+    if summary["errors"]:
+        return summary
+    return _commit_batch(changes, summary)
+
+@_writes
+def remove_students(names) -> Dict[str, Any]:
+    """
+    Remove many students in a single transaction.
+
+    Args:
+        names: Iterable of student names. Every name must be in the database.
+
+    Returns:
+        Summary dict as returned by add_students
+    """
+    summary = _empty_summary()
+    changes = {}
+    for index, name in enumerate(names, 1):
+        if not isinstance(name, str) or not name.strip():
+            summary["errors"].append(f"Record {index}: Student name cannot be empty")
+            continue
+        name = name.strip()
+        if name not in database.store:
+            summary["errors"].append(f"Record {index}: Student {name} not found")
+        else:
+            changes[name] = None
+
+    if summary["errors"]:
+        return summary
+    return _commit_batch(changes, summary)
+
+def iter_students(offset: int = 0, limit: int = None, start_after: str = None) -> Iterator[tuple]:
+    """
+    Yield (name, age) pairs in name order, one page at a time.
+
+    A page is copied under the read lock, so it is consistent even if the
+    roster changes while the caller is still iterating. A full listing
+    (limit=None) walks a snapshot instead, so it is just as consistent but
+    does not hold the lock for its whole length.
+
+    Args:
+        offset: Number of records to skip
+        limit: Maximum number of records to yield, or None for all
+        start_after: Resume after this name (the last name of the previous page)
+    """
+    if limit is None:
+        return database.snapshot().iter_sorted(offset, None, start_after)
+    with database.reading() as students:
+        return iter(list(students.iter_sorted(offset, limit, start_after)))
+
+def list_all_students(offset: int = 0, limit: int = None, start_after: str = None) -> str:
+    try:
+        with database.reading() as students:
+            total = len(students)
+            records = iter_students(offset, limit, start_after)
+        if not total:
             return "No students in the database."
+
+        lines = [f"  - {name}: {age} years old" for name, age in records]
+        if limit is None and start_after is None and offset == 0:
+            header = f"Current students ({total} total):"
+        else:
+            header = f"Current students (showing {len(lines)} of {total}):"
         
-        result = f"Current students ({len(students)} total):\n"
-        for name, age in sorted(students.items()):
-            result += f"  - {name}: {age} years old\n"
-        
-        return result.strip()
+        lines.insert(0, header)
+        return "\n".join(lines)
     except Exception as e:
         return f"Error listing students: {e}"
 
 def export_to_csv() -> str:
     try:
-        if save_students_to_csv():
+        students = database.snapshot()
+        if save_students_to_csv(students):
             return f"Successfully exported {len(students)} students to {CSV_FILE}"
         else:
             return "Failed to export to CSV file."
     except Exception as e:
         return f"Error exporting to CSV: {e}"
 
-def import_from_csv(file_path: str = None) -> str:
+def _file_format(file_path: str) -> str:
+    extension = os.path.splitext(file_path)[1].lower()
+    return {".json": "json", ".csv": "csv", ".msus": "binary"}.get(extension, "")
+
+def convert_student_file(source: str, destination: str) -> str:
     """
-    Import student data from a specified CSV file.
-    
+    Convert a student file between JSON, CSV and the binary snapshot format.
+
+    Formats are chosen by extension: .json, .csv or .msus. The database
+    itself is not changed.
+
     Args:
-        file_path: Path to the CSV file to import from
-        
+        source: File to read
+        destination: File to write; replaced if it exists
+
     Returns:
         Status message
     """
+    source_format, destination_format = _file_format(source), _file_format(destination)
+    if not source_format or not destination_format:
+        return "Error: Files must end in .json, .csv or .msus."
+
+    snapshot = None
     try:
-        if file_path is None:
-            file_path = CSV_FILE
-        
-        if not os.path.exists(file_path):
-            return f"Error: File '{file_path}' not found."
-        
-        # Check if file is readable
-        if not os.access(file_path, os.R_OK):
-            return f"Error: Cannot read file '{file_path}'. Check permissions."
-        
-        old_count = len(students)
-        imported_students = {}
-        
-        with open(file_path, 'r', newline='', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            
-            # Try to detect if first row is header
-            first_row = next(reader, None)
-            if first_row is None:
-                return f"Error: File '{file_path}' is empty."
-            
-            # Check if first row looks like a header
-            is_header = False
-            if len(first_row) >= 2:
-                try:
-                    # If second column can't be converted to int, it's likely a header
-                    int(first_row[1])
-                except ValueError:
-                    is_header = True
-            
-            # If not header, process first row as data
-            if not is_header and len(first_row) >= 2:
-                try:
-                    name = first_row[0].strip()
-                    age = int(first_row[1].strip())
-                    if name and 0 <= age <= 150:
-                        imported_students[name] = age
-                except ValueError:
-                    pass
-            
-            # Process remaining rows
-            row_number = 2 if is_header else 1
-            for row in reader:
-                row_number += 1
-                if len(row) >= 2:
-                    try:
-                        name = row[0].strip()
-                        age = int(row[1].strip())
-                        if name and 0 <= age <= 150:
-                            imported_students[name] = age
-                        elif name:
-                            print(f"Warning: Skipped invalid age for {name} on row {row_number}")
-                    except ValueError:
-                        print(f"Warning: Skipped invalid data on row {row_number}: {row}")
-                        continue
-        
-        if not imported_students:
-            return f"Error: No valid student data found in '{file_path}'. Expected format: Name, Age"
-        
-        # Replace current students with imported data
-        students.clear()
-        students.update(imported_students)
-        
-        # Save to JSON file
-        if save_students_to_json():
-            return f"Successfully imported {len(students)} students from '{file_path}' (was {old_count}). Data saved to {JSON_FILE}."
+        if source_format == "csv":
+            staged = stage_csv_import(source)
+            if staged.error:
+                return staged.error
+            records = staged.records
+        elif source_format == "json":
+            with open(source, 'r') as file:
+                records = json.load(file)
+            if not isinstance(records, dict):
+                raise TypeError(f"expected an object of name: age pairs, got {type(records).__name__}")
         else:
-            return f"Imported {len(students)} students from '{file_path}' but failed to save to {JSON_FILE}."
-            
+            snapshot = records = StudentSnapshot(source)
+
+        if destination_format == "csv":
+            _write_students_csv(destination, sorted(records.items()))
+        elif destination_format == "json":
+            with open(destination, 'w') as file:
+                dump_students_json(records, file)
+        else:
+            write_snapshot(destination, records)
+        return f"Converted {len(records)} students from '{source}' to '{destination}'."
+
     except FileNotFoundError:
+        return f"Error: File '{source}' not found."
+    except (ValueError, TypeError, SnapshotError) as e:
+        return f"Error: Cannot read '{source}': {e}"
+    except (IOError, PermissionError) as e:
+        return f"Error converting student file: {e}"
+    finally:
+        if snapshot is not None:
+            snapshot.close()
+
+class ImportReport:
+    """
+    Counters and a capped sample of warnings collected while importing a CSV file.
+
+    Only the first ``max_warnings`` messages are kept; ``warning_count`` always
+    holds the full number so dirty files do not cost memory or console time.
+    """
+
+    def __init__(self, file_path: str, max_warnings: int = MAX_IMPORT_WARNINGS):
+        self.file_path = file_path
+        self.max_warnings = max_warnings
+        self.has_header = False
+        self.rows_read = 0
+        self.valid_rows = 0
+        self.skipped_rows = 0
+        self.warning_count = 0
+        self.warnings = []
+        self.bytes_read = 0
+        self.total_bytes = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        # Set by import_and_merge_csv when the import cache shows the file is
+        # unchanged, or that only rows after resumed_row were appended to it
+        self.unchanged = False
+        self.resumed_row = 0
+
+    def warn(self, row_number: int, message: str) -> None:
+        self.warning_count += 1
+        if len(self.warnings) < self.max_warnings:
+            self.warnings.append((row_number, message))
+
+    def merge(self, other: "ImportReport", row_offset: int = 0) -> None:
+        """Fold in the counts and warnings of a report covering a later part of the file."""
+        self.has_header = self.has_header or other.has_header
+        self.rows_read += other.rows_read
+        self.valid_rows += other.valid_rows
+        self.skipped_rows += other.skipped_rows
+        self.warning_count += other.warning_count
+        room = self.max_warnings - len(self.warnings)
+        for row_number, message in other.warnings[:max(room, 0)]:
+            self.warnings.append((row_number + row_offset, message))
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_read / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.bytes_read / self.elapsed / (1024 * 1024) if self.elapsed > 0 else 0.0
+
+    def format_warnings(self) -> str:
+        if not self.warning_count:
+            return "No rows were skipped."
+
+        result = f"Skipped {self.skipped_rows} rows ({self.warning_count} warnings):\n"
+        for row_number, message in self.warnings:
+            result += f"  - Row {row_number}: {message}\n"
+        if self.warning_count > len(self.warnings):
+            result += f"  ... and {self.warning_count - len(self.warnings)} more warnings\n"
+        return result.strip()
+
+
+def _parse_csv_rows(rows, report: ImportReport, check_header: bool = True,
+                    first_row: int = 1) -> Iterator[tuple]:
+    """
+    Validate CSV rows and yield (name, age) records, counting invalid rows in the report.
+
+    When check_header is set, a first row whose second column is not an
+    integer is treated as a header and skipped. Warnings number rows from
+    first_row.
+    """
+    for row_number, row in enumerate(rows, first_row):
+        if check_header and row_number == first_row and len(row) >= 2:
+            try:
+                int(row[1])
+            except ValueError:
+                report.has_header = True
+                continue
+
+        report.rows_read += 1
+        if len(row) < 2:
+            report.skipped_rows += 1
+            report.warn(row_number, "Not enough columns")
+            continue
+
+        name = row[0].strip()
+        try:
+            age = int(row[1].strip())
+        except ValueError:
+            report.skipped_rows += 1
+            report.warn(row_number, f"Invalid age '{row[1].strip()}'")
+            continue
+
+        if not name:
+            report.skipped_rows += 1
+            report.warn(row_number, "Empty name")
+        elif not (0 <= age <= 150):
+            report.skipped_rows += 1
+            report.warn(row_number, f"Invalid age {age}")
+        else:
+            report.valid_rows += 1
+            yield name, age
+
+
+def _iter_csv_batches(file_path: str, report: ImportReport, batch_size: int = IMPORT_BATCH_SIZE,
+                      progress: Callable[[ImportReport], None] = None, start: int = 0,
+                      first_row: int = 1) -> Iterator[tuple]:
+    """
+    Stream a CSV file and yield validated records in fixed-size batches.
+
+    Args:
+        start: Byte offset of a line start to read from; no header is
+            expected after the start of the file
+        first_row: Row number of the line at start, for warnings
+
+    Yields:
+        (records, duplicates) pairs, where records is a list of (name, age)
+        tuples in file order and duplicates is always 0 for the serial path
+    """
+    report.total_bytes = os.path.getsize(file_path)
+    with open(file_path, 'rb') as binary:
+        binary.seek(start)
+        text = io.TextIOWrapper(binary, encoding='utf-8', newline='')
+        batch = []
+
+        for record in _parse_csv_rows(csv.reader(text), report, start == 0, first_row):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                report.bytes_read = binary.tell()
+                report.elapsed = time.perf_counter() - report.started
+                yield batch, 0
+                batch = []
+                if progress:
+                    progress(report)
+
+        report.bytes_read = report.total_bytes
+        report.elapsed = time.perf_counter() - report.started
+        if batch:
+            yield batch, 0
+        if progress:
+            progress(report)
+
+
+def _split_byte_ranges(file_path: str, parts: int) -> list:
+    """Split a file into up to ``parts`` (start, end) ranges that begin at line starts."""
+    size = os.path.getsize(file_path)
+    bounds = [0]
+    with open(file_path, 'rb') as file:
+        for i in range(1, parts):
+            file.seek(size * i // parts)
+            file.readline()
+            position = min(file.tell(), size)
+            if position > bounds[-1]:
+                bounds.append(position)
+    if bounds[-1] < size:
+        bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _parse_csv_range(file_path: str, start: int, end: int, max_warnings: int) -> tuple:
+    """
+    Parse one newline-aligned byte range of a CSV file in a worker process.
+
+    Returns:
+        (records, report, line_count, aligned) where records maps name to the
+        last valid age seen in the range, and aligned is False if some record
+        spans several lines (a quoted newline), which makes the split unsafe
+    """
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+
+    report = ImportReport(file_path, max_warnings)
+    line_count = data.count(b'\n') + (1 if data and not data.endswith(b'\n') else 0)
+    reader = csv.reader(io.StringIO(data.decode('utf-8'), newline=''))
+    records = dict(_parse_csv_rows(reader, report, check_header=(start == 0)))
+
+    parsed_rows = report.rows_read + (1 if report.has_header else 0)
+    return records, report, line_count, parsed_rows == line_count
+
+
+def _iter_csv_shards(file_path: str, report: ImportReport, workers: int,
+                     progress: Callable[[ImportReport], None] = None) -> Iterator[tuple]:
+    """
+    Parse a CSV file in parallel byte-range shards and yield them in file order.
+
+    At most PARALLEL_IMPORT_SHARDS_PER_WORKER shards per worker are parsed or
+    waiting at a time, and each is yielded as soon as the shards before it
+    have been, so memory stays bounded by the window rather than the file.
+
+    Yields:
+        (records, duplicates) pairs, where records maps name to the last valid
+        age in the shard and duplicates is the number of valid rows that were
+        overwritten by a later row in the same shard. If a quoted field spans
+        lines, the rest of the file from that shard on is read serially.
+    """
+    # Imported here: multiprocessing is slow to import and only large files need it
+    from concurrent.futures import ProcessPoolExecutor
+
+    report.total_bytes = os.path.getsize(file_path)
+    ranges = _split_byte_ranges(file_path, workers * 4)
+    window = workers * PARALLEL_IMPORT_SHARDS_PER_WORKER
+    pending = deque()
+    row_offset = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            for index, (start, end) in enumerate(ranges):
+                # Keep the window full before waiting on the oldest shard
+                for next_start, next_end in ranges[index + len(pending):index + window]:
+                    pending.append(executor.submit(_parse_csv_range, file_path, next_start, next_end,
+                                                   report.max_warnings))
+                records, shard_report, line_count, aligned = pending.popleft().result()
+                if not aligned:
+                    # Every earlier shard held whole records, so this one
+                    # starts at a record boundary
+                    yield from _iter_csv_batches(file_path, report, progress=progress,
+                                                 start=start, first_row=row_offset + 1)
+                    return
+                report.merge(shard_report, row_offset)
+                row_offset += line_count
+                report.bytes_read = end
+                report.elapsed = time.perf_counter() - report.started
+                yield records, shard_report.valid_rows - len(records)
+                if progress:
+                    progress(report)
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _import_workers(workers: int) -> int:
+    """Return how many processes to parse with: at most one per CPU, and every CPU for None."""
+    cpus = os.cpu_count() or 1
+    return cpus if workers is None else max(1, min(workers, cpus))
+
+
+def _iter_import_batches(file_path: str, report: ImportReport,
+                         progress: Callable[[ImportReport], None] = None, workers: int = 1) -> Iterator[tuple]:
+    """Choose the parallel or serial CSV reader for an import; a single CPU always reads serially."""
+    workers = _import_workers(workers)
+    if workers > 1 and os.path.getsize(file_path) >= PARALLEL_IMPORT_MIN_BYTES:
+        return _iter_csv_shards(file_path, report, workers, progress)
+    return _iter_csv_batches(file_path, report, progress=progress)
+
+
+def _scan_import_source(file_path: str, checkpoint: int = None) -> Dict[str, Any]:
+    """
+    Hash a CSV file in one pass for the import cache.
+
+    Rows are only ever resumed at a line start, so the digest used for that
+    stops at the end of the last complete line.
+
+    Args:
+        file_path: File to hash
+        checkpoint: Offset of a line start whose prefix digest is also wanted
+
+    Returns:
+        Dict with "offset" (end of the last complete line), "lines" (number of
+        lines before it), "prefix" (digest of the bytes before offset),
+        "digest" (of the whole file) and "checkpoint" (digest of the bytes
+        before checkpoint, or None if the file is shorter than that)
+    """
+    prefix = hashlib.sha256()
+    checkpoint_digest = prefix.hexdigest() if checkpoint == 0 else None
+    offset = lines = 0
+    carry = b""
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            data = carry + chunk
+            cut = data.rfind(b"\n") + 1
+            complete, carry = data[:cut], data[cut:]
+            end = offset + len(complete)
+            if checkpoint_digest is None and checkpoint is not None and offset < checkpoint <= end:
+                prefix.update(complete[:checkpoint - offset])
+                checkpoint_digest = prefix.hexdigest()
+                prefix.update(complete[checkpoint - offset:])
+            else:
+                prefix.update(complete)
+            lines += complete.count(b"\n")
+            offset = end
+
+    whole = prefix.copy()
+    whole.update(carry)
+    return {"offset": offset, "lines": lines, "prefix": prefix.hexdigest(),
+            "digest": whole.hexdigest(), "checkpoint": checkpoint_digest}
+
+
+def _read_import_cache() -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(IMPORT_CACHE_FILE, 'r', encoding='utf-8') as file:
+            cache = json.load(file)
+        return cache if isinstance(cache, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        # A damaged cache only costs a full re-import
+        return {}
+
+
+def _update_import_cache(key: str = None, entry: Dict[str, Any] = None) -> None:
+    """Record entry for the source file key, or forget every file when key is None."""
+    with FileLock(IMPORT_CACHE_FILE + ".lock").exclusive():
+        cache = _read_import_cache() if key is not None else {}
+        if not cache and key is None and not os.path.exists(IMPORT_CACHE_FILE):
+            return
+        if key is not None:
+            cache[key] = entry
+        temp_path = IMPORT_CACHE_FILE + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(cache, file, indent=2)
+        os.replace(temp_path, IMPORT_CACHE_FILE)
+
+
+def _forget_imports() -> None:
+    """Clear the import cache after the roster is replaced, so every file is merged in full again."""
+    try:
+        _update_import_cache()
+    except OSError as e:
+        print(f"Error clearing the import cache: {e}")
+
+
+def _check_import_file(file_path: str) -> str:
+    """Return an error message if file_path cannot be imported, otherwise an empty string."""
+    if not os.path.exists(file_path):
         return f"Error: File '{file_path}' not found."
+
+    # Check if file is readable
+    if not os.access(file_path, os.R_OK):
+        return f"Error: Cannot read file '{file_path}'. Check permissions."
+
+    if os.path.getsize(file_path) == 0:
+        return f"Error: File '{file_path}' is empty."
+    return ""
+
+
+class StagedImport:
+    """
+    The validated contents of a CSV file, read once and held until committed.
+
+    Produced by stage_csv_import; commit_staged_import applies it without
+    touching the file again.
+    """
+
+    def __init__(self, file_path: str, report: ImportReport):
+        self.file_path = file_path
+        self.report = report
+        self.records = {}
+        # Valid rows that were overwritten by a later row for the same name
+        self.duplicates = 0
+        self.error = ""
+        self.committed = False
+
+    @property
+    def ready(self) -> bool:
+        return not self.error and not self.committed and bool(self.records)
+
+    def validation_message(self) -> str:
+        if self.error:
+            return self.error
+
+        report = self.report
+        total_rows = report.rows_read + (1 if report.has_header else 0)
+        result = f"CSV Validation Results for '{self.file_path}':\n"
+        result += f"Total rows: {total_rows}\n"
+        result += f"Valid student records: {report.valid_rows}\n"
+
+        if report.warning_count:
+            result += f"Issues found ({report.warning_count}):\n"
+            for row_number, message in report.warnings[:5]:  # Show first 5 issues
+                result += f"  - Row {row_number}: {message}\n"
+            if report.warning_count > 5:
+                result += f"  ... and {report.warning_count - 5} more issues\n"
+
+        if report.valid_rows > 0:
+            result += f"\nFile is ready for import ({report.valid_rows} valid records)."
+        else:
+            result += f"\nFile cannot be imported (no valid records found)."
+
+        return result
+
+
+def stage_csv_import(file_path: str, report: ImportReport = None,
+                     progress: Callable[[ImportReport], None] = None, workers: int = 1) -> StagedImport:
+    """
+    Read and validate a CSV file in a single pass without changing the database.
+
+    Args:
+        file_path: Path to the CSV file to read
+        report: Optional ImportReport to collect counts and issues
+        progress: Optional callback invoked with the report after each batch
+        workers: Number of processes used to parse large files, at most one per CPU;
+            None uses every CPU
+
+    Returns:
+        A StagedImport holding the records, the report and any error message
+    """
+    if report is None:
+        report = ImportReport(file_path)
+    staged = StagedImport(file_path, report)
+
+    try:
+        staged.error = _check_import_file(file_path)
+        if staged.error:
+            return staged
+
+        for batch, duplicates in _iter_import_batches(file_path, report, progress, workers):
+            staged.duplicates += duplicates
+            if isinstance(batch, dict):
+                # A name in an earlier shard is overwritten, like a repeated row
+                staged.duplicates += len(batch.keys() & staged.records.keys())
+                staged.records.update(batch)
+            else:
+                for name, age in batch:
+                    if name in staged.records:
+                        staged.duplicates += 1
+                    staged.records[name] = age
+
+    except FileNotFoundError:
+        staged.error = f"Error: File '{file_path}' not found."
     except PermissionError:
-        return f"Error: Permission denied accessing '{file_path}'."
+        staged.error = f"Error: Permission denied accessing '{file_path}'."
     except UnicodeDecodeError:
-        return f"Error: Cannot read '{file_path}'. File may not be a valid text file."
+        staged.error = f"Error: Cannot read '{file_path}'. File may not be a valid text file."
+    except Exception as e:
+        staged.error = f"Error reading CSV: {e}"
+
+    if staged.error:
+        staged.records = {}
+    return staged
+
+
+@_writes
+def _merge_records(records, journal: StorageBackend) -> tuple:
+    """Apply (name, age) records to students and return (added, updated) counts."""
+    imported_count, updated_count = database.store.merge(records)
+    journal.mark_dirty()
+    return imported_count, updated_count
+
+
+def _save_merged(imported_count: int, updated_count: int) -> bool:
+    """Save after a merge; returns True if it succeeded or nothing was merged."""
+    return (imported_count == 0 and updated_count == 0) or save_students_to_json(force=True)
+
+
+def _merge_result_message(file_path: str, imported_count: int, updated_count: int,
+                          report: ImportReport, saved: bool) -> str:
+    if imported_count == 0 and updated_count == 0:
+        if report.resumed_row:
+            return (f"No new valid student data in '{file_path}': skipped {report.resumed_row} rows "
+                    f"already imported and applied the {report.rows_read} rows appended since.")
+        return f"No valid student data found in '{file_path}'."
+
+    if saved:
+        result = f"Successfully processed '{file_path}': "
+        if imported_count > 0:
+            result += f"{imported_count} new students added"
+        if updated_count > 0:
+            if imported_count > 0:
+                result += f", {updated_count} students updated"
+            else:
+                result += f"{updated_count} students updated"
+        result += f". Total students: {len(database.store)}. Data saved to {_get_journal().snapshot_path}."
+        if report.resumed_row:
+            result += (f" Skipped {report.resumed_row} rows already imported; applied the "
+                       f"{report.rows_read} rows appended since.")
+        if report.skipped_rows:
+            result += f" Skipped {report.skipped_rows} invalid rows."
+        return result
+    else:
+        return f"Processed data but failed to save to {_get_journal().snapshot_path}."
+
+
+def commit_staged_import(staged: StagedImport, merge: bool = False) -> str:
+    """
+    Apply a staged CSV import without reading the file again.
+
+    Args:
+        staged: Result of stage_csv_import
+        merge: Merge into the current data instead of replacing it
+
+    Returns:
+        Status message
+    """
+    try:
+        if staged.error:
+            return staged.error
+        if staged.committed:
+            return f"Error: '{staged.file_path}' has already been imported."
+
+        file_path = staged.file_path
+        report = staged.report
+
+        if merge:
+            imported_count, updated_count = _merge_records(staged.records.items(), _get_journal())
+            staged.committed = True
+            updated_count += staged.duplicates
+            saved = _save_merged(imported_count, updated_count)
+            return _merge_result_message(file_path, imported_count, updated_count, report, saved)
+
+        if not staged.records:
+            return f"Error: No valid student data found in '{file_path}'. Expected format: Name, Age"
+
+        old_count = len(database.store)
+        # Replace current students with imported data; the staged dict is
+        # handed over rather than copied
+        students = _adopt_store(staged.records)
+        database.replace(students)
+        _get_journal().mark_dirty()
+        _forget_imports()
+        staged.records = {}
+        staged.committed = True
+
+        skipped = f" Skipped {report.skipped_rows} invalid rows." if report.skipped_rows else ""
+        if save_students_to_json(force=True):
+            return f"Successfully imported {len(students)} students from '{file_path}' (was {old_count}). Data saved to {_get_journal().snapshot_path}.{skipped}"
+        else:
+            return f"Imported {len(students)} students from '{file_path}' but failed to save to {_get_journal().snapshot_path}."
+
     except Exception as e:
         return f"Error importing from CSV: {e}"
 
 
-def import_and_merge_csv(file_path: str) -> str:
+def import_from_csv(file_path: str = None, report: ImportReport = None,
+                    progress: Callable[[ImportReport], None] = None, workers: int = 1) -> str:
     """
-    Import student data from CSV and merge with existing data.
-    
+    Import student data from a specified CSV file.
+
+    The file is streamed in batches into a new roster, which replaces the
+    current one only once the whole file has been read.
+
     Args:
         file_path: Path to the CSV file to import from
-        
+        report: Optional ImportReport to collect counts and skipped-row warnings
+        progress: Optional callback invoked with the report after each batch
+        workers: Number of processes used to parse files of at least
+            PARALLEL_IMPORT_MIN_BYTES, at most one per CPU; None uses every CPU
+
     Returns:
         Status message
     """
+    if file_path is None:
+        file_path = CSV_FILE
+    return commit_staged_import(stage_csv_import(file_path, report, progress, workers))
+
+
+def import_and_merge_csv(file_path: str, report: ImportReport = None,
+                         progress: Callable[[ImportReport], None] = None, workers: int = 1,
+                         force: bool = False) -> str:
+    """
+    Import student data from CSV and merge with existing data.
+
+    Records are applied to the current roster batch by batch while the file
+    is streamed, so memory use does not grow with the size of the file.
+
+    Each merged file's size, mtime and content hash are kept in
+    IMPORT_CACHE_FILE. A file whose size and mtime have not changed since its
+    last merge is skipped after a single stat(); one whose content is
+    unchanged, or only has rows appended, is hashed but not re-parsed, and
+    only the appended rows are applied. Replacing the roster clears the cache.
+
+    Args:
+        file_path: Path to the CSV file to import from
+        report: Optional ImportReport to collect counts and skipped-row warnings
+        progress: Optional callback invoked with the report after each batch
+        workers: Number of processes used to parse files of at least
+            PARALLEL_IMPORT_MIN_BYTES, at most one per CPU; None uses every CPU
+        force: Merge the whole file even if the cache says it was merged before
+
+    Returns:
+        Status message, saying what was skipped and what was applied
+    """
     try:
-        if not os.path.exists(file_path):
-            return f"Error: File '{file_path}' not found."
-        
-        old_count = len(students)
+        error = _check_import_file(file_path)
+        if error:
+            return error
+
+        if report is None:
+            report = ImportReport(file_path)
+
+        key = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        previous = None if force else _read_import_cache().get(key)
+        if previous and (previous.get("size"), previous.get("mtime_ns")) == (stat.st_size, stat.st_mtime_ns):
+            report.unchanged = True
+            return f"Skipped '{file_path}': unchanged since it was last imported."
+
+        scan = _scan_import_source(file_path, previous["offset"] if previous else None)
+        entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "offset": scan["offset"],
+                 "lines": scan["lines"], "prefix": scan["prefix"], "digest": scan["digest"]}
+        if previous and scan["digest"] == previous["digest"]:
+            # Touched or rewritten with the same content
+            _update_import_cache(key, entry)
+            report.unchanged = True
+            return f"Skipped '{file_path}': content unchanged since it was last imported."
+
+        if previous and scan["checkpoint"] == previous["prefix"]:
+            # Only rows were appended; resume at the end of the last complete
+            # line already merged, re-reading any unterminated last row
+            report.resumed_row = previous["lines"]
+            batches = _iter_csv_batches(file_path, report, progress=progress,
+                                        start=previous["offset"], first_row=previous["lines"] + 1)
+        else:
+            batches = _iter_import_batches(file_path, report, progress, workers)
+
         imported_count = 0
         updated_count = 0
-        
-        with open(file_path, 'r', newline='', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            
-            # Skip header if present
-            first_row = next(reader, None)
-            if first_row and len(first_row) >= 2:
-                try:
-                    int(first_row[1])
-                    # First row is data, process it
-                    name = first_row[0].strip()
-                    age = int(first_row[1].strip())
-                    if name and 0 <= age <= 150:
-                        if name in students:
-                            students[name] = age
-                            updated_count += 1
-                        else:
-                            students[name] = age
-                            imported_count += 1
-                except ValueError:
-                    # First row is header, skip it
-                    pass
-            
-            # Process remaining rows
-            for row in reader:
-                if len(row) >= 2:
-                    try:
-                        name = row[0].strip()
-                        age = int(row[1].strip())
-                        if name and 0 <= age <= 150:
-                            if name in students:
-                                students[name] = age
-                                updated_count += 1
-                            else:
-                                students[name] = age
-                                imported_count += 1
-                    except ValueError:
-                        continue
-        
-        if imported_count == 0 and updated_count == 0:
-            return f"No valid student data found in '{file_path}'."
-        
-        # Save to JSON file
-        if save_students_to_json():
-            result = f"Successfully processed '{file_path}': "
-            if imported_count > 0:
-                result += f"{imported_count} new students added"
-            if updated_count > 0:
-                if imported_count > 0:
-                    result += f", {updated_count} students updated"
-                else:
-                    result += f"{updated_count} students updated"
-            result += f". Total students: {len(students)}. Data saved to {JSON_FILE}."
-            return result
-        else:
-            return f"Processed data but failed to save to {JSON_FILE}."
-            
+        journal = _get_journal()
+
+        for batch, duplicates in batches:
+            # Rows overwritten within a parallel shard count as updates, as they
+            # would have on the serial path
+            added, updated = _merge_records(batch.items() if isinstance(batch, dict) else batch, journal)
+            imported_count += added
+            updated_count += updated + duplicates
+
+        saved = _save_merged(imported_count, updated_count)
+        if saved:
+            _update_import_cache(key, entry)
+        return _merge_result_message(file_path, imported_count, updated_count, report, saved)
+
     except Exception as e:
         return f"Error importing and merging CSV: {e}"
 
@@ -336,88 +1550,77 @@ def import_and_merge_csv(file_path: str) -> str:
 def validate_csv_format(file_path: str) -> str:
     """
     Validate CSV file format before importing.
-    
+
+    Uses the same parser and header rules as the import functions. Call
+    stage_csv_import directly to keep the parsed records for a later commit.
+
     Args:
         file_path: Path to the CSV file to validate
-        
+
     Returns:
         Validation result message
     """
     try:
-        if not os.path.exists(file_path):
-            return f"File '{file_path}' not found."
-        
-        valid_rows = 0
-        total_rows = 0
-        issues = []
-        
-        with open(file_path, 'r', newline='', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            
-            for row_num, row in enumerate(reader, 1):
-                total_rows += 1
-                if len(row) < 2:
-                    issues.append(f"Row {row_num}: Not enough columns")
-                    continue
-                
-                name = row[0].strip()
-                try:
-                    age = int(row[1].strip())
-                    if not name:
-                        issues.append(f"Row {row_num}: Empty name")
-                    elif not (0 <= age <= 150):
-                        issues.append(f"Row {row_num}: Invalid age {age}")
-                    else:
-                        valid_rows += 1
-                except ValueError:
-                    if row_num == 1 and row[1].lower() in ['age', 'years', 'old']:
-                        # Likely header row
-                        continue
-                    issues.append(f"Row {row_num}: Invalid age '{row[1]}'")
-        
-        result = f"CSV Validation Results for '{file_path}':\n"
-        result += f"Total rows: {total_rows}\n"
-        result += f"Valid student records: {valid_rows}\n"
-        
-        if issues:
-            result += f"Issues found ({len(issues)}):\n"
-            for issue in issues[:5]:  # Show first 5 issues
-                result += f"  - {issue}\n"
-            if len(issues) > 5:
-                result += f"  ... and {len(issues) - 5} more issues\n"
-        
-        if valid_rows > 0:
-            result += f"\nFile is ready for import ({valid_rows} valid records)."
-        else:
-            result += f"\nFile cannot be imported (no valid records found)."
+        return stage_csv_import(file_path).validation_message()
+    except Exception as e:
+        return f"Error validating CSV: {e}"
+
+@_reads
+def find_students_by_age(min_age: int, max_age: int, limit: int = None) -> List[Tuple[str, int]]:
+    """Return (name, age) pairs with min_age <= age <= max_age, ordered by age then name."""
+    return database.store.age_index().in_range(min_age, max_age, limit)
+
+@_reads
+def oldest_students(k: int = 10) -> List[Tuple[str, int]]:
+    """Return the k oldest students as (name, age) pairs, ties broken by name."""
+    return database.store.age_index().top(k, oldest=True)
+
+@_reads
+def youngest_students(k: int = 10) -> List[Tuple[str, int]]:
+    """Return the k youngest students as (name, age) pairs, ties broken by name."""
+    return database.store.age_index().top(k, oldest=False)
+
+@_reads
+def count_students_by_age() -> Dict[int, int]:
+    """Return how many students have each age, for ages that occur."""
+    return database.store.age_counts()
+
+@_reads
+def list_students_by_age(min_age: int, max_age: int, limit: int = LIST_PAGE_SIZE) -> str:
+    try:
+        if min_age > max_age:
+            return "Error: Minimum age cannot be greater than maximum age."
         
-        return result
+        total = database.store.age_index().count_in_range(min_age, max_age)
+        if total == 0:
+            return f"No students aged {min_age}-{max_age}."
         
+        matches = find_students_by_age(min_age, max_age, limit)
+        lines = [f"Students aged {min_age}-{max_age} ({total} total):"]
+        lines += [f"  - {name}: {age} years old" for name, age in matches]
+        if total > len(matches):
+            lines.append(f"  ... and {total - len(matches)} more students")
+        return "\n".join(lines)
     except Exception as e:
-        return f"Error validating CSV: {e}"
+        return f"Error finding students by age: {e}"
 
+@_reads
 def get_student_stats() -> str:
+    students = database.store
     try:
         if not students:
             return "No students in database."
         
-        ages = list(students.values())
-        total_students = len(students)
-        avg_age = sum(ages) / total_students
-        min_age = min(ages)
-        max_age = max(ages)
+        # Maintained incrementally by the store, so this does not scan the roster
+        stats = students.stats()
         
         result = f"Student Database Statistics:\n"
-        result += f"  Total Students: {total_students}\n"
-        result += f"  Average Age: {avg_age:.1f} years\n"
-        result += f"  Age Range: {min_age} - {max_age} years\n"
+        result += f"  Total Students: {stats['count']}\n"
+        result += f"  Average Age: {stats['mean']:.1f} years\n"
+        result += f"  Median Age: {stats['median']:.1f} years\n"
+        result += f"  Standard Deviation: {stats['std_dev']:.1f} years\n"
+        result += f"  Age Range: {stats['min']} - {stats['max']} years\n"
         
         return result
     except Exception as e:
         return f"Error calculating statistics: {e}"
-
-try:
-    load_students_from_json()
-except Exception as e:
-    print(f"Warning: Could not initialize student data: {e}")
-    students = DEFAULT_STUDENTS.copy()
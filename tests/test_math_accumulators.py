@@ -0,0 +1,92 @@
+import array
+import random
+import unittest
+from unittest import mock
+
+import math_accumulators
+from math_accumulators import EvenOddCounter, MeanVariance, MinMax, QuantileSketch, RunningStats
+
+
+def _split(values, parts, rng):
+    cuts = sorted(rng.sample(range(1, len(values)), parts - 1))
+    return [values[start:stop] for start, stop in zip([0] + cuts, cuts + [len(values)])]
+
+
+class MergeTest(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(9)
+        self.values = [rng.randint(-10 ** 9, 10 ** 9) for _ in range(20000)] + [5 ** 60, -(7 ** 40)]
+        rng.shuffle(self.values)
+        self.pieces = _split(self.values, 7, rng)
+
+    def _merged(self, make):
+        merged = make()
+        for piece in self.pieces:
+            merged.merge(make().update(piece))
+        return merged
+
+    def test_merged_parts_equal_a_single_pass(self):
+        makers = [EvenOddCounter, MinMax, MeanVariance, lambda: MeanVariance(variance=False), RunningStats]
+        for make in makers:
+            single = make().update(self.values)
+            merged = self._merged(make)
+            self.assertEqual(merged.count, len(self.values))
+            self.assertEqual(merged.snapshot(), single.snapshot(), type(single).__name__)
+
+    def test_add_update_and_input_types_agree(self):
+        one_by_one = RunningStats()
+        for value in self.values:
+            one_by_one.add(value)
+        small = [value for value in self.values if -2 ** 63 <= value < 2 ** 63]
+        # A small CHUNK_SIZE makes the generator span many chunks
+        with mock.patch.object(math_accumulators, "CHUNK_SIZE", 1000):
+            streamed = RunningStats().update(iter(self.values))
+            from_array = RunningStats().update(array.array("q", small))
+        self.assertEqual(one_by_one.snapshot(), RunningStats().update(self.values).snapshot())
+        self.assertEqual(streamed.snapshot(), one_by_one.snapshot())
+        self.assertEqual(from_array.snapshot(), RunningStats().update(small).snapshot())
+
+    def test_merging_empty_accumulators_changes_nothing(self):
+        for make in (EvenOddCounter, MinMax, MeanVariance, RunningStats):
+            single = make().update(self.values)
+            self.assertEqual(make().merge(make()).snapshot(), make().snapshot())
+            self.assertEqual(single.merge(make()).snapshot(), make().update(self.values).snapshot())
+            self.assertEqual(make().merge(make().update(self.values)).snapshot(), single.snapshot())
+
+    def test_mismatched_merges_are_rejected(self):
+        with self.assertRaises(TypeError):
+            MinMax().merge(EvenOddCounter())
+        with self.assertRaises(ValueError):
+            MeanVariance().merge(MeanVariance(variance=False))
+        with self.assertRaises(ValueError):
+            RunningStats(sketch=True).merge(RunningStats())
+
+
+class QuantileSketchMergeTest(unittest.TestCase):
+    def test_merged_sketch_is_exact_below_k(self):
+        rng = random.Random(4)
+        values = [rng.randint(0, 1000) for _ in range(150)]
+        single = QuantileSketch(k=200).update(values)
+        merged = QuantileSketch(k=200)
+        for piece in _split(values, 3, rng):
+            merged.merge(QuantileSketch(k=200).update(piece))
+        for percent in (0, 10, 50, 90, 100):
+            self.assertEqual(merged.percentile(percent), single.percentile(percent))
+
+    def test_merged_sketch_stays_within_its_rank_error(self):
+        rng = random.Random(6)
+        values = list(range(100000))
+        rng.shuffle(values)
+        merged = QuantileSketch(k=200)
+        for piece in _split(values, 10, rng):
+            merged.merge(QuantileSketch(k=200).update(piece))
+        self.assertEqual(merged.count, len(values))
+        self.assertLess(merged.retained, 2000)
+        for percent in (1, 25, 50, 75, 99):
+            # The values are their own ranks, so the rank error is the value error
+            error = abs(merged.percentile(percent) - (len(values) - 1) * percent / 100)
+            self.assertLess(error, 0.02 * len(values), percent)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import array
+import random
+import unittest
+from unittest import mock
+
+import math_accumulators
+import math_parallel
+import math_utils
+from math_accumulators import ALL_FIELDS
+
+
+class ParallelReductionTest(unittest.TestCase):
+    def setUp(self):
+        # Small cutoffs, so worker processes run on test-sized input
+        for name in ("PARALLEL_MIN_ELEMENTS", "PARALLEL_MIN_ARRAY_ELEMENTS"):
+            patcher = mock.patch.object(math_parallel, name, 1000)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        rng = random.Random(8)
+        self.values = [rng.randint(-2 ** 62, 2 ** 62) for _ in range(30001)] + [-2 ** 63, 2 ** 63 - 1]
+
+    def test_partials_equal_the_serial_reduction(self):
+        for numbers in (self.values, array.array("q", self.values), array.array("B", bytes(range(256)) * 20)):
+            serial = next(math_accumulators.iter_chunks(numbers))[0]
+            for fields in (ALL_FIELDS, frozenset(("odd",)), frozenset(("minimum", "maximum"))):
+                parallel = math_parallel.parallel_partial(numbers, fields, workers=3)
+                self.assertIsNotNone(parallel)
+                # Only the fields asked for are promised; 64-bit kernels may fill in more
+                wanted = ["count"] + sorted(fields)
+                self.assertEqual([getattr(parallel, field) for field in wanted],
+                                 [getattr(serial, field) for field in wanted], (type(numbers).__name__, wanted))
+
+    def test_math_functions_give_the_serial_results(self):
+        for numbers in (self.values, array.array("q", self.values)):
+            self.assertEqual(math_utils.describe(numbers, median=True, workers=3),
+                             math_utils.describe(numbers, median=True))
+            self.assertEqual(math_utils.count_even_odd(numbers, workers=3), math_utils.count_even_odd(numbers))
+            self.assertEqual(math_utils.find_min_max(numbers, workers=3), math_utils.find_min_max(numbers))
+            self.assertEqual(math_utils.calculate_average(numbers, workers=3),
+                             math_utils.calculate_average(numbers))
+
+    def test_unshareable_lists_fall_back_to_the_serial_path(self):
+        huge = self.values + [2 ** 64]
+        self.assertIsNone(math_parallel.parallel_partial(huge, workers=3))
+        self.assertEqual(math_utils.describe(huge, workers=3), math_utils.describe(huge))
+        with self.assertRaisesRegex(Exception, "index 5 is not an integer"):
+            math_utils.describe(self.values[:5] + ["6"] + self.values, workers=3)
+
+    def test_small_inputs_and_one_worker_stay_serial(self):
+        self.assertIsNone(math_parallel.parallel_partial(self.values[:999], workers=3))
+        self.assertIsNone(math_parallel.parallel_partial(self.values, workers=1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import array
+import math
+import random
+import statistics
+import subprocess
+import sys
+import unittest
+
+import math_utils
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class SumOfDigitsBatchTest(unittest.TestCase):
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_signed_dtype_extremes(self):
+        for dtype in (numpy.int8, numpy.int16, numpy.int32, numpy.int64):
+            info = numpy.iinfo(dtype)
+            values = numpy.array([info.min, info.min + 1, -1, 0, info.max], dtype=dtype)
+            expected = [math_utils.sum_of_digits(int(value)) for value in values]
+            self.assertEqual(math_utils.sum_of_digits_batch(values), expected, dtype)
+
+    def test_signed_buffer_extremes(self):
+        for code in "bhilq":
+            bits = array.array(code).itemsize * 8
+            values = array.array(code, [-2 ** (bits - 1), -1, 0, 2 ** (bits - 1) - 1])
+            expected = [math_utils.sum_of_digits(value) for value in values]
+            self.assertEqual(math_utils.sum_of_digits_batch(values), expected, code)
+
+
+class LazyNumpyTest(unittest.TestCase):
+    def test_lists_do_not_import_numpy(self):
+        code = ("import sys, math_utils; math_utils.describe([3, 1, 2], median=True); "
+                "math_utils.calculate_average([1, 2]); print('numpy' in sys.modules)")
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "False")
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * percent / 100
+    lower, upper = ordered[math.floor(position)], ordered[math.ceil(position)]
+    return lower + (upper - lower) * (position - math.floor(position))
+
+
+class DescribeTest(unittest.TestCase):
+    def _inputs(self):
+        rng = random.Random(1)
+        values = [rng.randint(-10 ** 6, 10 ** 6) for _ in range(5001)]
+        yield "list", values, values
+        yield "array", array.array("q", values), values
+        huge = [3 ** 100, -(2 ** 80), 7, 0, 10 ** 30]
+        yield "big ints", huge, huge
+        yield "single", [42], [42]
+
+    def test_matches_the_separate_aggregates(self):
+        for label, numbers, values in self._inputs():
+            summary = math_utils.describe(numbers, percentiles=[0, 10, 99.5, 100], median=True)
+            even, odd = math_utils.count_even_odd(numbers)
+            minimum, maximum = math_utils.find_min_max(numbers)
+            self.assertEqual(summary["count"], len(values), label)
+            self.assertEqual(summary["sum"], sum(values), label)
+            self.assertEqual(summary["mean"], math_utils.calculate_average(numbers), label)
+            self.assertEqual((summary["even"], summary["odd"]), (even, odd), label)
+            self.assertEqual((summary["min"], summary["max"]), (minimum, maximum), label)
+            self.assertEqual(summary["range"], maximum - minimum, label)
+            # Both are exact up to one correctly rounded division
+            self.assertEqual(summary["variance"], statistics.pvariance(values), label)
+            self.assertEqual(summary["median"], statistics.median(values), label)
+            for percent, value in summary["percentiles"].items():
+                self.assertEqual(value, _percentile(values, percent), (label, percent))
+
+    def test_streamed_input_matches_while_the_sketch_is_exact(self):
+        values = [random.Random(2).randint(0, 1000) for _ in range(150)]
+        summary = math_utils.describe(iter(values), percentiles=[25, 75], median=True)
+        self.assertEqual(summary, math_utils.describe(values, percentiles=[25, 75], median=True))
+
+    def test_rejects_empty_and_non_integer_input(self):
+        for numbers, message in (([], "List cannot be empty"), (iter(()), "Input cannot be empty"),
+                                 ([1, 2.5], "not an integer")):
+            with self.assertRaisesRegex(Exception, message):
+                math_utils.describe(numbers)
+        with self.assertRaisesRegex(Exception, "between 0 and 100"):
+            math_utils.describe([1, 2], percentiles=[101])
+
+
+if __name__ == "__main__":
+    unittest.main()
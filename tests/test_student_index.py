@@ -0,0 +1,144 @@
+import random
+import string
+import unittest
+
+from student_index import NameIndex, edit_distance, normalize_name
+from student_store import StudentStore
+
+
+def _levenshtein(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def _brute_force(names, query, limit, max_distance):
+    key = normalize_name(query)
+    scored = sorted((_levenshtein(key, normalize_name(name)), normalize_name(name), name) for name in names)
+    return [(name, distance) for distance, _, name in scored if distance <= max_distance][:limit]
+
+
+class EditDistanceTest(unittest.TestCase):
+    def test_matches_full_levenshtein(self):
+        rnd = random.Random(0)
+        for _ in range(5000):
+            a = "".join(rnd.choices("ab c", k=rnd.randint(0, 9)))
+            b = "".join(rnd.choices("ab c", k=rnd.randint(0, 9)))
+            max_distance = rnd.randint(0, 3)
+            distance = _levenshtein(a, b)
+            self.assertEqual(edit_distance(a, b, max_distance), distance if distance <= max_distance else None)
+
+
+class FuzzyTest(unittest.TestCase):
+    def setUp(self):
+        rnd = random.Random(1)
+        letters = "abcde"
+        self.names = {"".join(rnd.choices(letters, k=rnd.randint(1, 6))).title() for _ in range(600)}
+        self.names |= {" ".join("".join(rnd.choices(letters, k=rnd.randint(2, 6))) for _ in range(2)).title()
+                       for _ in range(600)}
+        self.queries = ["a", "Ab", "ccc", "dbca", "aaaaaaa", "abc de", "Eadb Cabe", "bbbbbbbbbb", "x"]
+        self.queries += [name[:-1] for name in sorted(self.names)[::97] if len(name) > 1]
+
+    def _check(self, index, names):
+        for query in self.queries:
+            for max_distance in (1, 2, 3):
+                self.assertEqual(index.fuzzy(query, 8, max_distance), _brute_force(names, query, 8, max_distance),
+                                 (query, max_distance))
+
+    def test_matches_brute_force(self):
+        self._check(NameIndex(self.names), self.names)
+
+    def test_matches_brute_force_after_changes(self):
+        index = NameIndex()
+        names = set()
+        for name in sorted(self.names):
+            index.add(name)
+            names.add(name)
+        for name in sorted(self.names)[::3]:
+            index.discard(name)
+            names.discard(name)
+        self._check(index, names)
+
+    def test_matches_brute_force_after_most_names_are_removed(self):
+        index = NameIndex(self.names)
+        names = sorted(self.names)
+        kept = set(names[::4])
+        for name in names:
+            if name not in kept:
+                index.discard(name)
+        for name in names[1::8]:
+            index.add(name)
+            kept.add(name)
+        self.assertEqual(len(index), len(kept))
+        self._check(index, kept)
+
+    def test_prepared_index_sees_changes_made_during_build(self):
+        store = StudentStore(dict.fromkeys(self.names, 20))
+        store.prepare_name_index()
+        names = set(self.names)
+        for name in sorted(self.names)[::3]:
+            del store[name]
+            names.discard(name)
+        store["Zzzz Yyyy"] = 21
+        names.add("Zzzz Yyyy")
+        store._name_builder[0].join()
+        # Changes after the build finished install the index before applying
+        store["Yyyy Zzzz"] = 22
+        names.add("Yyyy Zzzz")
+        self.assertIsNone(store._name_builder)
+        self._check(store.name_index(), names)
+
+
+def _by_age(store):
+    return sorted(store.items(), key=lambda item: (item[1], item[0]))
+
+
+class AgeQueryTest(unittest.TestCase):
+    def setUp(self):
+        rnd = random.Random(2)
+        self.store = StudentStore({f"S{i}": rnd.randint(0, 150) for i in range(600)})
+        # Build the buckets first, so the changes below go through the maintained index
+        self.store.age_index()
+        for i in range(400):
+            name = f"S{rnd.randrange(800)}"
+            if name in self.store and rnd.random() < 0.5:
+                del self.store[name]
+            else:
+                self.store[name] = rnd.randint(0, 150)
+
+    def test_ranges_match_brute_force(self):
+        index = self.store.age_index()
+        rnd = random.Random(4)
+        for _ in range(200):
+            low, high = sorted((rnd.randint(-5, 155), rnd.randint(-5, 155)))
+            limit = rnd.choice([None, 1, 7, 50])
+            expected = [(name, age) for name, age in _by_age(self.store) if low <= age <= high]
+            self.assertEqual(index.count_in_range(low, high), len(expected))
+            self.assertEqual(index.in_range(low, high, limit), expected if limit is None else expected[:limit])
+
+    def test_top_k_matches_brute_force(self):
+        index = self.store.age_index()
+        youngest = _by_age(self.store)
+        oldest = sorted(self.store.items(), key=lambda item: (-item[1], item[0]))
+        for k in (0, 1, 5, 37, 1000):
+            self.assertEqual(index.top(k, oldest=False), youngest[:k])
+            self.assertEqual(index.top(k, oldest=True), oldest[:k])
+
+    def test_counts_by_age_match_brute_force(self):
+        expected = {}
+        for age in self.store.values():
+            expected[age] = expected.get(age, 0) + 1
+        self.assertEqual(self.store.age_counts(), expected)
+        # A snapshot starts with the counts only and builds its buckets on demand
+        view = self.store.snapshot()
+        del self.store[next(iter(self.store))]
+        self.assertEqual(view.age_counts(), expected)
+        self.assertEqual(view.age_index().in_range(0, 150), _by_age(view))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+from student_journal import StudentJournal
+
+
+class TornJournalTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self.snapshot_path = os.path.join(self._dir.name, "students.json")
+        self.journal_path = os.path.join(self._dir.name, "students.journal")
+
+    def _journal(self) -> StudentJournal:
+        return StudentJournal(self.snapshot_path, self.journal_path)
+
+    def test_writes_after_a_torn_record_survive_reload(self):
+        journal = self._journal()
+        journal.write_snapshot({"Alice": 20})
+        journal.append("set", "Bob", 22)
+        journal.close()
+        # A crash part-way through writing the last record
+        with open(self.journal_path, "a", encoding="utf-8") as file:
+            file.write('["set", "Torn", ')
+
+        journal = self._journal()
+        students = journal.load()
+        self.assertEqual(students, {"Alice": 20, "Bob": 22})
+        journal.append("set", "AfterCrash", 2)
+        journal.append("set", "AfterCrash2", 3)
+        journal.close()
+
+        self.assertEqual(self._journal().load(),
+                         {"Alice": 20, "Bob": 22, "AfterCrash": 2, "AfterCrash2": 3})
+
+    def test_record_without_line_end_is_torn(self):
+        journal = self._journal()
+        journal.append("set", "Alice", 20)
+        journal.close()
+        with open(self.journal_path, "a", encoding="utf-8") as file:
+            file.write('["set", "Torn", 1]')
+
+        journal = self._journal()
+        self.assertEqual(journal.load(), {"Alice": 20})
+        journal.append("set", "Bob", 22)
+        journal.close()
+
+        self.assertEqual(self._journal().load(), {"Alice": 20, "Bob": 22})
+
+
+if __name__ == "__main__":
+    unittest.main()
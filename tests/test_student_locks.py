@@ -0,0 +1,84 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from student_locks import ReadWriteLock
+
+
+class ReadWriteLockTest(unittest.TestCase):
+    def _run(self, seconds, readers, writers):
+        lock = ReadWriteLock()
+        stop = threading.Event()
+        counts = {"reads": 0, "writes": 0}
+        state = {"writing": False}
+        errors = []
+
+        def reader():
+            done = 0
+            while not stop.is_set():
+                with lock.read():
+                    if state["writing"]:
+                        errors.append("Read while a writer held the lock")
+                done += 1
+            counts["reads"] += done
+
+        def writer():
+            done = 0
+            while not stop.is_set():
+                with lock.write():
+                    if state["writing"]:
+                        errors.append("Two writers held the lock")
+                    state["writing"] = True
+                    state["writing"] = False
+                done += 1
+            counts["writes"] += done
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)]
+        threads += [threading.Thread(target=writer) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return counts
+
+    def test_neither_side_is_starved(self):
+        counts = self._run(0.5, readers=8, writers=2)
+        self.assertGreater(counts["writes"], 100)
+        self.assertGreater(counts["reads"], 100)
+
+    def test_reentrant_and_no_upgrade(self):
+        lock = ReadWriteLock()
+        with lock.write():
+            with lock.write():
+                with lock.read():
+                    pass
+        with lock.read():
+            with lock.read():
+                with self.assertRaises(RuntimeError):
+                    lock.acquire_write()
+        self.assertTrue(lock.acquire_read(blocking=False))
+        lock.release_read()
+
+
+class ConcurrencyStressTest(unittest.TestCase):
+    def test_consistent_and_writers_keep_pace_with_a_plain_lock(self):
+        # A bounded run of benchmarks.py concurrency, in its own process since
+        # it points student_utils at scratch files
+        package = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with tempfile.TemporaryDirectory() as directory:
+            result = subprocess.run(
+                [sys.executable, os.path.join(package, "benchmarks.py"), "concurrency",
+                 "--readers", "8", "--writers", "2", "--seconds", "1", "--size", "2000"],
+                cwd=directory, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
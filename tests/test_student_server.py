@@ -0,0 +1,97 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+import student_server
+import student_utils
+from student_store import StudentStore
+
+
+class _PersistentStore(StudentStore):
+    persistent = True
+
+
+class DispatchTest(unittest.TestCase):
+    def setUp(self):
+        database = student_utils.database
+        self.addCleanup(setattr, student_utils, "database", database)
+        student_utils.database = student_utils.StudentDatabase()
+
+    def _dispatch(self, op, **args):
+        return asyncio.run(student_server._dispatch({"id": 1, "op": op, "args": args}))
+
+    def test_only_constant_time_reads_run_inline(self):
+        inline = {op for op, (_, runs_inline) in student_server.OPERATIONS.items() if runs_inline}
+        self.assertEqual(inline, {"stats", "count_by_age"})
+
+    def test_persistent_store_reads_never_run_inline(self):
+        for store_type, expected in ((StudentStore, True), (_PersistentStore, False)):
+            student_utils.database.replace(store_type({"Alice": 20, "Bob": 22}))
+            result = student_server._run_if_unlocked(student_utils.count_students_by_age, {})
+            self.assertEqual(result is not student_server._BUSY, expected, store_type)
+            self.assertEqual(self._dispatch("count_by_age")["result"], {20: 1, 22: 1})
+
+
+class JsonLinesServerTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        settings = {
+            "SNAPSHOT_FORMAT": "json",
+            "JSON_FILE": self._path("students.json"),
+            "JOURNAL_FILE": self._path("students.journal"),
+            "IMPORT_CACHE_FILE": self._path("students.imports.json"),
+            "STORAGE_SETTINGS_FILE": self._path("students.storage.json"),
+            "_storage_settings_read": False,
+            "database": student_utils.StudentDatabase(),
+            "_journal": None,
+            "_journal_settings_used": None,
+        }
+        for name, value in settings.items():
+            self.addCleanup(setattr, student_utils, name, getattr(student_utils, name))
+            setattr(student_utils, name, value)
+        self.addCleanup(lambda: student_utils._journal and student_utils._journal.close())
+        # An existing, empty roster, so no default students are created
+        with open(self._path("students.json"), "w") as file:
+            file.write("{}")
+
+    def _path(self, name):
+        return os.path.join(self._dir.name, name)
+
+    def test_client_round_trip_over_tcp(self):
+        operations = dict(student_server.OPERATIONS)
+        self.addCleanup(setattr, student_server, "OPERATIONS", operations)
+        student_server.OPERATIONS = dict(operations, opaque=(lambda: object(), False))
+
+        async def run():
+            server = await student_server.start_server("127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            client = await student_server.StudentClient.connect("127.0.0.1", port)
+            try:
+                added = await client.call("add", name="Alice", age=20)
+                self.assertIn("added successfully", added)
+                # Pipelined on one connection; replies may come back out of order
+                results = await asyncio.gather(
+                    *(client.call("add", name=f"Student {i}", age=20 + i % 3) for i in range(30)))
+                self.assertEqual(len(results), 30)
+                self.assertEqual(await client.call("lookup", name="Alice"), "Alice is 20 years old.")
+                # JSON turns the integer keys into strings
+                self.assertEqual(await client.call("count_by_age"), {"20": 11, "21": 10, "22": 10})
+                with self.assertRaisesRegex(RuntimeError, "Unknown operation"):
+                    await client.call("frobnicate")
+                with self.assertRaisesRegex(RuntimeError, "Cannot encode"):
+                    await asyncio.wait_for(client.call("opaque"), 5)
+                # The connection still works after both errors
+                removed = await client.call("remove_many", names=["Alice"])
+                self.assertEqual(removed["removed"], 1)
+            finally:
+                await client.close()
+                server.close()
+                await server.wait_closed()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
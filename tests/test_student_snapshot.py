@@ -0,0 +1,39 @@
+import gc
+import os
+import tempfile
+import unittest
+
+import student_utils
+from student_snapshot import MappedStudentStore, write_snapshot
+
+
+class MappedStoreCloseTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self.path = os.path.join(self._dir.name, "students.msus")
+        write_snapshot(self.path, {"Alice": 20, "Bob": 22}, fsync=False)
+        self.database = student_utils.StudentDatabase()
+
+    def test_replacing_the_roster_unmaps_its_snapshot(self):
+        store = MappedStudentStore.open(self.path)
+        self.database.replace(store)
+        self.database.replace(MappedStudentStore.open(self.path))
+        with self.assertRaises(ValueError):
+            store.get("Alice")
+        self.assertEqual(self.database.store["Alice"], 20)
+
+    def test_live_snapshot_keeps_the_mapping_until_freed(self):
+        store = MappedStudentStore.open(self.path)
+        self.database.replace(store)
+        view = store.snapshot()
+        self.database.unload()
+        self.assertEqual(dict(view.items()), {"Alice": 20, "Bob": 22})
+        del view
+        gc.collect()
+        with self.assertRaises(ValueError):
+            store.get("Alice")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,231 @@
+import random
+import statistics
+import unittest
+
+from student_store import CompactStudentStore, StudentStore
+
+
+def _expected_stats(ages):
+    if not ages:
+        return {"count": 0, "sum": 0, "mean": None, "median": None, "variance": None,
+                "std_dev": None, "min": None, "max": None}
+    return {
+        "count": len(ages),
+        "sum": sum(ages),
+        "mean": statistics.mean(ages),
+        "median": float(statistics.median(ages)),
+        "variance": statistics.pvariance(ages),
+        "std_dev": statistics.pstdev(ages),
+        "min": min(ages),
+        "max": max(ages),
+    }
+
+
+class StatsTest(unittest.TestCase):
+    def assertStatsMatch(self, store, data):
+        stats = store.stats()
+        for key, value in _expected_stats(list(data.values())).items():
+            if isinstance(value, float):
+                self.assertAlmostEqual(stats[key], value, places=9, msg=key)
+            else:
+                self.assertEqual(stats[key], value, key)
+
+    def test_stats_follow_random_adds_updates_and_removals(self):
+        for store_type in (StudentStore, CompactStudentStore):
+            rng = random.Random(7)
+            store = store_type()
+            data = {}
+            for step in range(3000):
+                name = f"S{rng.randrange(400)}"
+                if name in data and rng.random() < 0.4:
+                    del store[name]
+                    del data[name]
+                else:
+                    store[name] = data[name] = rng.randint(0, 150)
+                if step % 100 == 0:
+                    self.assertStatsMatch(store, data)
+            self.assertStatsMatch(store, data)
+
+    def test_min_and_max_move_when_the_extremes_leave(self):
+        store = StudentStore({"Young": 5, "Mid": 40, "Old": 90, "Older": 90})
+        del store["Young"]
+        store["Old"] = 60
+        self.assertEqual((store.stats()["min"], store.stats()["max"]), (40, 90))
+        del store["Older"]
+        self.assertEqual((store.stats()["min"], store.stats()["max"]), (40, 60))
+        self.assertEqual(store.stats()["median"], 50.0)
+
+    def test_emptied_store_has_no_statistics(self):
+        store = StudentStore({"Alice": 20})
+        del store["Alice"]
+        self.assertEqual(store.stats(), _expected_stats([]))
+        self.assertIsNone(store.percentile(50))
+
+
+class SortedPagingTest(unittest.TestCase):
+    def test_sorted_names_stay_sorted_through_changes(self):
+        for store_type in (StudentStore, CompactStudentStore):
+            rng = random.Random(3)
+            store = store_type({f"S{i}": i % 100 for i in range(200)})
+            store.sorted_names()
+            for _ in range(1000):
+                name = f"S{rng.randrange(300)}"
+                if name in store and rng.random() < 0.5:
+                    del store[name]
+                else:
+                    store[name] = rng.randint(0, 150)
+            self.assertEqual(store.sorted_names(), sorted(store))
+            self.assertEqual(list(store.iter_sorted()), sorted(store.items()))
+
+    def test_cursor_pages_survive_inserts_and_removals(self):
+        rng = random.Random(5)
+        store = StudentStore({f"N{i:04d}": 20 for i in range(0, 1000, 2)})
+        original = set(store)
+        removed = set()
+        seen = []
+        cursor = None
+        while True:
+            page = list(store.iter_sorted(limit=25, start_after=cursor))
+            if not page:
+                break
+            seen.extend(name for name, _ in page)
+            cursor = page[-1][0]
+            # Changes before and after the cursor, including the cursor itself
+            del store[cursor]
+            removed.add(cursor)
+            for _ in range(5):
+                store[f"N{rng.randrange(1000):04d}x"] = 30
+            later = [name for name in store.sorted_names() if name > cursor and name in original]
+            if later:
+                victim = rng.choice(later)
+                del store[victim]
+                removed.add(victim)
+
+        self.assertEqual(seen, sorted(seen))
+        self.assertEqual(len(seen), len(set(seen)))
+        # Every original name that was never removed before its page came up is listed once
+        self.assertLessEqual(original - removed, set(seen))
+
+    def test_offset_pages_after_a_cursor(self):
+        store = StudentStore({name: 20 for name in "abcdefg"})
+        self.assertEqual([name for name, _ in store.iter_sorted(1, 2, start_after="b")], ["d", "e"])
+        self.assertEqual([name for name, _ in store.iter_sorted(0, 3, start_after="bb")], ["c", "d", "e"])
+        self.assertEqual(list(store.iter_sorted(0, 3, start_after="z")), [])
+
+
+class CompactStoreTest(unittest.TestCase):
+    def _names(self, rng):
+        # Mixed lengths and non-ASCII names, so slot reuse and the blob see
+        # keys of different sizes
+        return [f"{rng.choice(['Ana', 'Zoë', 'Łukasz', '李', 'Bartholomew'])} {i}" for i in range(300)]
+
+    def assertSameStore(self, compact, plain):
+        self.assertEqual(len(compact), len(plain))
+        self.assertEqual(compact.as_dict(), plain.as_dict())
+        self.assertEqual(sorted(compact.items()), sorted(plain.items()))
+        self.assertEqual(sorted(compact.values()), sorted(plain.values()))
+        self.assertEqual(compact.stats(), plain.stats())
+        self.assertEqual(compact.age_counts(), plain.age_counts())
+        self.assertEqual(compact, plain)
+
+    def test_random_changes_match_the_dict_store(self):
+        rng = random.Random(11)
+        names = self._names(rng)
+        compact, plain = CompactStudentStore(), StudentStore()
+        for step in range(5000):
+            name = rng.choice(names)
+            if name in plain and rng.random() < 0.45:
+                self.assertEqual(compact.pop(name), plain.pop(name))
+            else:
+                age = rng.randint(0, 150)
+                compact[name] = plain[name] = age
+            probe = rng.choice(names)
+            self.assertEqual(compact.get(probe), plain.get(probe))
+            self.assertEqual(probe in compact, probe in plain)
+            if step % 500 == 0:
+                self.assertSameStore(compact, plain)
+        self.assertSameStore(compact, plain)
+
+    def test_removing_most_names_compacts_and_keeps_the_rest(self):
+        rng = random.Random(12)
+        data = {name: rng.randint(0, 150) for name in self._names(rng)}
+        compact = CompactStudentStore.adopt(dict(data))
+        for name in list(data)[:250]:
+            del compact[name]
+            del data[name]
+        self.assertLess(len(compact._blob), sum(len(name.encode("utf-8")) for name in data) * 2)
+        self.assertEqual(compact.as_dict(), data)
+        compact["New"] = 1
+        data["New"] = 1
+        self.assertEqual(compact.as_dict(), data)
+
+    def test_errors_match_the_dict_store(self):
+        for store_type in (StudentStore, CompactStudentStore):
+            store = store_type({"Alice": 20})
+            with self.assertRaises(KeyError):
+                store["Nobody"]
+            with self.assertRaises(KeyError):
+                del store["Nobody"]
+            with self.assertRaises(ValueError):
+                store["Bob"] = 151
+            with self.assertRaises(TypeError):
+                store["Bob"] = "20"
+            self.assertNotIn(42, store)
+            self.assertEqual(store.as_dict(), {"Alice": 20})
+
+    def test_snapshot_keeps_its_records(self):
+        compact = CompactStudentStore({f"S{i}": i % 150 for i in range(100)})
+        view = compact.snapshot(sort=True)
+        expected = view.as_dict()
+        for i in range(0, 100, 2):
+            del compact[f"S{i}"]
+        compact["Late"] = 5
+        self.assertEqual(view.as_dict(), expected)
+        self.assertEqual([name for name, _ in view.iter_sorted(limit=3)], ["S0", "S1", "S10"])
+        with self.assertRaises(TypeError):
+            view["Other"] = 1
+
+
+class SnapshotTest(unittest.TestCase):
+    def test_snapshots_keep_their_version_through_later_writes(self):
+        for store_type in (StudentStore, CompactStudentStore):
+            store = store_type({"Alice": 20, "Bob": 22, "Charlie": 19})
+            first = store.snapshot(sort=True)
+            store["Dana"] = 30
+            store["Alice"] = 21
+            second = store.snapshot(sort=True)
+            del store["Bob"]
+            store.clear()
+            store["Eve"] = 40
+
+            self.assertEqual(first.as_dict(), {"Alice": 20, "Bob": 22, "Charlie": 19})
+            self.assertEqual(list(first.iter_sorted()), [("Alice", 20), ("Bob", 22), ("Charlie", 19)])
+            self.assertEqual(first.stats()["mean"], 61 / 3)
+            self.assertEqual(second.as_dict(), {"Alice": 21, "Bob": 22, "Charlie": 19, "Dana": 30})
+            self.assertEqual(second.sorted_names(), ["Alice", "Bob", "Charlie", "Dana"])
+            self.assertEqual(second.age_counts(), {19: 1, 21: 1, 22: 1, 30: 1})
+            self.assertEqual(store.as_dict(), {"Eve": 40})
+
+    def test_snapshot_is_read_only(self):
+        view = StudentStore({"Alice": 20}).snapshot()
+        self.assertTrue(view.frozen)
+        for change in (lambda: view.__setitem__("Bob", 1), lambda: view.__delitem__("Alice"), view.clear):
+            with self.assertRaises(TypeError):
+                change()
+        self.assertIs(view.snapshot(), view)
+
+    def test_writes_without_live_snapshots_do_not_copy(self):
+        store = StudentStore({"Alice": 20})
+        storage = store._data
+        store.snapshot()
+        # The snapshot is already gone, so there is nothing to copy for
+        store["Bob"] = 22
+        self.assertIs(store._data, storage)
+        view = store.snapshot()
+        store["Carol"] = 23
+        self.assertIsNot(store._data, storage)
+        self.assertNotIn("Carol", view)
+
+
+if __name__ == "__main__":
+    unittest.main()
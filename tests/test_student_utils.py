@@ -0,0 +1,479 @@
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import student_utils
+
+
+def _run_python(directory, code):
+    """Run code in a fresh interpreter with directory as cwd; return its output lines."""
+    package = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=package)
+    result = subprocess.run([sys.executable, "-c", code],
+                            cwd=directory, env=env, capture_output=True, text=True, check=True)
+    return result.stdout.strip().splitlines()
+
+
+class StageCsvImportTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self.csv_path = os.path.join(self._dir.name, "students.csv")
+        # Every name repeats throughout the file, so each shard of a parallel
+        # read holds names that other shards hold too
+        with open(self.csv_path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["Name", "Age"])
+            for i in range(20000):
+                writer.writerow([f"Student{i % 3000}", 10 + i % 50])
+
+    def _stage_parallel(self, workers=3):
+        # Pretend there are enough CPUs, so the parallel reader runs on any machine
+        with mock.patch.object(student_utils, "PARALLEL_IMPORT_MIN_BYTES", 0), \
+                mock.patch("os.cpu_count", return_value=workers):
+            return student_utils.stage_csv_import(self.csv_path, workers=workers)
+
+    def test_parallel_staging_counts_duplicates_like_serial(self):
+        serial = student_utils.stage_csv_import(self.csv_path, workers=1)
+        parallel = self._stage_parallel()
+
+        self.assertEqual(serial.error, "")
+        self.assertEqual(parallel.error, "")
+        self.assertEqual(parallel.records, serial.records)
+        self.assertEqual(serial.duplicates, 20000 - 3000)
+        self.assertEqual(parallel.duplicates, serial.duplicates)
+
+    def test_quoted_newline_late_in_file_matches_serial(self):
+        with open(self.csv_path, "a", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["Two\nLines", 30])
+            for i in range(500):
+                writer.writerow([f"Late{i}", 40])
+        serial = student_utils.stage_csv_import(self.csv_path, workers=1)
+        parallel = self._stage_parallel()
+
+        self.assertEqual(parallel.error, "")
+        self.assertEqual(parallel.records, serial.records)
+        self.assertEqual(parallel.records["Two\nLines"], 30)
+        self.assertEqual(parallel.duplicates, serial.duplicates)
+
+    def test_shards_are_parsed_a_window_at_a_time(self):
+        submitted = []
+
+        class CountingExecutor(ThreadPoolExecutor):
+            def submit(self, *args, **kwargs):
+                submitted.append(args[2:4])
+                return super().submit(*args, **kwargs)
+
+        report = student_utils.ImportReport(self.csv_path)
+        with mock.patch("concurrent.futures.ProcessPoolExecutor", CountingExecutor):
+            shards = student_utils._iter_csv_shards(self.csv_path, report, workers=2)
+            next(shards)
+            in_flight = len(submitted)
+            remaining = list(shards)
+
+        self.assertEqual(in_flight, 2 * student_utils.PARALLEL_IMPORT_SHARDS_PER_WORKER)
+        self.assertEqual(len(remaining) + 1, len(submitted))
+        # Submitted, and so yielded, in file order
+        self.assertEqual(submitted, sorted(submitted))
+
+    def test_workers_are_capped_at_the_cpu_count(self):
+        with mock.patch("os.cpu_count", return_value=4):
+            self.assertEqual(student_utils._import_workers(None), 4)
+            self.assertEqual(student_utils._import_workers(16), 4)
+            self.assertEqual(student_utils._import_workers(2), 2)
+        with mock.patch("os.cpu_count", return_value=1):
+            self.assertEqual(student_utils._import_workers(None), 1)
+
+
+class ConvertStudentFileTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+
+    def _path(self, name):
+        return os.path.join(self._dir.name, name)
+
+    def test_rejects_json_that_is_not_an_object(self):
+        for content in ([1, 2], "Alice", 3, None):
+            with open(self._path("students.json"), "w") as file:
+                json.dump(content, file)
+            message = student_utils.convert_student_file(self._path("students.json"), self._path("out.csv"))
+            self.assertTrue(message.startswith("Error: Cannot read"), message)
+            self.assertFalse(os.path.exists(self._path("out.csv")))
+
+    def test_converts_json_to_csv(self):
+        with open(self._path("students.json"), "w") as file:
+            json.dump({"Bob": 22, "Alice": 20}, file)
+        message = student_utils.convert_student_file(self._path("students.json"), self._path("out.csv"))
+        self.assertEqual(message, f"Converted 2 students from '{self._path('students.json')}' to '{self._path('out.csv')}'.")
+        with open(self._path("out.csv"), newline="") as file:
+            self.assertEqual(list(csv.reader(file)), [["Name", "Age"], ["Alice", "20"], ["Bob", "22"]])
+
+
+class _TempRosterTest(unittest.TestCase):
+    """Runs against a fresh roster, saved as JSON in a temporary directory."""
+
+    roster = {"Alice": 20, "Bob": 22, "Charlie": 19}
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        settings = {
+            "STORAGE_BACKEND": "journal",
+            "SNAPSHOT_FORMAT": "json",
+            "SHARD_COUNT": 0,
+            "JSON_FILE": self._path("students.json"),
+            "JOURNAL_FILE": self._path("students.journal"),
+            "CSV_FILE": self._path("students.csv"),
+            "IMPORT_CACHE_FILE": self._path("students.imports.json"),
+            "STORAGE_SETTINGS_FILE": self._path("students.storage.json"),
+            "_storage_settings_read": False,
+            "database": student_utils.StudentDatabase(),
+            "_journal": None,
+            "_journal_settings_used": None,
+        }
+        for name, value in settings.items():
+            self.addCleanup(setattr, student_utils, name, getattr(student_utils, name))
+            setattr(student_utils, name, value)
+        self.addCleanup(lambda: student_utils._journal and student_utils._journal.close())
+        with open(self._path("students.json"), "w") as file:
+            json.dump(self.roster, file)
+
+    def _path(self, name):
+        return os.path.join(self._dir.name, name)
+
+    def _roster(self):
+        return student_utils.database.store.as_dict()
+
+    def _reload(self):
+        """Flush, drop the in-memory roster and read it back from disk."""
+        student_utils.flush()
+        student_utils.database.unload()
+        return self._roster()
+
+
+class BulkMutationTest(_TempRosterTest):
+    def test_add_students_counts_adds_and_updates(self):
+        summary = student_utils.add_students([("Dana", 30), ("Alice", 21), ("Dana", 31)])
+        self.assertEqual(summary, {"added": 1, "updated": 1, "removed": 0, "errors": [], "saved": True})
+        expected = {"Alice": 21, "Bob": 22, "Charlie": 19, "Dana": 31}
+        self.assertEqual(self._roster(), expected)
+        self.assertEqual(self._reload(), expected)
+
+    def test_update_and_remove_students(self):
+        updated = student_utils.update_students({"Alice": 25, "Bob": 26})
+        removed = student_utils.remove_students(["Charlie", " Bob "])
+        self.assertEqual((updated["updated"], updated["added"]), (2, 0))
+        self.assertEqual(removed["removed"], 2)
+        self.assertEqual(self._reload(), {"Alice": 25})
+
+    def test_invalid_records_apply_nothing(self):
+        cases = [
+            (student_utils.add_students, [("Dana", 30), ("", 20), ("Eve", 151), ("Fay",)], 3),
+            (student_utils.update_students, [("Alice", 30), ("Nobody", 20)], 1),
+            (student_utils.remove_students, ["Alice", "Nobody", ""], 2),
+        ]
+        for function, records, errors in cases:
+            summary = function(records)
+            self.assertEqual(len(summary["errors"]), errors, summary)
+            self.assertFalse(summary["saved"])
+            self.assertEqual(summary["added"] + summary["updated"] + summary["removed"], 0)
+            self.assertEqual(self._roster(), self.roster)
+        self.assertEqual(self._reload(), self.roster)
+
+    def test_failed_journal_write_rolls_back(self):
+        self._roster()
+        with mock.patch.object(student_utils, "_get_journal", side_effect=IOError("disk full")):
+            summary = student_utils.add_students({"Dana": 30, "Alice": 40})
+            removed = student_utils.remove_students(["Bob"])
+        self.assertFalse(summary["saved"])
+        self.assertEqual(summary["added"] + summary["updated"], 0)
+        self.assertIn("Failed to save changes: disk full", summary["errors"])
+        self.assertFalse(removed["saved"])
+        self.assertEqual(self._roster(), self.roster)
+
+
+class PagedListingTest(_TempRosterTest):
+    roster = {f"Student {i:03d}": 20 + i % 30 for i in range(100)}
+
+    def test_a_page_is_fixed_when_it_is_taken(self):
+        page = student_utils.iter_students(0, 10, start_after="Student 049")
+        student_utils.remove_student("Student 051")
+        student_utils.add_student("Student 050a", 40)
+        self.assertEqual([name for name, _ in page], [f"Student {i:03d}" for i in range(50, 60)])
+
+    def test_cursor_resumes_after_the_last_name_seen(self):
+        first = list(student_utils.iter_students(0, 10))
+        student_utils.remove_students([first[-1][0], "Student 000"])
+        student_utils.add_student("Student 009b", 50)
+        second = list(student_utils.iter_students(0, 3, start_after=first[-1][0]))
+        self.assertEqual(second, [("Student 009b", 50), ("Student 010", 30), ("Student 011", 31)])
+        listing = student_utils.list_all_students(0, 3, start_after=first[-1][0])
+        self.assertTrue(listing.startswith("Current students (showing 3 of 99):"), listing)
+
+
+class SnapshotReadTest(_TempRosterTest):
+    roster = {f"Student {i:03d}": 20 + i % 30 for i in range(50)}
+
+    def test_full_listing_is_isolated_from_later_writes(self):
+        listing = student_utils.iter_students()
+        next(listing)
+        student_utils.remove_students([f"Student {i:03d}" for i in range(25)])
+        student_utils.add_student("Student 999", 90)
+        student_utils.add_student("Student 030", 100)
+        self.assertEqual(len(list(listing)), 49)
+
+    def test_writers_carry_on_while_a_snapshot_is_walked(self):
+        view = student_utils.database.snapshot()
+        walked = []
+        for name, age in view.iter_sorted():
+            walked.append(name)
+            if len(walked) == 10:
+                # Takes the write lock, so this would deadlock if the walk held the read lock
+                writer = threading.Thread(target=student_utils.add_students, args=({"Late": 1},))
+                writer.start()
+                writer.join(5)
+                self.assertFalse(writer.is_alive())
+        self.assertEqual(walked, sorted(self.roster))
+        self.assertEqual(student_utils.lookup_student("Late"), "Late is 1 years old.")
+
+
+class AgeQueryMessageTest(_TempRosterTest):
+    roster = {"Ann": 18, "Ben": 21, "Cat": 21, "Dan": 35, "Eve": 60}
+
+    def test_queries_see_changes(self):
+        self.assertEqual(student_utils.oldest_students(2), [("Eve", 60), ("Dan", 35)])
+        student_utils.remove_student("Eve")
+        student_utils.add_student("Fay", 21)
+        self.assertEqual(student_utils.oldest_students(2), [("Dan", 35), ("Ben", 21)])
+        self.assertEqual(student_utils.youngest_students(2), [("Ann", 18), ("Ben", 21)])
+        self.assertEqual(student_utils.count_students_by_age(), {18: 1, 21: 3, 35: 1})
+        self.assertEqual(student_utils.list_students_by_age(20, 40, limit=2),
+                         "Students aged 20-40 (4 total):\n  - Ben: 21 years old\n  - Cat: 21 years old\n"
+                         "  ... and 2 more students")
+        self.assertEqual(student_utils.list_students_by_age(61, 150), "No students aged 61-150.")
+
+
+class ImportCacheTest(_TempRosterTest):
+    roster = {}
+
+    def setUp(self):
+        super().setUp()
+        self.csv_path = self._path("incoming.csv")
+        self._write("Name,Age\n" + "".join(f"Row{i},{20 + i}\n" for i in range(5)))
+
+    def _write(self, text, mode="w"):
+        with open(self.csv_path, mode, newline="") as file:
+            file.write(text)
+        # Move the mtime on, so a rewrite is noticed even within the clock's resolution
+        stat = os.stat(self.csv_path)
+        os.utime(self.csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    def _merge(self):
+        return student_utils.import_and_merge_csv(self.csv_path)
+
+    def test_unchanged_file_is_skipped(self):
+        self.assertIn("5 new students added", self._merge())
+        self.assertEqual(self._merge(), f"Skipped '{self.csv_path}': unchanged since it was last imported.")
+        with open(self.csv_path, newline="") as file:
+            self._write(file.read())
+        self.assertEqual(self._merge(), f"Skipped '{self.csv_path}': content unchanged since it was last imported.")
+        self.assertEqual(len(self._roster()), 5)
+
+    def test_only_appended_rows_are_applied(self):
+        self._merge()
+        # Changed since the import; re-reading the whole file would undo it
+        student_utils.add_student("Row1", 99)
+        self._write("Row5,40\nRow6,41\n", mode="a")
+        message = self._merge()
+        self.assertIn("2 new students added", message)
+        self.assertIn("Skipped 6 rows already imported; applied the 2 rows appended since.", message)
+        self.assertEqual(self._roster()["Row1"], 99)
+        self.assertEqual(self._roster()["Row6"], 41)
+
+    def test_unterminated_last_row_is_read_again(self):
+        self._write("Tail,3", mode="a")
+        self._merge()
+        self._write("3\nAfter,50\n", mode="a")
+        self._merge()
+        self.assertEqual((self._roster()["Tail"], self._roster()["After"]), (33, 50))
+
+    def test_rewritten_file_is_merged_in_full(self):
+        self._merge()
+        student_utils.add_student("Row1", 99)
+        self._write("Name,Age\nRow1,70\nRow2,71\n")
+        message = self._merge()
+        self.assertIn("2 students updated", message)
+        self.assertNotIn("already imported", message)
+        self.assertEqual((self._roster()["Row1"], self._roster()["Row2"]), (70, 71))
+
+    def test_replacing_the_roster_forgets_merged_files(self):
+        self._merge()
+        other = self._path("other.csv")
+        with open(other, "w") as file:
+            file.write("Name,Age\nSolo,30\n")
+        student_utils.import_from_csv(other)
+        self.assertIn("5 new students added", self._merge())
+        self.assertEqual(len(self._roster()), 6)
+
+
+class ImportMessageTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        settings = {
+            "SNAPSHOT_FORMAT": "binary",
+            "BINARY_SNAPSHOT_FILE": self._path("students.msus"),
+            "BINARY_JOURNAL_FILE": self._path("students.msus.journal"),
+            "IMPORT_CACHE_FILE": self._path("students.imports.json"),
+            "STORAGE_SETTINGS_FILE": self._path("students.storage.json"),
+            "_storage_settings_read": False,
+            "database": student_utils.StudentDatabase(),
+            "_journal": None,
+            "_journal_settings_used": None,
+        }
+        for name, value in settings.items():
+            self.addCleanup(setattr, student_utils, name, getattr(student_utils, name))
+            setattr(student_utils, name, value)
+        self.addCleanup(lambda: student_utils._journal and student_utils._journal.close())
+        self.csv_path = self._path("students.csv")
+        with open(self.csv_path, "w", newline="") as file:
+            csv.writer(file).writerows([["Name", "Age"], ["Alice", "20"], ["Bob", "22"]])
+
+    def _path(self, name):
+        return os.path.join(self._dir.name, name)
+
+    def test_messages_name_the_active_snapshot(self):
+        student_utils.database.replace(student_utils._new_store({"Carol": 30}))
+        replaced = student_utils.commit_staged_import(student_utils.stage_csv_import(self.csv_path))
+        merged = student_utils.commit_staged_import(student_utils.stage_csv_import(self.csv_path), merge=True)
+        for message in (replaced, merged):
+            self.assertIn(f"Data saved to {self._path('students.msus')}.", message)
+
+
+class StorageSettingsTest(unittest.TestCase):
+    """Each step runs in a fresh process, as separate runs of the program would."""
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+
+    def _run(self, code):
+        return _run_python(self._dir.name, "import student_utils as su\n" + code)[-1]
+
+    def _check_switch(self, switch, expected_file):
+        self._run(f"print({switch})")
+        self._run("print(su.add_student('NewGuy', 33))")
+        self.assertTrue(os.path.exists(os.path.join(self._dir.name, expected_file)))
+        self.assertEqual(self._run("print(su.lookup_student('NewGuy'))"), "NewGuy is 33 years old.")
+
+    def test_sqlite_backend_is_kept_by_later_processes(self):
+        self._check_switch("su.use_sqlite_backend(True)", "students.db")
+        self.assertEqual(self._run("print(su._get_journal().snapshot_path)"), "students.db")
+
+    def test_binary_snapshot_is_kept_by_later_processes(self):
+        self._check_switch("su.use_binary_snapshot(True)", "students.msus")
+        self.assertEqual(self._run("print(type(su.database.store).__name__)"), "MappedStudentStore")
+
+    def test_sharded_layout_is_kept_by_later_processes(self):
+        self._check_switch("su.use_sharded_layout(4)", os.path.join("students.json.shards", "manifest.json"))
+        self.assertEqual(self._run("print(su._get_journal().shard_count)"), "4")
+
+
+
+class LazyLoadTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+
+    def _run(self, code):
+        return _run_python(self._dir.name, code)
+
+    def test_importing_does_not_touch_the_disk(self):
+        output = self._run(
+            "import os, sys\n"
+            "import main\n"
+            "print('student_utils' in sys.modules)\n"
+            "import student_utils\n"
+            "print(student_utils.database.loaded, os.listdir('.'))\n")
+        self.assertEqual(output, ["False", "False []"])
+
+    def test_first_access_loads_the_saved_roster(self):
+        with open(os.path.join(self._dir.name, "students.json"), "w") as file:
+            json.dump({"Zed": 44}, file)
+        output = self._run(
+            "import student_utils as su\n"
+            "print(su.database.loaded)\n"
+            "print(su.lookup_student('Zed'))\n"
+            "print(su.database.loaded, dict(su.students))\n")
+        self.assertEqual(output[0], "False")
+        self.assertEqual(output[-2:], ["Zed is 44 years old.", "True {'Zed': 44}"])
+
+    def test_first_access_without_a_roster_creates_the_default_one(self):
+        output = self._run("import student_utils as su\nprint(len(su.students))\n")
+        self.assertEqual(output[-1], str(len(student_utils.DEFAULT_STUDENTS)))
+        with open(os.path.join(self._dir.name, "students.json")) as file:
+            self.assertEqual(json.load(file), student_utils.DEFAULT_STUDENTS)
+
+
+
+class MultiProcessMergeTest(unittest.TestCase):
+    WRITER = (
+        "import os, sys, time\n"
+        "import student_utils as su\n"
+        "tag = sys.argv[1]\n"
+        "open(tag + '.ready', 'w').close()\n"
+        "# Start writing together, so the two runs overlap\n"
+        "while not (os.path.exists('A.ready') and os.path.exists('B.ready')):\n"
+        "    time.sleep(0.001)\n"
+        "for i in range(150):\n"
+        "    su.add_student(f'{tag} {i}', i % 100)\n"
+        "    if i % 25 == 24:\n"
+        "        su.save_students_to_json()\n"
+        "su.remove_student(f'{tag} 0')\n")
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+
+    def test_concurrent_writers_keep_each_others_changes(self):
+        _run_python(self._dir.name, "import student_utils as su\nsu.save_students_to_json(force=True)")
+        package = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=package)
+        writers = [subprocess.Popen([sys.executable, "-c", self.WRITER, tag], cwd=self._dir.name, env=env,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+                   for tag in ("A", "B")]
+        for writer in writers:
+            _, errors = writer.communicate(timeout=60)
+            self.assertEqual(writer.returncode, 0, errors)
+
+        expected = dict(student_utils.DEFAULT_STUDENTS)
+        for tag in ("A", "B"):
+            expected.update({f"{tag} {i}": i % 100 for i in range(1, 150)})
+        output = _run_python(self._dir.name, "import json, student_utils as su\n"
+                                             "print(json.dumps(dict(su.students)))")
+        self.assertEqual(json.loads(output[-1]), expected)
+
+    def test_loaded_roster_picks_up_another_processes_changes(self):
+        output = _run_python(self._dir.name, (
+            "import subprocess, sys\n"
+            "import student_utils as su\n"
+            "print(su.lookup_student('Other'))\n"
+            "subprocess.run([sys.executable, '-c', "
+            "'import student_utils as su; su.add_student(\"Other\", 40)'], check=True)\n"
+            "su.load_students_from_json()\n"
+            "print(su.lookup_student('Other'))\n"))
+        self.assertIn("Applied 1 changes made by other processes", output)
+        self.assertEqual(output[-1], "Other is 40 years old.")
+
+
+if __name__ == "__main__":
+    unittest.main()